@@ -0,0 +1,167 @@
+"""
+行动合法性校验
+模型经常给出不合法的选择：投票给死亡玩家、查验自己、刀狼队友、解药用完后还要救人等。
+每个行动按当前游戏状态检查响应中的目标，不合法时在本地按配置的策略修正并记录，不再额外请求模型：
+    nearest   离原目标座位最近的合法目标（不是编号时取第一个合法目标）
+    abstain   弃权（弃票、不杀、不用药）；查验没有弃权选项，按 nearest 处理
+    scripted  脚本策略：好人选狼人概率最高的玩家，狼人选神职概率最高的玩家
+"""
+
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+POLICY_NEAREST, POLICY_ABSTAIN, POLICY_SCRIPTED = "nearest", "abstain", "scripted"
+POLICIES = (POLICY_NEAREST, POLICY_ABSTAIN, POLICY_SCRIPTED)
+GOD_ROLES = ("预言家", "女巫", "猎人")
+# 用错药时改投别人会误伤玩家，默认直接不用药
+DEFAULT_ACTION_POLICIES = {"cure_or_poison": POLICY_ABSTAIN}
+
+
+class FieldRule:
+    """
+    响应中一个字段的合法取值
+        targets: 可以选择的玩家编号
+        abstain: 表示弃权的取值，None 表示不能弃权
+        allowed: targets 之外的其他合法取值（如 cure 的 0/1）
+    """
+
+    def __init__(self, field, targets=(), abstain=None, allowed=()):
+        self.field = field
+        self.targets = list(targets)
+        self.abstain = abstain
+        self.allowed = set(allowed) | ({abstain} if abstain is not None else set())
+
+    def is_legal(self, value):
+        return value in self.allowed or value in self.targets
+
+
+def to_int(value):
+    """模型常常返回 "3"、"3号" 之类的字符串，取出其中的整数，无法识别时返回 None"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        match = re.search(r'-?\d+', value)
+        if match:
+            return int(match.group())
+    return None
+
+
+def alive_others(player):
+    return [p.player_index for p in player.game.players if p.is_alive and p.player_index != player.player_index]
+
+
+def vote_rules(player, resp, context):
+    return [FieldRule("vote", alive_others(player), abstain=-1)]
+
+
+def divine_rules(player, resp, context):
+    return [FieldRule("divine", alive_others(player))]
+
+
+def kill_rules(player, resp, context):
+    targets = [p.player_index for p in player.game.players if p.is_alive and p.role_type != "狼人"]
+    return [FieldRule("kill", targets, abstain=-1)]
+
+
+def cure_or_poison_rules(player, resp, context):
+    '''解药和毒药各只能用一次；没有人被杀时不能救；同一晚只能用一种药，两种都用时保留解药'''
+    someone_will_be_killed = context.get("someone_will_be_killed", -1)
+    can_cure = player.cured_someone == 0 and someone_will_be_killed != -1
+    rules = [FieldRule("cure", abstain=0, allowed=(1,) if can_cure else ())]
+    cure = to_int(resp.get("cure"))
+    poison_targets = []
+    if player.poisoned_someone == -1 and not (can_cure and cure == 1):
+        poison_targets = alive_others(player)
+    rules.append(FieldRule("poison", poison_targets, abstain=-1))
+    return rules
+
+
+# 行动名 -> 生成字段规则的函数，函数参数为 (玩家, 响应, 调用方提供的上下文)
+VALIDATORS = {
+    "vote": vote_rules,
+    "divine": divine_rules,
+    "kill": kill_rules,
+    "cure_or_poison": cure_or_poison_rules,
+}
+
+
+def nearest_target(value, targets, n_players):
+    """按环形座位距离选择离 value 最近的目标，距离相同取编号小的"""
+    if value is None or not 1 <= value <= n_players:
+        return targets[0]
+    return min(targets, key=lambda t: (min(abs(t - value), n_players - abs(t - value)), t))
+
+
+def scripted_target(player, targets):
+    """脚本策略，与猎人反击一致使用角色后验"""
+    posterior = player.get_role_posterior()
+    if player.role_type != "狼人":
+        return posterior.most_likely_wolf(targets)
+    role_probs = posterior.role_probabilities()
+    return max(targets, key=lambda t: (sum(role_probs[t].get(role, 0.0) for role in GOD_ROLES), -t))
+
+
+class ActionValidator:
+    """
+    action_validation 配置:
+        enabled: 是否校验，默认开启
+        policy: 默认修正策略 nearest / abstain / scripted
+        actions: 按行动覆盖修正策略，如 {"vote": "abstain", "kill": "scripted"}，女巫用药默认 abstain
+    """
+
+    def __init__(self, config=None):
+        config = (config or {}).get("action_validation", {})
+        self.enabled = config.get("enabled", True)
+        self.policy = config.get("policy", POLICY_NEAREST)
+        self.actions = dict(DEFAULT_ACTION_POLICIES, **config.get("actions", {}))
+        for policy in [self.policy] + list(self.actions.values()):
+            if policy not in POLICIES:
+                raise ValueError(f"无效的行动修正策略: {policy}")
+        self.corrections = {}  # 行动 -> 修正次数
+        self.lock = threading.Lock()
+
+    def policy_for(self, action):
+        return self.actions.get(action, self.policy)
+
+    def validate(self, player, action, resp, **context):
+        """检查并原地修正 resp，返回修正记录列表 [(字段, 原值, 修正后的值)]"""
+        if not self.enabled or not resp or action not in VALIDATORS:
+            return []
+        policy = self.policy_for(action)
+        corrections = []
+        for rule in VALIDATORS[action](player, resp, context):
+            original = resp.get(rule.field)
+            value = to_int(original)
+            if rule.is_legal(value):
+                resp[rule.field] = value
+                continue
+            corrected = self.correct(player, rule, value, policy)
+            resp[rule.field] = corrected
+            corrections.append((rule.field, original, corrected))
+
+        if corrections:
+            with self.lock:
+                self.corrections[action] = self.corrections.get(action, 0) + len(corrections)
+            for field, original, corrected in corrections:
+                logger.warning(f"{player.player_index}号玩家({player.role_type}) {action} 的 {field}={original!r} 不合法，按 {policy} 修正为 {corrected}")
+        return corrections
+
+    def correct(self, player, rule, value, policy):
+        if policy == POLICY_ABSTAIN and rule.abstain is not None:
+            return rule.abstain
+        if not rule.targets:
+            return rule.abstain if rule.abstain is not None else -1
+        if policy == POLICY_SCRIPTED:
+            return scripted_target(player, rule.targets)
+        return nearest_target(value, rule.targets, len(player.game.players))
+
+    def summary(self):
+        with self.lock:
+            return dict(self.corrections)
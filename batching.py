@@ -0,0 +1,119 @@
+"""
+同一模型的决策批量提交
+多局游戏按阶段同步推进时（见 headless.py），由调度器登记的游戏线程发出的请求先按模型排队，
+当所有游戏都在等待结果或已完成本阶段、或队列达到 max_batch 时，整批同时发给服务端，
+让自托管的推理服务（vLLM 等连续批处理服务）一次拿到一整批序列，结果再分发回各局游戏
+未登记的线程（网页对局、后台摘要等）照常直接请求
+"""
+
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+DEFAULT_MAX_BATCH = 16
+
+
+class DecisionBatcher:
+    def __init__(self, max_batch=DEFAULT_MAX_BATCH):
+        self.max_batch = max_batch
+        self.queues = {}         # 批次键 -> [(请求函数, Future)]
+        self.participants = 0    # 本阶段参与的游戏线程数
+        self.blocked = 0         # 正在等待结果或已完成本阶段的线程数
+        self.cond = threading.Condition()
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=max_batch * 4, thread_name_prefix="batch")
+        self.stats = {}
+
+    def register(self):
+        """把当前线程登记为游戏线程，之后它发出的请求参与批量提交"""
+        self.local.registered = True
+
+    def is_registered(self):
+        return getattr(self.local, "registered", False)
+
+    def begin_step(self, participants):
+        with self.cond:
+            self.participants = participants
+            self.blocked = 0
+
+    def step_done(self):
+        """游戏线程完成本阶段，不会再提交请求"""
+        with self.cond:
+            self.blocked += 1
+            self._flush_if_idle()
+
+    def submit(self, key, call):
+        """排队等待批量提交，阻塞直到拿到 call() 的结果"""
+        future = Future()
+        # 请求在批处理线程中执行，沿用调用方的日志上下文
+        context = contextvars.copy_context()
+        with self.cond:
+            queue = self.queues.setdefault(key, [])
+            queue.append((lambda: context.run(call), future))
+            self.blocked += 1
+            if len(queue) >= self.max_batch:
+                self._flush(key)
+            self._flush_if_idle()
+        try:
+            return future.result()
+        finally:
+            with self.cond:
+                self.blocked -= 1
+
+    def _flush_if_idle(self):
+        # 所有游戏线程都在等待，不会再有新的请求加入，把所有队列发出去
+        if self.blocked >= self.participants:
+            for key in list(self.queues):
+                self._flush(key)
+
+    def _flush(self, key):
+        batch = self.queues.pop(key, [])
+        if not batch:
+            return
+        item = self.stats.setdefault(key, {"batches": 0, "decisions": 0, "max_size": 0})
+        item["batches"] += 1
+        item["decisions"] += len(batch)
+        item["max_size"] = max(item["max_size"], len(batch))
+        for call, future in batch:
+            self.executor.submit(self._run, call, future)
+
+    @staticmethod
+    def _run(call, future):
+        try:
+            future.set_result(call())
+        except BaseException as e:
+            future.set_exception(e)
+
+    def summary(self):
+        with self.cond:
+            return {
+                key: dict(item, mean_size=round(item["decisions"] / item["batches"], 2))
+                for key, item in self.stats.items()
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+_batcher = None
+
+
+def install(batcher):
+    """设置当前进程使用的批量提交器，None 表示关闭"""
+    global _batcher
+    _batcher = batcher
+
+
+def batch_key(model):
+    """同一个模型、同一个服务端点的请求放在一批"""
+    client = getattr(model, "client", None)
+    base_url = str(getattr(client, "base_url", "")) if client is not None else ""
+    return f"{model.model_name}@{base_url}" if base_url else model.model_name
+
+
+def call(model, request):
+    """游戏线程的请求交给批量提交器，其余情况直接执行 request()"""
+    batcher = _batcher
+    if batcher is None or not batcher.is_registered():
+        return request()
+    return batcher.submit(batch_key(model), request)
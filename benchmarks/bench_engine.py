@@ -0,0 +1,226 @@
+"""
+引擎基准
+微基准: History.get_history、prompt_preprocess、Recorder.record、get_response 中的JSON提取、get_players / check_winner，
+事件来自合成对局（--players 人数、--days 天数，每天出局两人，剩3人时提前结束）；
+宏基准: 用 mock 模型（不发网络请求，按脚本策略回答）跑完整的无界面对局，统计每秒完成的局数，
+--latency 给每次模型调用加上固定延迟，模拟真实提供商。
+对局在临时目录中进行（见 workspace.py），不影响当前目录的配置和日志。
+
+结果写成JSON，指定 --baseline 时与保存的基线比较，微基准变慢或宏基准吞吐下降超过 --threshold 的项目列为回归，
+有回归时以非零状态退出
+
+用法:
+    python benchmarks/bench_engine.py
+    python benchmarks/bench_engine.py --players 12 --days 8 --games 20 --latency 50
+    python benchmarks/bench_engine.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_engine.py --baseline benchmarks/baseline.json --threshold 0.15
+    python benchmarks/bench_engine.py --only micro
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import yaml
+
+from bench_event_encoding import synthetic_game
+from history import ENCODING_TEXT, ENCODING_COMPACT, COMPACT_DROP_SPEECH
+from json_repair import parse_json
+from workspace import workspace
+
+# 每轮至少运行这么久，自动选择每轮的调用次数
+MIN_ROUND_SECONDS = 0.05
+
+# get_response 收到的典型响应: 标准JSON、带说明文字的代码块、需要本地修复、被截断
+RESPONSES = {
+    "clean": '{"thinking": "3号的发言前后矛盾，很可能是狼人。", "vote": 3}',
+    "fenced": '好的，我的回答如下：\n```json\n{"thinking": "3号的发言前后矛盾，很可能是狼人。", "vote": 3}\n```\n以上。',
+    "repaired": "{thinking: “3号的发言前后矛盾，很可能是狼人。”, 'vote': 3,}",
+    "truncated": '{"thinking": "3号的发言前后矛盾，很可能是狼人。", "speak": "我认为3号是狼，大家跟我一起投',
+}
+
+
+def _timed(func, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - start
+
+
+def measure(func, repeat):
+    """返回每次调用耗时的中位数和最小值（微秒）"""
+    number = 1
+    elapsed = _timed(func, number)
+    while elapsed < MIN_ROUND_SECONDS and number < 1 << 20:
+        number *= 2
+        elapsed = _timed(func, number)
+    rounds = [elapsed] + [_timed(func, number) for _ in range(repeat - 1)]
+    per_op = [seconds / number * 1e6 for seconds in rounds]
+    return {"us_per_op": round(statistics.median(per_op), 3), "min_us": round(min(per_op), 3), "calls": number * repeat}
+
+
+def micro_benchmarks(args):
+    from game import WerewolfGame
+    # web.py 在导入时创建游戏和挂载 public 目录，需要在临时目录中导入
+    from web import Recorder
+
+    history, decision_points = synthetic_game(random.Random(args.seed), args.days, n_players=args.players)
+    n_events = sum(1 for _ in history.iter_events())
+
+    game = WerewolfGame()
+    game.start()
+    game.history = history
+    player = game.players[0]
+    with open('prompts/prompt_speak.yaml', 'r', encoding='utf-8') as f:
+        speak_template = yaml.safe_load(f)
+
+    recorder = Recorder(game)
+    response = {"players": game.get_players(), "speak": RESPONSES["clean"]}
+    # 记录会重写整个回放文件，先填到一局的决策数再测量
+    recorder.log = [{"response": response} for _ in range(len(decision_points))]
+
+    def record():
+        recorder.record(response)
+        recorder.log.pop()
+
+    cases = {
+        "history.get_history[text]": lambda: history.get_history(show_all=True),
+        "history.get_history[compact]": lambda: history.get_history(encoding=ENCODING_COMPACT),
+        "history.get_history[drop_speech]": lambda: history.get_history(compact_level=COMPACT_DROP_SPEECH, keep_recent=1, encoding=ENCODING_TEXT),
+        "role.prompt_preprocess": lambda: player.prompt_preprocess(dict(speak_template)),
+        "recorder.record": record,
+        "game.get_players": game.get_players,
+        "game.check_winner": game.check_winner,
+    }
+    cases.update({f"parse_json[{name}]": (lambda text=text: parse_json(text)) for name, text in RESPONSES.items()})
+
+    results = {}
+    for name, func in cases.items():
+        results[name] = measure(func, args.repeat)
+        print(f"  {name:<36} {results[name]['us_per_op']:12.1f} us")
+    results["history.get_history[text]"]["events"] = n_events
+    results["recorder.record"]["records"] = len(recorder.log)
+    return results
+
+
+def macro_benchmarks(args):
+    from headless import HeadlessGame, LockstepScheduler
+
+    results = {}
+    for mode in args.modes:
+        games = [HeadlessGame(game_id=i, max_days=args.max_days) for i in range(args.games)]
+        for game in games:
+            game.start()
+        begin = time.perf_counter()
+        if mode == "lockstep":
+            LockstepScheduler(games).run()
+        else:
+            for game in games:
+                try:
+                    game.play()
+                except Exception as e:
+                    game.error = str(e)
+        elapsed = time.perf_counter() - begin
+        results[f"headless[{mode}]"] = {
+            "games_per_sec": round(args.games / elapsed, 3),
+            "seconds_per_game": round(elapsed / args.games, 3),
+            "finished": sum(1 for game in games if game.winner),
+            "errors": sum(1 for game in games if game.error),
+        }
+        print(f"  headless[{mode}]{'':<20} {results[f'headless[{mode}]']['games_per_sec']:12.2f} 局/秒")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """返回 [(项目, 基线, 当前, 变化比例, 是否回归)]，吞吐越高越好，耗时越低越好"""
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        key = "games_per_sec" if "games_per_sec" in current else "us_per_op"
+        if not base.get(key):
+            continue
+        change = current[key] / base[key] - 1
+        regressed = change < -threshold if key == "games_per_sec" else change > threshold
+        rows.append((name, base[key], current[key], change, regressed))
+    return rows
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="引擎微基准和无界面对局基准")
+    parser.add_argument("--only", choices=["micro", "macro"], default=None, help="只运行一类基准")
+    parser.add_argument("--players", type=int, default=9, help="合成对局的人数")
+    parser.add_argument("--days", type=int, default=6, help="合成对局的天数")
+    parser.add_argument("--repeat", type=int, default=5, help="微基准每项运行的轮数，报告中位数")
+    parser.add_argument("--games", type=int, default=10, help="宏基准的对局数")
+    parser.add_argument("--max-days", type=int, default=20, help="宏基准超过这个天数的对局判为未结束")
+    parser.add_argument("--modes", nargs="+", choices=["sequential", "lockstep"], default=["sequential", "lockstep"])
+    parser.add_argument("--latency", type=int, default=0, help="mock 模型每次调用的延迟（毫秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="结果文件，默认 logs/bench_engine_<时间>.json")
+    parser.add_argument("--baseline", default=None, help="与这个基线结果比较")
+    parser.add_argument("--save-baseline", default=None, help="同时把结果保存为基线")
+    parser.add_argument("--threshold", type=float, default=0.1, help="超过这个比例的变化算作回归")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output or os.path.join(ROOT, "logs", f"bench_engine_{time.strftime('%Y%m%d%H%M')}.json"))
+    paths = [os.path.abspath(path) if path else None for path in (args.baseline, args.save_baseline)]
+    model_name = f"mock/{args.latency}" if args.latency else "mock"
+
+    random.seed(args.seed)
+    results = {}
+    with workspace(model_name):
+        if args.only != "macro":
+            print(f"微基准 ({args.players}人, {args.days}天)")
+            results.update(micro_benchmarks(args))
+        if args.only != "micro":
+            print(f"宏基准 ({args.games}局, 模型 {model_name})")
+            results.update(macro_benchmarks(args))
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    for path in (output, paths[1]):
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {output}")
+
+    if paths[0]:
+        with open(paths[0], "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        rows = compare(results, baseline, args.threshold)
+        print(f"\n与基线比较 ({args.baseline}, 阈值 {args.threshold:.0%})")
+        for name, base, current, change, regressed in rows:
+            print(f"  {name:<36} {base:12.2f} -> {current:12.2f}  {change:+7.1%}{'  回归' if regressed else ''}")
+        if any(row[4] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
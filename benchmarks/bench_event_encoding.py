@@ -0,0 +1,153 @@
+"""
+事件编码基准
+用合成的对局历史比较 text 和 compact 两种事件编码每局发送的token数；
+指定 --model 时，再用真实模型对两种编码各请求若干次投票，统计解析失败率
+
+用法:
+    python benchmarks/bench_event_encoding.py --games 50
+    python benchmarks/bench_event_encoding.py --games 5 --model deepseek-chat --api-key sk-xxx --trials 20
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+
+from history import (History, SpeakEvent, VoteEvent, ExecuteEvent, KillEvent, LastWordEvent,
+                     ENCODING_TEXT, ENCODING_COMPACT, EVENT_LEGEND)
+from providers import provider_for_model
+from token_budget import estimate_tokens
+
+SPEECHES = [
+    "我是好人，昨晚没有什么信息，先听后置位发言。",
+    "我觉得{0}号的发言有点划水，没有给出任何有效信息，建议大家关注一下。",
+    "我是预言家，昨晚查验了{0}号，是好人，今天大家跟我的票。",
+    "{0}号跳预言家我不太认，他的心路历程不完整，我站边另一位。",
+    "我是村民，这一轮我会投给{0}号，他在警上的表态前后矛盾。",
+    "如果{0}号是狼，那他的队友很可能在前置位，我建议先出{0}号。",
+]
+
+
+def synthetic_game(rng, max_days=4, on_decision=None, n_players=9):
+    """
+    生成一局合成对局，返回 (history, 每次决策时的存活玩家列表)
+    每个白天所有存活玩家各发言、投票一次，每次决策前调用 on_decision(history)
+    每天出局两人，剩3人时提前结束
+    """
+    history = History()
+    alive = list(range(1, n_players + 1))
+    decision_points = []
+    on_decision = on_decision or (lambda history: None)
+    for day in range(max_days):
+        victim = rng.choice(alive)
+        alive.remove(victim)
+        history.add_event(KillEvent(victim))
+        if day == 0:
+            history.add_event(LastWordEvent(victim, rng.choice(SPEECHES).format(rng.choice(alive))))
+        history.toggle_day_night()
+        for player in alive:
+            decision_points.append(list(alive))
+            on_decision(history)
+            history.add_event(SpeakEvent(player, rng.choice(SPEECHES).format(rng.choice(alive))))
+        votes = []
+        for player in alive:
+            decision_points.append(list(alive))
+            on_decision(history)
+            target = rng.choice(alive + [-1])
+            votes.append({"player_idx": player, "vote_id": target})
+            history.add_event(VoteEvent(player, target))
+        executed = rng.choice(alive)
+        alive.remove(executed)
+        history.add_event(ExecuteEvent(executed, votes))
+        history.add_event(LastWordEvent(executed, rng.choice(SPEECHES).format(rng.choice(alive))))
+        history.toggle_day_night()
+        if len(alive) <= 3:
+            break
+    return history, decision_points
+
+
+def events_tokens(history, encoding, provider):
+    events = history.get_history(encoding=encoding)
+    prompt = {"事件": events}
+    if encoding == ENCODING_COMPACT:
+        prompt["事件编码说明"] = EVENT_LEGEND
+    return estimate_tokens(json.dumps(prompt, ensure_ascii=False), provider)
+
+
+def measure_tokens(n_games, provider, seed):
+    """每局累计每次决策时提示词中事件字段的token数"""
+    rng = random.Random(seed)
+    totals = {ENCODING_TEXT: 0, ENCODING_COMPACT: 0}
+
+    def on_decision(history):
+        for encoding in totals:
+            totals[encoding] += events_tokens(history, encoding, provider)
+
+    for _ in range(n_games):
+        synthetic_game(rng, on_decision=on_decision)
+    return {encoding: total / n_games for encoding, total in totals.items()}
+
+
+def vote_prompt(history, alive, player, encoding):
+    with open('prompts/prompt_vote.yaml', 'r', encoding='utf-8') as f:
+        prompt = yaml.safe_load(f)
+    with open('prompts/prompt_game_rule.yaml', 'r', encoding='utf-8') as f:
+        prompt.update(yaml.safe_load(f))
+    prompt['你的玩家编号'] = f"你是{player}号玩家"
+    prompt['角色'] = "你是一名村民"
+    prompt['玩家状态'] = [f"{i}号玩家: {'存活' if i in alive else '死亡'}" for i in range(1, 10)]
+    prompt['事件'] = history.get_history(encoding=encoding)
+    if encoding == ENCODING_COMPACT:
+        prompt['事件编码说明'] = EVENT_LEGEND
+    return json.dumps(prompt, ensure_ascii=False)
+
+
+def measure_parse_failures(model_name, api_key, trials, seed):
+    """对两种编码各请求 trials 次投票，响应无法解析、缺少字段或投给出局玩家都算失败"""
+    from llm import BuildModel
+    model = BuildModel(model_name, api_key, force_json=True)
+    rng = random.Random(seed)
+    failures = {ENCODING_TEXT: 0, ENCODING_COMPACT: 0}
+    for _ in range(trials):
+        history, decision_points = synthetic_game(rng)
+        alive = decision_points[-1]
+        player = rng.choice(alive)
+        for encoding in failures:
+            resp, _ = model.get_response(vote_prompt(history, alive, player, encoding))
+            if not resp or "vote" not in resp or (resp["vote"] != -1 and resp["vote"] not in alive):
+                failures[encoding] += 1
+    return {encoding: count / trials for encoding, count in failures.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较 text / compact 事件编码")
+    parser.add_argument("--games", type=int, default=50, help="合成对局数量")
+    parser.add_argument("--provider", default=None, help="按哪个提供商的分词系数估算，默认按 --model 推断")
+    parser.add_argument("--model", default=None, help="用于测量解析失败率的模型")
+    parser.add_argument("--api-key", default="", help="模型的API KEY")
+    parser.add_argument("--trials", type=int, default=20, help="每种编码请求的次数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    provider = args.provider or (provider_for_model(args.model) if args.model else None)
+    tokens = measure_tokens(args.games, provider, args.seed)
+    saved = tokens[ENCODING_TEXT] - tokens[ENCODING_COMPACT]
+    print(f"每局事件字段token数 (提供商: {provider or '默认'}, {args.games}局)")
+    print(f"  text:    {tokens[ENCODING_TEXT]:.0f}")
+    print(f"  compact: {tokens[ENCODING_COMPACT]:.0f}")
+    print(f"  每局节省: {saved:.0f} ({saved / tokens[ENCODING_TEXT]:.1%})")
+
+    if args.model:
+        rates = measure_parse_failures(args.model, args.api_key, args.trials, args.seed)
+        print(f"解析失败率 ({args.model}, 每种编码{args.trials}次)")
+        print(f"  text:    {rates[ENCODING_TEXT]:.1%}")
+        print(f"  compact: {rates[ENCODING_COMPACT]:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+启动耗时基准
+在独立的子进程中用 python -X importtime 导入各模块，报告每个模块的导入耗时、其中最慢的依赖，
+以及导入后已经加载了哪些提供商SDK（提供商SDK应当在首次创建对应模型时才导入）
+
+用法:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --modules llm game web --repeat 5 --top 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["llm", "role", "judge", "game", "headless", "web"]
+SDK_MODULES = ["openai", "dashscope", "zhipuai", "requests", "http.client"]
+
+CHECK_SDKS = "import sys; import {module}; print(','.join(m for m in {sdks!r} if m in sys.modules))"
+
+
+def import_profile(module):
+    """
+    导入一次 module，返回 (总耗时毫秒, {依赖模块: 累计耗时毫秒}, 已加载的SDK列表)；导入失败时返回错误信息
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHECK_SDKS.format(module=module, sdks=SDK_MODULES)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return proc.stderr.strip().splitlines()[-1]
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us) / 1000
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return cumulative.get(module, 0.0), cumulative, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量各模块的导入耗时")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="要测量的模块")
+    parser.add_argument("--repeat", type=int, default=3, help="每个模块导入的次数，报告中位数")
+    parser.add_argument("--top", type=int, default=5, help="列出最慢的几个依赖")
+    parser.add_argument("--sdks", action="store_true", help="同时测量各提供商SDK单独导入的耗时")
+    args = parser.parse_args()
+
+    modules = args.modules + (SDK_MODULES if args.sdks else [])
+    for module in modules:
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        if isinstance(runs[0], str):
+            print(f"{module:<12} 导入失败: {runs[0]}")
+            continue
+        total = statistics.median(run[0] for run in runs)
+        _, cumulative, loaded = runs[-1]
+        print(f"{module:<12} {total:8.1f} ms   已加载SDK: {', '.join(loaded) or '无'}")
+        slowest = sorted(((ms, name) for name, ms in cumulative.items() if name != module), reverse=True)
+        for ms, name in slowest[:args.top]:
+            print(f"    {name:<40} {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
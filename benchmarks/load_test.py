@@ -0,0 +1,418 @@
+"""
+web.py 压测
+模拟多个前端客户端并发请求:
+  驱动客户端按 public/src/action.js（以及 game.js 的 someone_die）的请求顺序完整地跑对局，每个行动前先请求 /status；
+  观战客户端轮询 /status、/current_time、/game_summary、/replay_data、/metrics。
+报告每个接口的请求数、每秒请求数、p50/p95/p99 延迟和错误率，以及服务进程的CPU和内存。
+
+默认在临时目录中用 mock 模型（不发网络请求，见 llm.MockLlm）启动一个 web.py 服务进程，--latency 模拟模型延迟；
+也可以用 --url 压测已经运行的服务，同时指定 --pid 才能采样CPU和内存。
+注意 web.py 只有一局全局游戏，多个驱动客户端会互相重置对局，此时的错误率反映的正是这一限制。
+
+用法:
+    python benchmarks/load_test.py --drivers 1 --spectators 50 --duration 60
+    python benchmarks/load_test.py --drivers 4 --latency 200 --duration 120 --output logs/load.json
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --pid 12345 --spectators 100
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+from workspace import ROOT, workspace
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 进程已退出或当前平台不支持时停止采样
+SAMPLE_ERRORS = (OSError, ValueError) + ((psutil.Error,) if psutil else ())
+
+# 与 data.js 的 fetchData 一致
+REQUEST_TIMEOUT = 1800
+SPECTATOR_ENDPOINTS = ["/status", "/current_time", "/game_summary", "/replay_data", "/metrics"]
+
+
+class Stats:
+    """按接口记录延迟和错误，多个客户端线程共用"""
+
+    def __init__(self):
+        self.latencies = {}  # 接口 -> [秒]
+        self.errors = {}     # 接口 -> 次数
+        self.games = 0
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def game_finished(self):
+        with self.lock:
+            self.games += 1
+
+    def report(self, duration):
+        endpoints = {}
+        with self.lock:
+            items = {endpoint: sorted(values) for endpoint, values in self.latencies.items()}
+            errors = dict(self.errors)
+        for endpoint, values in sorted(items.items()):
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "rps": round(len(values) / duration, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+                "error_rate": round(errors.get(endpoint, 0) / len(values), 4),
+            }
+        total = sum(item["requests"] for item in endpoints.values())
+        return {
+            "requests": total,
+            "rps": round(total / duration, 2),
+            "error_rate": round(sum(errors.values()) / total, 4) if total else 0,
+            "games_finished": self.games,
+            "endpoints": endpoints,
+        }
+
+
+def percentile(sorted_values, p):
+    """最近秩法"""
+    if not sorted_values:
+        return 0
+    rank = math.ceil(p / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+class Client:
+    def __init__(self, url, stats, stop):
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.stats = stats
+        self.stop = stop
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        """发出请求并记录延迟，HTTP错误或连接失败时抛出异常（已计入错误）"""
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.stats.record(path, time.perf_counter() - start, False)
+            self.conn.close()
+            self.conn = None
+            raise
+        ok = response.status == 200
+        self.stats.record(path, time.perf_counter() - start, ok)
+        if not ok:
+            raise RuntimeError(f"{path} 返回 {response.status}: {data[:200]!r}")
+        return json.loads(data) if data else None
+
+    def get(self, path):
+        return self.request("GET", path)
+
+    def post(self, path, body=None):
+        return self.request("POST", path, body)
+
+
+class SpectatorClient(Client):
+    def __init__(self, url, stats, stop, interval):
+        super().__init__(url, stats, stop)
+        self.interval = interval
+
+    def run(self):
+        while not self.stop.is_set():
+            for path in SPECTATOR_ENDPOINTS:
+                try:
+                    self.get(path)
+                except Exception:
+                    pass
+                if self.stop.wait(self.interval):
+                    return
+
+
+class DriverClient(Client):
+    """按 game.js 中 actions 的顺序驱动对局"""
+
+    def __init__(self, url, stats, stop, max_days):
+        super().__init__(url, stats, stop)
+        self.max_days = max_days
+        self.players = {}
+        self.deaths = []
+
+    def run(self):
+        while not self.stop.is_set():
+            try:
+                self.play()
+                self.stats.game_finished()
+            except Exception:
+                # 对局被其他驱动客户端重置或接口出错时稍等后重新开局
+                self.stop.wait(1)
+
+    def refresh(self):
+        self.players = self.get("/status")
+
+    def find(self, role_type):
+        return [p for p in self.players.values() if p["role_type"] == role_type]
+
+    def play(self):
+        self.get("/start")
+        self.refresh()
+        actions = [self.divine, self.wolf, self.witch, self.check_winner, self.end_night]
+        actions += [lambda idx=idx: self.speak(idx) for idx in self.players]
+        actions += [lambda idx=idx: self.vote(idx) for idx in self.players]
+        actions += [self.execute, self.check_winner, self.end_day]
+        day = 1
+        while day <= self.max_days and not self.stop.is_set():
+            for action in actions:
+                self.refresh()
+                if action():
+                    return
+            day += 1
+
+    def someone_die(self, player_idx, death_reason):
+        self.deaths.append(player_idx)
+        current = self.get("/current_time")
+        if current["current_day"] == 1 or (current["current_phase"] == "白天" and death_reason == "被投票处决"):
+            self.post("/last_words", {"player_idx": player_idx, "speak": "", "death_reason": death_reason})
+        hunter = self.find("猎人")
+        if hunter and hunter[0]["index"] == player_idx and death_reason != "被女巫毒杀":
+            result = self.post("/revenge", {"player_idx": player_idx, "death_reason": death_reason})
+            if result["attack"] != -1:
+                self.post("/attack", {"player_idx": player_idx, "target_idx": result["attack"]})
+                self.someone_die(result["attack"], "被猎人杀死")
+
+    def divine(self):
+        seer = self.find("预言家")[0]
+        if seer["is_alive"]:
+            self.post("/divine", {"player_idx": seer["index"]})
+
+    def wolf(self):
+        self.post("/reset_wolf_want_kill")
+        for is_second_vote in (False, True):
+            for wolf in self.find("狼人"):
+                if wolf["is_alive"]:
+                    self.post("/decide_kill", {"player_idx": wolf["index"], "kill_id": -100, "is_second_vote": is_second_vote})
+            if self.get("/get_wolf_want_kill")["wolf_want_kill"] != -1:
+                return
+
+    def witch(self):
+        witch = self.find("女巫")[0]
+        killed = self.get("/get_wolf_want_kill")["wolf_want_kill"]
+        if not witch["is_alive"]:
+            if killed != -1:
+                self.post("/kill", {"player_idx": killed})
+                self.someone_die(killed, "被狼人杀死")
+            return
+        result = self.post("/decide_cure_or_poison", {"player_idx": witch["index"]})
+        if result["cure"] == 1:
+            self.post("/cure", {"player_idx": killed})
+        else:
+            killed = self.get("/get_wolf_want_kill")["wolf_want_kill"]
+            if killed != -1:
+                self.post("/kill", {"player_idx": killed})
+                self.someone_die(killed, "被狼人杀死")
+        if result["poison"] != -1:
+            self.post("/poison", {"player_idx": result["poison"]})
+            self.someone_die(result["poison"], "被女巫毒杀")
+
+    def check_winner(self):
+        return self.get("/check_winner")["winner"] != "胜负未分"
+
+    def end_night(self):
+        self.post("/toggle_day_night")
+        self.get("/current_time")
+        self.post("/reset_vote_result")
+        self.deaths = []
+
+    def speak(self, player_idx):
+        if self.players[player_idx]["is_alive"]:
+            self.post("/speak", {"player_idx": int(player_idx), "content": ""})
+
+    def vote(self, player_idx):
+        if self.players[player_idx]["is_alive"]:
+            self.post("/vote", {"player_idx": int(player_idx), "vote_id": -100})
+
+    def execute(self):
+        self.get("/get_vote_result")
+        result = self.post("/execute")
+        if result["executed_player"] != -1:
+            self.someone_die(result["executed_player"], "被投票处决")
+
+    def end_day(self):
+        self.post("/toggle_day_night")
+        self.deaths = []
+
+
+class ResourceSampler(threading.Thread):
+    """定时采样服务进程的CPU占用（单核百分比）和常驻内存，优先使用 psutil，否则读取 /proc"""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []  # [(cpu_percent, rss_mb)]
+        self.stop = threading.Event()
+
+    def cpu_seconds(self):
+        if psutil:
+            times = psutil.Process(self.pid).cpu_times()
+            return times.user + times.system
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def rss_mb(self):
+        if psutil:
+            return psutil.Process(self.pid).memory_info().rss / 2 ** 20
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return 0
+
+    def run(self):
+        try:
+            last_cpu, last_time = self.cpu_seconds(), time.perf_counter()
+            while not self.stop.wait(self.interval):
+                cpu, now = self.cpu_seconds(), time.perf_counter()
+                self.samples.append(((cpu - last_cpu) / (now - last_time) * 100, self.rss_mb()))
+                last_cpu, last_time = cpu, now
+        except SAMPLE_ERRORS:
+            pass
+
+    def report(self):
+        if not self.samples:
+            return None
+        cpu = [sample[0] for sample in self.samples]
+        rss = [sample[1] for sample in self.samples]
+        return {
+            "cpu_percent_avg": round(sum(cpu) / len(cpu), 1),
+            "cpu_percent_max": round(max(cpu), 1),
+            "rss_mb_max": round(max(rss), 1),
+            "rss_mb_end": round(rss[-1], 1),
+        }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(path, port):
+    """在临时目录中启动 web.py，等到可以响应请求"""
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "web:app", "--host", "127.0.0.1", "--port", str(port),
+         "--timeout-keep-alive", str(REQUEST_TIMEOUT), "--log-level", "warning"],
+        cwd=path, env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"web.py 启动失败，退出码 {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/metrics")
+            conn.getresponse().read()
+            conn.close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("web.py 在30秒内没有响应")
+
+
+def run_load(url, pid, args):
+    stats = Stats()
+    stop = threading.Event()
+    clients = [DriverClient(url, stats, stop, args.max_days) for _ in range(args.drivers)]
+    clients += [SpectatorClient(url, stats, stop, args.poll_interval) for _ in range(args.spectators)]
+    threads = [threading.Thread(target=client.run, daemon=True) for client in clients]
+    sampler = ResourceSampler(pid) if pid else None
+    if sampler:
+        sampler.start()
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(args.duration)
+    stop.set()
+    duration = time.perf_counter() - begin
+    for thread in threads:
+        # 正在等待模型响应的请求不再等待，只统计已完成的请求
+        thread.join(timeout=5)
+    if sampler:
+        sampler.stop.set()
+        sampler.join()
+    report = stats.report(duration)
+    report["duration"] = round(duration, 2)
+    report["server"] = sampler.report() if sampler else None
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['duration']}秒 共{report['requests']}个请求，{report['rps']} 请求/秒，"
+          f"错误率 {report['error_rate']:.2%}，完成 {report['games_finished']} 局")
+    print(f"{'接口':<26}{'请求数':>8}{'请求/秒':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'错误率':>9}")
+    for endpoint, item in report["endpoints"].items():
+        print(f"{endpoint:<26}{item['requests']:>8}{item['rps']:>10}{item['p50_ms']:>10}{item['p95_ms']:>10}"
+              f"{item['p99_ms']:>10}{item['error_rate']:>9.2%}")
+    server = report["server"]
+    if server:
+        print(f"服务进程: CPU 平均 {server['cpu_percent_avg']}% 最高 {server['cpu_percent_max']}%，"
+              f"内存最高 {server['rss_mb_max']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟多个前端客户端并发请求 web.py")
+    parser.add_argument("--drivers", type=int, default=1, help="按 action.js 顺序驱动对局的客户端数")
+    parser.add_argument("--spectators", type=int, default=20, help="轮询状态的观战客户端数")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="观战客户端两次请求之间的间隔（秒）")
+    parser.add_argument("--duration", type=float, default=30, help="压测时长（秒）")
+    parser.add_argument("--max-days", type=int, default=20, help="驱动客户端超过这个天数后重新开局")
+    parser.add_argument("--latency", type=int, default=0, help="mock 模型每次调用的延迟（毫秒）")
+    parser.add_argument("--url", default=None, help="压测已经运行的服务，不再启动新的服务进程")
+    parser.add_argument("--pid", type=int, default=None, help="配合 --url 指定服务进程，用于采样CPU和内存")
+    parser.add_argument("--output", default=None, help="把结果保存为JSON")
+    args = parser.parse_args()
+
+    if args.url:
+        report = run_load(args.url.rstrip("/"), args.pid, args)
+    else:
+        model_name = f"mock/{args.latency}" if args.latency else "mock"
+        with workspace(model_name, chdir=False) as path:
+            port = free_port()
+            server = start_server(path, port)
+            try:
+                report = run_load(f"http://127.0.0.1:{port}", server.pid, args)
+            finally:
+                server.terminate()
+                server.wait(timeout=10)
+    report["args"] = vars(args)
+
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+基准和压测共用的临时工作目录
+游戏从当前目录读取 config.json、prompts/，web.py 挂载 public/，日志写入 logs/；
+在临时目录中生成只使用指定模型的 config.json，提示词和前端目录链接到仓库，不影响仓库里的配置和日志
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench_config(model_name):
+    """所有玩家和裁判使用同一个模型，日志只保留警告"""
+    return {
+        "players": [{"model_name": model_name, "api_key": ""} for _ in range(9)],
+        "judge": {"model_name": model_name, "api_key": ""},
+        "randomize_roles": True,
+        "randomize_position": True,
+        "logging": {"level": "WARNING", "file_level": "WARNING", "file": "logs/wolf_bot.jsonl"},
+    }
+
+
+@contextlib.contextmanager
+def workspace(model_name, chdir=True):
+    """返回临时目录的路径，chdir 为 True 时在其中运行，结束后回到原目录"""
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="wolf_bot_bench_") as path:
+        for name in ("prompts", "public"):
+            os.symlink(os.path.join(ROOT, name), os.path.join(path, name))
+        os.makedirs(os.path.join(path, "logs"))
+        with open(os.path.join(path, "config.json"), "w", encoding="utf-8") as f:
+            json.dump(bench_config(model_name), f, ensure_ascii=False, indent=2)
+        if chdir:
+            os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(previous)
@@ -0,0 +1,195 @@
+"""
+token用量与费用账本
+各提供商在响应中返回的 usage（输入、输出、推理、缓存命中token）在每次 get_response 中收集，
+提供商没有返回时按文本本地估算；再按模型价格表计算费用，记入当前对局的账本，
+可以按玩家、行动、模型汇总。
+
+config.json（价格为每百万token，缺省的模型不计费用，只统计token）:
+    "cost": {"currency": "USD", "prices": {"gpt-4o": {"input": 2.5, "output": 10, "cached_input": 1.25}}}
+"""
+
+import contextlib
+import contextvars
+import threading
+import time
+
+from providers import provider_for_model
+from token_budget import estimate_tokens
+
+# 各模型的公开标价（美元/每百万token），按需在 config.json 中覆盖或补充
+DEFAULT_PRICES = {
+    "gpt-4o": {"input": 2.5, "output": 10, "cached_input": 1.25},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.6, "cached_input": 0.075},
+    "gpt-4.1": {"input": 2, "output": 8, "cached_input": 0.5},
+    "gpt-4.1-mini": {"input": 0.4, "output": 1.6, "cached_input": 0.1},
+    "gpt-4.1-nano": {"input": 0.1, "output": 0.4, "cached_input": 0.025},
+    "o1-mini": {"input": 1.1, "output": 4.4, "cached_input": 0.55},
+    "o3-mini": {"input": 1.1, "output": 4.4, "cached_input": 0.55},
+    "o4-mini": {"input": 1.1, "output": 4.4, "cached_input": 0.275},
+    "deepseek-chat": {"input": 0.27, "output": 1.1, "cached_input": 0.07},
+    "deepseek-reasoner": {"input": 0.55, "output": 2.19, "cached_input": 0.14},
+    "grok-3-latest": {"input": 3, "output": 15},
+    "grok-3-mini-beta": {"input": 0.3, "output": 0.5},
+    "grok-3-mini-fast-beta": {"input": 0.6, "output": 4},
+}
+DEFAULT_CURRENCY = "USD"
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "reasoning_tokens", "cached_tokens")
+
+# 当前 get_response 的用量记录；请求在批处理、对冲线程中执行时复制上下文，仍写入同一个记录
+_usage = contextvars.ContextVar("llm_usage", default=None)
+# 当前的账本和归属（玩家、行动）
+_scope = contextvars.ContextVar("cost_scope", default=None)
+# 当前上下文中最近一次 get_response 的用量，调用方用它记录实际的输出token数
+_last_usage = contextvars.ContextVar("llm_last_usage", default=None)
+
+
+def _get(obj, *names):
+    """从 SDK 对象或字典中取第一个存在的字段"""
+    for name in names:
+        value = obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+        if value is not None:
+            return value
+    return None
+
+
+def normalize_usage(usage):
+    """
+    把各提供商的 usage 统一成 {prompt_tokens, completion_tokens, reasoning_tokens, cached_tokens}
+    兼容 OpenAI 风格（prompt_tokens / completion_tokens_details.reasoning_tokens）和 DashScope 风格（input_tokens / output_tokens）
+    """
+    if not usage:
+        return None
+    prompt = _get(usage, "prompt_tokens", "input_tokens")
+    completion = _get(usage, "completion_tokens", "output_tokens")
+    if prompt is None and completion is None:
+        return None
+    completion_details = _get(usage, "completion_tokens_details", "output_tokens_details") or {}
+    prompt_details = _get(usage, "prompt_tokens_details", "input_tokens_details") or {}
+    return {
+        "prompt_tokens": prompt or 0,
+        "completion_tokens": completion or 0,
+        "reasoning_tokens": _get(completion_details, "reasoning_tokens") or 0,
+        "cached_tokens": _get(prompt_details, "cached_tokens") or _get(usage, "prompt_cache_hit_tokens") or 0,
+    }
+
+
+def new_usage():
+    """get_response 开始时调用，之后 report_usage 报告的用量都累加到返回的记录里（重试和对冲请求都计入）"""
+    usage = {"calls": 0}
+    _usage.set(usage)
+    return usage
+
+
+def report_usage(usage):
+    """提供商实现在收到响应的 usage 时调用"""
+    usage = normalize_usage(usage)
+    current = _usage.get()
+    if usage is None or current is None:
+        return
+    current["calls"] += 1
+    for field in USAGE_FIELDS:
+        current[field] = current.get(field, 0) + usage[field]
+
+
+def finish_usage(usage, model_name, message, chat_history, resp, reason):
+    """返回本次 get_response 的用量，提供商没有报告时按文本估算，source 标明来源"""
+    if usage["calls"]:
+        return dict({field: usage.get(field, 0) for field in USAGE_FIELDS}, source="reported")
+    provider = provider_for_model(model_name)
+    reasoning = estimate_tokens(reason, provider)
+    return {
+        "prompt_tokens": estimate_tokens(message, provider) + sum(estimate_tokens(msg["content"], provider) for msg in chat_history),
+        "completion_tokens": estimate_tokens(resp, provider) + reasoning,
+        "reasoning_tokens": reasoning,
+        "cached_tokens": 0,
+        "source": "estimated",
+    }
+
+
+def set_last_usage(usage):
+    _last_usage.set(usage)
+
+
+def last_usage():
+    """当前上下文中最近一次 get_response 的用量（finish_usage 的结果），请求失败且没有用量时为 None"""
+    return _last_usage.get()
+
+
+@contextlib.contextmanager
+def ledger_scope(ledger, **fields):
+    """在这个范围内的模型调用记入 ledger，fields 为归属（如 player、action），嵌套时合并"""
+    parent = _scope.get()
+    if parent and parent[0] is ledger:
+        fields = {**parent[1], **fields}
+    token = _scope.set((ledger, fields))
+    try:
+        yield ledger
+    finally:
+        _scope.reset(token)
+
+
+def record_call(model_name, usage):
+    """记入当前范围的账本，没有账本时忽略"""
+    scope = _scope.get()
+    if scope is None:
+        return None
+    ledger, fields = scope
+    return ledger.record(model_name, usage, **fields)
+
+
+class CostLedger:
+    """一局游戏的用量和费用明细"""
+
+    def __init__(self, config=None):
+        config = (config or {}).get("cost", {})
+        self.currency = config.get("currency", DEFAULT_CURRENCY)
+        self.prices = dict(DEFAULT_PRICES, **config.get("prices", {}))
+        self.entries = []
+        self.lock = threading.Lock()
+
+    def price(self, model_name, usage):
+        """按每百万token的价格计算费用，价格表中没有的模型返回 None"""
+        price = self.prices.get(model_name)
+        if not price:
+            return None
+        cached = min(usage["cached_tokens"], usage["prompt_tokens"])
+        cost = (usage["prompt_tokens"] - cached) * price.get("input", 0) \
+            + cached * price.get("cached_input", price.get("input", 0)) \
+            + usage["completion_tokens"] * price.get("output", 0)
+        return cost / 1_000_000
+
+    def record(self, model_name, usage, **fields):
+        entry = dict(fields, model=model_name, time=time.time(), cost=self.price(model_name, usage), **usage)
+        with self.lock:
+            self.entries.append(entry)
+        return entry
+
+    def summary(self):
+        """总计以及按玩家、行动、模型的汇总"""
+        with self.lock:
+            entries = list(self.entries)
+        groups = {"total": {}, "players": {}, "actions": {}, "models": {}}
+        unpriced = set()
+        for entry in entries:
+            if entry["cost"] is None:
+                unpriced.add(entry["model"])
+            targets = [groups["total"],
+                       groups["players"].setdefault(str(entry.get("player", "")), {}),
+                       groups["actions"].setdefault(entry.get("action", ""), {}),
+                       groups["models"].setdefault(entry["model"], {})]
+            for item in targets:
+                item["calls"] = item.get("calls", 0) + 1
+                for field in USAGE_FIELDS:
+                    item[field] = item.get(field, 0) + entry[field]
+                item["estimated_calls"] = item.get("estimated_calls", 0) + (entry["source"] == "estimated")
+                item["cost"] = round(item.get("cost", 0) + (entry["cost"] or 0), 6)
+        groups["currency"] = self.currency
+        groups["unpriced_models"] = sorted(unpriced)
+        return groups
+
+    def report(self):
+        """汇总和逐次调用的明细，写入回放"""
+        with self.lock:
+            entries = list(self.entries)
+        return {"summary": self.summary(), "entries": entries}
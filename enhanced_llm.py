@@ -4,6 +4,7 @@
 """
 
 from llm import BaseLlm, BuildModel as OriginalBuildModel
+from providers import registry
 import os
 import json
 from typing import Dict, Any, Optional
@@ -13,74 +14,9 @@ class EnhancedLlmManager:
 
     def __init__(self):
         self.api_keys = self._load_api_keys()
-        self.provider_configs = {
-            "openai": {
-                "models": ["gpt-4o", "gpt-4o-mini", "gpt-4.1", "gpt-4.1-mini", "o1-mini", "o3-mini", "o4-mini"],
-                "env_key": "OPENAI_API_KEY",
-                "base_url": "https://api.openai.com/v1"
-            },
-            "deepseek": {
-                "models": ["deepseek-chat", "deepseek-reasoner"],
-                "env_key": "DEEPSEEK_API_KEY",
-                "base_url": "https://api.deepseek.com"
-            },
-            "qwen": {
-                "models": ["qwen-max", "qwen-plus", "qwen-long", "qwen-max-longcontext", "qwen-max-2025-01-25"],
-                "env_key": "QWEN_API_KEY",
-                "base_url": "https://dashscope.aliyuncs.com/compatible-mode/v1"
-            },
-            "zhipuai": {
-                "models": ["glm-3-turbo", "glm-4", "glm-4v", "glm-4-plus"],
-                "env_key": "ZHIPUAI_API_KEY",
-                "base_url": "https://open.bigmodel.cn/api/paas/v4"
-            },
-            "moonshot": {
-                "models": ["moonshot-v1-32k"],
-                "env_key": "MOONSHOT_API_KEY",
-                "base_url": "https://api.moonshot.cn/v1"
-            },
-            "doubao": {
-                "models": ["ep-20250114111111-example"],  # 需要具体endpoint
-                "env_key": "DOUBAO_API_KEY",
-                "base_url": "https://ark.cn-beijing.volces.com/api/v3"
-            },
-            "hunyuan": {
-                "models": ["hunyuan-large", "hunyuan-turbo-latest"],
-                "env_key": "HUNYUAN_API_KEY",
-                "base_url": "https://api.hunyuan.cloud.tencent.com/v1"
-            },
-            "baichuan": {
-                "models": ["Baichuan4", "Baichuan3-Turbo", "Baichuan3-Turbo-128k", "Baichuan2-Turbo", "Baichuan2-Turbo-192k"],
-                "env_key": "BAICHUAN_API_KEY",
-                "base_url": "https://api.baichuan-ai.com/v1"
-            },
-            "xai": {
-                "models": ["grok-3-latest", "grok-3-mini-beta", "grok-3-mini-fast-beta"],
-                "env_key": "XAI_API_KEY",
-                "base_url": "https://api.x.ai/v1"
-            },
-            "siliconflow": {
-                "models": ["deepseek-ai/DeepSeek-R1", "Pro/deepseek-ai/DeepSeek-R1"],
-                "env_key": "SILICONFLOW_API_KEY",
-                "base_url": "https://api.siliconflow.cn/v1"
-            },
-            "openrouter": {
-                "models": [
-                    "openrouter/google/gemini-2.5-pro-exp-03-25:free",
-                    "openrouter/anthropic/claude-3.7-sonnet",
-                    "openrouter/anthropic/claude-3.7-sonnet:thinking",
-                    "openrouter/moonshotai/kimi-vl-a3b-thinking:free",
-                    "openrouter/deepseek/deepseek-r1:free"
-                ],
-                "env_key": "OPENROUTER_API_KEY",
-                "base_url": "https://openrouter.ai/api/v1"
-            },
-            "m302ai": {
-                "models": ["m302/o3-mini", "m302/o3-mini-2025-01-31", "gemini-2.0-flash-thinking-exp-01-21", "claude-3-7-sonnet-latest", "claude-3-7-sonnet-thinking"],
-                "env_key": "M302AI_API_KEY",
-                "base_url": "https://api.302.ai"
-            }
-        }
+        # 提供商目录统一在 providers.py 中维护
+        registry.load_plugins()
+        self.provider_configs = registry.providers
 
     def _load_api_keys(self) -> Dict[str, str]:
         """从.env文件加载API密钥"""
@@ -100,17 +36,14 @@ class EnhancedLlmManager:
 
     def get_api_key(self, provider: str) -> Optional[str]:
         """获取指定提供商的API密钥"""
-        if provider in self.provider_configs:
-            env_key = self.provider_configs[provider]["env_key"]
+        env_key = self.provider_configs.get(provider, {}).get("env_key")
+        if env_key:
             return self.api_keys.get(env_key)
         return None
 
     def get_provider_for_model(self, model_name: str) -> Optional[str]:
         """根据模型名称获取提供商"""
-        for provider, config in self.provider_configs.items():
-            if model_name in config["models"]:
-                return provider
-        return None
+        return registry.provider_for_model(model_name)
 
     def build_model_with_auto_key(self, model_name: str, api_key: str = None, force_json: bool = False):
         """自动获取API密钥并构建模型"""
@@ -207,7 +140,7 @@ def list_supported_models():
     for provider, config in enhanced_manager.provider_configs.items():
         print(f"\n📌 {provider.upper()}")
         print(f"   模型: {', '.join(config['models'][:3])}{'...' if len(config['models']) > 3 else ''}")
-        print(f"   环境变量: {config['env_key']}")
+        print(f"   环境变量: {config.get('env_key', '无')}")
         has_key = enhanced_manager.get_api_key(provider) is not None
         print(f"   API密钥: {'✅ 已配置' if has_key else '❌ 未配置'}")
 
@@ -1,11 +1,35 @@
 from role import *
 from history import *
 from judge import *
+from token_budget import TokenBudgetManager
+from summary import RollingSummary, build_summarizer, SUMMARY_KEEP_RECENT_ROUNDS
+from session import ChatSession
+from output_budget import OutputBudget
+from prompt_tier import PromptTierSelector
+from routing import ModelRouter, RouteStats
+from log import configure_logging
+from tracing import span
+import tracing
+import metrics
+import profiling
+from action_validator import ActionValidator
+from cost import CostLedger, ledger_scope
+import rate_limit
+import resilience
+import local_pool
 import random
 import json
 import os
+import time
+import logging
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# /metrics 中阶段耗时的标签
+PHASE_LABELS = {"夜晚": "night", "白天": "day"}
+
+
 #WerewolfGame负责保存游戏状态，游戏逻辑由前端脚本负责
 class WerewolfGame:
     def __init__(self):
@@ -16,6 +40,20 @@ class WerewolfGame:
         self.vote_result = []
         self.wolf_want_kill = {}
         self.start_time = datetime.now().strftime("%Y%m%d%H%M")
+        self.config = {}
+        self.token_budget = TokenBudgetManager()
+        self.output_budget = OutputBudget()
+        self.prompt_tiers = PromptTierSelector()
+        self.route_stats = RouteStats()
+        self.summary_keep_recent = SUMMARY_KEEP_RECENT_ROUNDS
+        # 响应格式有误时追问缺少字段、重新请求整个提示词的次数
+        self.parse_recovery = {"followup": 0, "reprompt": 0}
+        self.action_validator = ActionValidator()
+        # 每次模型调用的token用量和费用
+        self.cost_ledger = CostLedger()
+        # 是否计入 /metrics 的进行中游戏数，以及当前白天/夜晚阶段开始的时间
+        self.active = False
+        self.phase_started = None
 
         # 创建logs目录（如果不存在）
         if not os.path.exists('logs'):
@@ -24,14 +62,31 @@ class WerewolfGame:
     def dump_history(self):
         self.history.dump()
 
-    def start(self):
+    def start(self, game_id=None):
+        """game_id 用于同时运行多局时区分日志文件名"""
         self.history = History()
         self.vote_result = []
         self.wolf_want_kill = {}
         self.current_day = 1  # 游戏开始时,设置为第1天
         self.current_phase = "夜晚"  # 初始化当前阶段为夜晚
+        # 上一局没有结束就重新开局时，保存上一局的剖析结果
+        profiling.finish_game(self.start_time)
         self.start_time = datetime.now().strftime("%Y%m%d%H%M")
+        if game_id is not None:
+            self.start_time += f"_{game_id}"
         self.initialize_roles()
+        self.token_budget = TokenBudgetManager(self.config)
+        self.output_budget = OutputBudget(self.config)
+        self.prompt_tiers = PromptTierSelector(self.config)
+        self.route_stats = RouteStats()
+        self.parse_recovery = {"followup": 0, "reprompt": 0}
+        self.action_validator = ActionValidator(self.config)
+        self.cost_ledger = CostLedger(self.config)
+        self.set_active(True)
+        self.phase_started = time.perf_counter()
+        profiling.memory_snapshot(self.start_time, "start")
+        self.initialize_summaries()
+        self.initialize_sessions()
         display_config = {
             "display_role": True,
             "display_thinking": True,
@@ -82,6 +137,14 @@ class WerewolfGame:
         # 读取配置文件决定每个玩家使用的模型
         with open('config.json', 'r', encoding='utf-8') as f:
             config = json.load(f)
+        self.config = config
+        # 创建模型之前应用 config.json 中的日志和限流覆盖配置
+        configure_logging(config)
+        tracing.configure(config)
+        profiling.configure(config)
+        rate_limit.configure(config)
+        resilience.configure(config)
+        local_pool.configure(config)
         
         # 新增：模型分配逻辑
         if config.get("random_model") and config.get("models"):
@@ -123,9 +186,13 @@ class WerewolfGame:
             role(i + 1, config["players"][i]["model_name"], config["players"][i]["api_key"], self) 
             for i, role in enumerate(roles)
         ]
+        # 可选的按行动路由，跟随玩家配置（在随机排序之前设置）
+        for i, player in enumerate(self.players):
+            if config["players"][i].get("routes"):
+                player.router = ModelRouter(player.model, config["players"][i]["routes"])
         
         if config["randomize_position"]:
-            print("随机排序玩家")
+            logger.info("随机排序玩家")
             random.shuffle(self.players)
             for i, player in enumerate(self.players):
                 player.player_index = i + 1
@@ -133,18 +200,61 @@ class WerewolfGame:
         with open(f'logs/result_{self.start_time}.txt', 'a', encoding='utf-8') as log_file:
             for player in self.players:
                 log_file.write(f"{player.player_index}号玩家的角色是{player.role_type}, 模型使用{player.model.model_name}\n")
-                print(f"{player.player_index}号玩家的角色是{player.role_type}, 模型使用{player.model.model_name}")
+                logger.info(f"{player.player_index}号玩家的角色是{player.role_type}, 模型使用{player.model.model_name}")
             
         # 创建判决者
         self.judge = Judge(self, config["judge"]["model_name"], config["judge"]["api_key"])
 
+    def initialize_summaries(self):
+        '''按配置为每个AI玩家创建滚动摘要，整局共用一个摘要器'''
+        summary_config = self.config.get("history_summary", {})
+        self.summary_keep_recent = summary_config.get("keep_recent_rounds", SUMMARY_KEEP_RECENT_ROUNDS)
+        summarizer = build_summarizer(self.config)
+        if summarizer is None:
+            return
+        rolling = summary_config.get("summarizer", "scripted") == "llm"
+        for player in self.players:
+            if player.model.model_name != "human":
+                player.history_summary = RollingSummary(player, summarizer, rolling)
+
+    def initialize_sessions(self):
+        '''开启 chat_session 后，支持多轮对话的模型使用固定前缀的会话以命中提供商的前缀缓存'''
+        if not self.config.get("chat_session"):
+            return
+        for player in self.players:
+            if player.model.supports_chat_history:
+                player.session = ChatSession(player)
+
+    def set_active(self, active):
+        if active != self.active:
+            self.active = active
+            metrics.active_games.inc(1 if active else -1)
+            if not active:
+                self.output_budget.flush()
+                profiling.finish_game(self.start_time)
+
     def toggle_day_night(self):
+        if self.phase_started is not None:
+            now = time.perf_counter()
+            metrics.phase_seconds.observe(now - self.phase_started, phase=PHASE_LABELS.get(self.current_phase, self.current_phase))
+            self.phase_started = now
+        # 本阶段记录的输出长度写回统计文件
+        self.output_budget.flush()
         self.history.toggle_day_night()
+        if self.history.is_daytime:
+            # 上一个回合已经结束，在后台更新摘要
+            finished = len(self.history.rounds) - 2
+            for player in self.players:
+                if player.history_summary:
+                    # 后台线程复制提交时的上下文，摘要请求记在该玩家名下
+                    with ledger_scope(self.cost_ledger, player=player.player_index, role=player.role_type, action="summary"):
+                        player.history_summary.submit(finished)
         if self.current_phase == "白天":
             self.current_phase = "夜晚"
         else:
             self.current_phase = "白天"
             self.current_day += 1  # 每当从夜晚切换到白天时,天数加1
+        profiling.memory_snapshot(self.start_time, f"day{self.current_day}_{PHASE_LABELS[self.current_phase]}")
         
     def get_players(self):
         players = {}
@@ -171,22 +281,24 @@ class WerewolfGame:
     
     def divine(self, player_idx):
         # 预言家揭示身份逻辑
-        resp = self.players[player_idx-1].divine()
+        with span("divine", trace=self.start_time, player=player_idx):
+            resp = self.players[player_idx-1].divine()
         return resp
     
     def decide_kill(self, player_idx, kill_id, is_second_vote=False):
         # 决定杀谁
-        if is_second_vote:
-            # 将字典转换为对象列表
-            kill_list = [{"player_index": idx, "kill": info["kill"], "reason": info["reason"]} 
-                        for idx, info in self.wolf_want_kill.items()]
-            result = self.players[player_idx-1].decide_kill(kill_id, kill_list)
-        else:
-            result = self.players[player_idx-1].decide_kill(kill_id)
+        with span("decide_kill", trace=self.start_time, player=player_idx, second_vote=is_second_vote):
+            if is_second_vote:
+                # 将字典转换为对象列表
+                kill_list = [{"player_index": idx, "kill": info["kill"], "reason": info.get("reason", "")} 
+                            for idx, info in self.wolf_want_kill.items()]
+                result = self.players[player_idx-1].decide_kill(kill_id, kill_list)
+            else:
+                result = self.players[player_idx-1].decide_kill(kill_id)
         
         self.wolf_want_kill[player_idx] = {
             "kill": result["kill"],
-            "reason": result["reason"]
+            "reason": result.get("reason", "")
         }
         
         return result
@@ -203,7 +315,7 @@ class WerewolfGame:
                     vote_count[target] = 1
         
         if not vote_count:  # 如果没有有效投票
-            print("没有有效投票")
+            logger.info("没有有效投票")
             return -1
         
         # 找出最高票数
@@ -216,8 +328,7 @@ class WerewolfGame:
         if len(candidates) == 1:
             return candidates[0]
 
-        print("多人投票一致")
-        print(candidates)
+        logger.info(f"多人得票相同: {candidates}")
         return -1
     
     def kill(self, player_idx):
@@ -228,7 +339,8 @@ class WerewolfGame:
         
     def decide_cure_or_poison(self, player_idx):
         someone_will_be_killed = self.get_wolf_want_kill()
-        result = self.players[player_idx-1].decide_cure_or_poison(someone_will_be_killed)
+        with span("decide_cure_or_poison", trace=self.start_time, player=player_idx):
+            result = self.players[player_idx-1].decide_cure_or_poison(someone_will_be_killed)
         return result
     
     def poison(self, player_idx):
@@ -238,12 +350,14 @@ class WerewolfGame:
         self.players[player_idx-1].be_cured()
         
     def speak(self, player_idx, content=None):            
-        resp = self.players[player_idx-1].speak(content)
+        with span("speak", trace=self.start_time, player=player_idx):
+            resp = self.players[player_idx-1].speak(content)
         return resp
     
     def vote(self, player_idx, vote_id) -> int:
         # 投票逻辑
-        result = self.players[player_idx-1].vote(vote_id)
+        with span("vote", trace=self.start_time, player=player_idx):
+            result = self.players[player_idx-1].vote(vote_id)
         vote_id = result["vote"]
         
         #记录投票结果
@@ -263,11 +377,13 @@ class WerewolfGame:
 
     def last_words(self, player_idx, speak, death_reason):
         # 最后发言            
-        resp = self.players[player_idx-1].last_words(speak, death_reason)
+        with span("last_words", trace=self.start_time, player=player_idx):
+            resp = self.players[player_idx-1].last_words(speak, death_reason)
         return resp
 
     def revenge(self, player_idx, death_reason):
-        resp = self.players[player_idx-1].revenge(death_reason)
+        with span("revenge", trace=self.start_time, player=player_idx):
+            resp = self.players[player_idx-1].revenge(death_reason)
         return resp
     
     def execute(self, player_idx, vote_result):
@@ -287,10 +403,15 @@ class WerewolfGame:
     
     
     def check_winner(self) -> str:
+        result = self.decide_winner()
+        if result != '胜负未分':
+            self.set_active(False)
+        return result
+
+    def decide_winner(self) -> str:
         werewolf_count = sum(1 for player in self.players if player.role_type == '狼人' and player.is_alive)
         villager_count = sum(1 for player in self.players if player.role_type != '狼人' and player.is_alive)
-        print("--- 检查胜负 ----")
-        print(f"狼人数：{werewolf_count},村民数：{villager_count}")
+        logger.info(f"检查胜负: 狼人数{werewolf_count}, 村民数{villager_count}")
 
         if werewolf_count > villager_count:
             with open(f'logs/result_{self.start_time}.txt', 'a', encoding='utf-8') as log_file:
@@ -302,4 +423,5 @@ class WerewolfGame:
             return '村民胜利'
         if villager_count > werewolf_count:
             return '胜负未分'
-        return self.judge.decide()
\ No newline at end of file
+        with span("judge", trace=self.start_time):
+            return self.judge.decide()
\ No newline at end of file
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+无界面对局
+HeadlessGame 按 public/src/action.js 的行动顺序直接调用 WerewolfGame，不需要浏览器和网页服务；
+LockstepScheduler 让多局游戏按行动逐步同步推进，同一步里所有局对同一模型的请求合并成一批提交（见 batching.py），
+适合自托管模型的批量对局
+
+用法:
+    python headless.py --games 1
+    python headless.py --games 16 --mode lockstep --max-batch 16
+"""
+
+import argparse
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import batching
+import profiling
+from game import WerewolfGame
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DAYS = 20
+
+
+class HeadlessGame:
+    def __init__(self, game_id=None, max_days=DEFAULT_MAX_DAYS):
+        self.game = WerewolfGame()
+        self.game_id = game_id
+        self.max_days = max_days
+        self.winner = None
+        self.error = None
+        self.deaths = []
+
+    def start(self):
+        self.game.start(game_id=self.game_id)
+        if any(p["is_human"] for p in self.game.get_players().values()):
+            raise ValueError("无界面对局不支持人类玩家")
+
+    def find_role(self, role_type):
+        return [p for p in self.game.players if p.role_type == role_type]
+
+    def someone_die(self, player_idx, death_reason):
+        """与 game.js 的 someone_die 一致：第一天或白天被处决可以发表遗言，猎人非毒杀可以反击"""
+        game = self.game
+        self.deaths.append(player_idx)
+        if game.get_day() == 1 or (game.current_phase == "白天" and death_reason == "被投票处决"):
+            game.last_words(player_idx, "", death_reason)
+        hunter = self.find_role("猎人")[0]
+        if hunter.player_index == player_idx and death_reason != "被女巫毒杀":
+            result = game.revenge(player_idx, death_reason)
+            if result["attack"] != -1:
+                game.attack(result["attack"])
+                self.someone_die(result["attack"], "被猎人杀死")
+
+    def check_winner(self):
+        winner = self.game.check_winner()
+        if winner != "胜负未分":
+            self.winner = winner
+            return True
+        return False
+
+    def steps(self):
+        """
+        生成器，每完成 action.js 中的一个行动 yield 一次行动名；
+        死亡玩家的发言、投票等行动也会 yield，保证多局游戏的步骤一一对齐
+        """
+        game = self.game
+        n_players = len(game.players)
+        while game.get_day() <= self.max_days:
+            # DivineAction
+            seer = self.find_role("预言家")[0]
+            if seer.is_alive:
+                game.divine(seer.player_index)
+            yield "divine"
+
+            # WolfAction，每只狼人的投票各算一步
+            game.reset_wolf_want_kill()
+            wolves = self.find_role("狼人")
+            for wolf in wolves:
+                if wolf.is_alive:
+                    game.decide_kill(wolf.player_index, -100, False)
+                yield "kill"
+            if game.get_wolf_want_kill() == -1:
+                for wolf in wolves:
+                    if wolf.is_alive:
+                        game.decide_kill(wolf.player_index, -100, True)
+                    yield "kill_round2"
+
+            # WitchAction
+            killed = game.get_wolf_want_kill()
+            witch = self.find_role("女巫")[0]
+            if not witch.is_alive:
+                if killed != -1:
+                    game.kill(killed)
+                    self.someone_die(killed, "被狼人杀死")
+            else:
+                result = game.decide_cure_or_poison(witch.player_index)
+                if result["cure"] == 1:
+                    game.cure(killed)
+                elif killed != -1:
+                    game.kill(killed)
+                    self.someone_die(killed, "被狼人杀死")
+                if result["poison"] != -1:
+                    game.poison(result["poison"])
+                    self.someone_die(result["poison"], "被女巫毒杀")
+            yield "cure_or_poison"
+
+            if self.check_winner():
+                return
+
+            # EndNightAction
+            game.toggle_day_night()
+            game.reset_vote_result()
+            self.deaths = []
+
+            # SpeakAction / VoteAction
+            for player_idx in range(1, n_players + 1):
+                if game.players[player_idx - 1].is_alive:
+                    game.speak(player_idx)
+                yield "speak"
+            for player_idx in range(1, n_players + 1):
+                if game.players[player_idx - 1].is_alive:
+                    game.vote(player_idx, -100)
+                yield "vote"
+
+            # ExecuteAction，与 web.py 的 /execute 一致，平票或全部弃票不处决
+            vote_result = game.get_vote_result()
+            executed = execute_target(vote_result)
+            if executed != -1:
+                game.execute(executed, vote_result)
+                self.someone_die(executed, "被投票处决")
+            yield "execute"
+
+            if self.check_winner():
+                return
+
+            # EndDayAction
+            game.toggle_day_night()
+            self.deaths = []
+
+    def play(self):
+        """单独运行一局，返回胜负结果"""
+        with profiling.game_profiler(self.game.start_time).active():
+            for _ in self.steps():
+                pass
+        # 超过最大天数的对局没有分出胜负，也在这里保存剖析结果
+        profiling.finish_game(self.game.start_time)
+        return self.winner
+
+
+def execute_target(vote_result):
+    votes = {}
+    for vote in vote_result:
+        if vote["vote_id"] != -1:
+            votes[vote["vote_id"]] = votes.get(vote["vote_id"], 0) + 1
+    if not votes:
+        return -1
+    max_votes = max(votes.values())
+    voted_out = [player for player, count in votes.items() if count == max_votes]
+    return voted_out[0] if len(voted_out) == 1 else -1
+
+
+class LockstepScheduler:
+    """
+    多局游戏按步骤同步推进：每一步所有未结束的游戏在各自线程里执行同一个行动，
+    全部完成后再进入下一步；步骤内对同一模型的请求由 DecisionBatcher 合并提交
+    """
+
+    def __init__(self, games, max_batch=batching.DEFAULT_MAX_BATCH):
+        self.games = games
+        self.batcher = batching.DecisionBatcher(max_batch)
+        self.step_count = 0
+
+    def _advance(self, game, stepper):
+        self.batcher.register()
+        try:
+            with profiling.game_profiler(game.game.start_time).active():
+                next(stepper)
+            return True
+        except StopIteration:
+            profiling.finish_game(game.game.start_time)
+            return False
+        except Exception as e:
+            game.error = str(e)
+            logger.error(f"第{game.game_id}局出错: {e}")
+            return False
+        finally:
+            self.batcher.step_done()
+
+    def run(self):
+        steppers = {game: game.steps() for game in self.games}
+        active = list(self.games)
+        batching.install(self.batcher)
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.games), thread_name_prefix="game") as pool:
+                while active:
+                    self.batcher.begin_step(len(active))
+                    futures = [(game, pool.submit(self._advance, game, steppers[game])) for game in active]
+                    active = [game for game, future in futures if future.result()]
+                    self.step_count += 1
+        finally:
+            batching.install(None)
+            self.batcher.shutdown()
+        return self.batcher.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面运行狼人杀对局（读取当前目录的 config.json）")
+    parser.add_argument("--games", type=int, default=1, help="对局数")
+    parser.add_argument("--mode", choices=["sequential", "lockstep"], default="sequential",
+                        help="sequential 逐局运行；lockstep 多局同步推进并批量提交同一模型的请求")
+    parser.add_argument("--max-batch", type=int, default=batching.DEFAULT_MAX_BATCH, help="每批最多合并的请求数")
+    parser.add_argument("--max-days", type=int, default=DEFAULT_MAX_DAYS, help="超过这个天数的对局判为未结束")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果")
+    args = parser.parse_args()
+
+    games = [HeadlessGame(game_id=i, max_days=args.max_days) for i in range(args.games)]
+    # 开局会读取 config.json 并重置限流等全局配置，逐局完成
+    for game in games:
+        game.start()
+
+    begin = time.time()
+    batches = {}
+    if args.mode == "lockstep":
+        batches = LockstepScheduler(games, args.max_batch).run()
+    else:
+        for game in games:
+            try:
+                game.play()
+            except Exception as e:
+                game.error = str(e)
+                logger.error(f"第{game.game_id}局出错: {e}")
+    elapsed = time.time() - begin
+
+    results = {
+        "mode": args.mode,
+        "games": args.games,
+        "seconds": round(elapsed, 2),
+        "winners": [game.winner or "未结束" for game in games],
+        "errors": {game.game_id: game.error for game in games if game.error},
+        "batches": batches,
+        "cost": {game.game_id: game.game.cost_ledger.summary()["total"] for game in games},
+    }
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(f"\n=== {args.games}局 {args.mode} 用时 {elapsed:.1f}秒 ===")
+    for game in games:
+        total = results["cost"][game.game_id]
+        print(f"第{game.game_id}局: {game.winner or '未结束'}" + (f"（出错: {game.error}）" if game.error else "")
+              + f"  token {total.get('prompt_tokens', 0)}+{total.get('completion_tokens', 0)}  费用 {total.get('cost', 0)}")
+    for key, item in batches.items():
+        print(f"{key}: {item['batches']}批 {item['decisions']}次决策 平均每批{item['mean_size']} 最大{item['max_size']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,30 @@
 from datetime import datetime
 import time
 
+# 压缩历史时发言保留的最大字数
+BRIEF_SPEECH_LENGTH = 60
+
+# 压缩级别: 0 原文, 1 截断发言, 2 省略发言只保留出局/投票等关键事件
+COMPACT_NONE, COMPACT_TRUNCATE, COMPACT_DROP_SPEECH = 0, 1, 2
+
+# 事件编码: text 为完整中文描述, compact 为短编码（配合 EVENT_LEGEND 一起发给模型）
+ENCODING_TEXT, ENCODING_COMPACT = "text", "compact"
+
+# compact 编码的图例，每个提示词只出现一次（只包含公开事件，私密事件的编码见各事件类的 code）
+EVENT_LEGEND = {
+    "S3:内容": "3号发言",
+    "L3:内容": "3号遗言",
+    "K3": "3号夜晚出局",
+    "H3": "3号被猎人带走",
+    "X5|5<1,2|3<6|-<4": "5号被处决，票型：1号、2号投5号，6号投3号，4号弃票",
+}
+
+
+def truncate(text, limit=BRIEF_SPEECH_LENGTH):
+    text = str(text)
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
 class Event:
     def __init__(self, event_type, player_idx, timestamp=None):
         self.event_type = event_type  # 事件类型
@@ -12,6 +36,14 @@ class Event:
     def desc(self)->str:
         pass
 
+    def brief(self)->str:
+        """压缩历史时使用的简短描述"""
+        return self.desc()
+
+    def code(self, brief=False)->str:
+        """compact 编码下的短描述，含义见 EVENT_LEGEND"""
+        return self.brief() if brief else self.desc()
+
     def set_replay_data(self, **kwargs):
         """设置回放所需的数据"""
         self.game_data.update(kwargs)
@@ -25,6 +57,12 @@ class SpeakEvent(Event):
     def desc(self)->str:
         return f'【{self.player_idx}号玩家】发言: "{self.description})"'
 
+    def brief(self)->str:
+        return f'【{self.player_idx}号玩家】发言: "{truncate(self.description)}"'
+
+    def code(self, brief=False)->str:
+        return f'S{self.player_idx}:{truncate(self.description) if brief else self.description}'
+
 
 class VoteEvent(Event):
     def __init__(self, player_idx, target_idx):
@@ -37,9 +75,13 @@ class VoteEvent(Event):
             return f'【{self.player_idx}号玩家】在投票环节弃票'
         return f'【{self.player_idx}号玩家】投票给: 【{self.target_idx}号玩家】'
 
+    def code(self, brief=False)->str:
+        return f'V{self.player_idx}>{"-" if self.target_idx == -1 else self.target_idx}'
+
 class ExecuteEvent(Event):
     def __init__(self, player_idx,  vote_result):
         super().__init__("execute", player_idx)
+        self.votes = [{"player_idx": vote["player_idx"], "vote_id": vote["vote_id"]} for vote in vote_result]
         self.vote_result = []
         for vote in vote_result:
             vote_id = vote["vote_id"]
@@ -55,6 +97,15 @@ class ExecuteEvent(Event):
         desc_str += f'【{self.player_idx}号玩家】被处决.'
         return desc_str
 
+    def code(self, brief=False)->str:
+        # 按得票目标分组的票型矩阵，弃票记为 -
+        columns = {}
+        for vote in self.votes:
+            target = "-" if vote["vote_id"] == -1 else vote["vote_id"]
+            columns.setdefault(target, []).append(str(vote["player_idx"]))
+        matrix = "|".join(f'{target}<{",".join(voters)}' for target, voters in columns.items())
+        return f'X{self.player_idx}|{matrix}' if matrix else f'X{self.player_idx}'
+
 class AttackEvent(Event):
     def __init__(self, player_idx):
         super().__init__("attack", player_idx)
@@ -62,6 +113,9 @@ class AttackEvent(Event):
     def desc(self)->str:
         return f'【{self.player_idx}号玩家】被猎人反击杀死'
 
+    def code(self, brief=False)->str:
+        return f'H{self.player_idx}'
+
 class LastWordEvent(Event):
     def __init__(self, player_idx, description):
         super().__init__("last_word", player_idx)
@@ -69,6 +123,12 @@ class LastWordEvent(Event):
     def desc(self)->str:
         return f'【{self.player_idx}号玩家】最后发言: "{self.description}"'
 
+    def brief(self)->str:
+        return f'【{self.player_idx}号玩家】最后发言: "{truncate(self.description)}"'
+
+    def code(self, brief=False)->str:
+        return f'L{self.player_idx}:{truncate(self.description) if brief else self.description}'
+
 class KillEvent(Event):
     def __init__(self, player_idx):
         super().__init__("kill", player_idx)
@@ -76,6 +136,9 @@ class KillEvent(Event):
     def desc(self)->str:
         return f'【{self.player_idx}号玩家】被杀死'
 
+    def code(self, brief=False)->str:
+        return f'K{self.player_idx}'
+
 class CureEvent(Event):
     def __init__(self, player_idx):
         super().__init__("cure", player_idx)
@@ -84,6 +147,9 @@ class CureEvent(Event):
     def desc(self)->str:
         return f'{self.player_idx}号玩家】被女巫救治'
 
+    def code(self, brief=False)->str:
+        return f'C{self.player_idx}'
+
 class PoisonEvent(Event):
     def __init__(self, player_idx):
         super().__init__("poison", player_idx)
@@ -92,6 +158,9 @@ class PoisonEvent(Event):
     def desc(self)->str:
         return f'【{self.player_idx}号玩家】被投毒'
 
+    def code(self, brief=False)->str:
+        return f'P{self.player_idx}'
+
 # 新增回放专用事件类型
 class DivineEvent(Event):
     def __init__(self, player_idx, target_idx, result):
@@ -103,6 +172,9 @@ class DivineEvent(Event):
     def desc(self)->str:
         return f'【{self.player_idx}号预言家】查验了【{self.target_idx}号】玩家，结果是【{self.result}】'
 
+    def code(self, brief=False)->str:
+        return f'D{self.player_idx}>{self.target_idx}={self.result}'
+
 class WolfKillEvent(Event):
     def __init__(self, player_idx, target_idx, reason, round_num=1):
         super().__init__("wolf_kill", player_idx)
@@ -158,25 +230,28 @@ class Round:
         self.day_events = []
         self.night_events = []
 
-    def get_events(self, show_all = False):
+    def get_events(self, show_all = False, compact_level = COMPACT_NONE, encoding = ENCODING_TEXT):
         events = {
             "时间": f"第{self.day_count+1}天",
             "白天事件": [],
             "夜晚事件": []
         }
-        for event in self.day_events:
-            if show_all:
-                events["白天事件"].append(event.desc())
-            else:
-                if event.is_public:
-                    events["白天事件"].append(event.desc())
-        for event in self.night_events:
-            if show_all:
-                events["夜晚事件"].append(event.desc())
-            else:
-                if event.is_public:
-                    events["夜晚事件"].append(event.desc())
-        if self.day_count == 0:
+        for key, round_events in (("白天事件", self.day_events), ("夜晚事件", self.night_events)):
+            omitted = 0
+            for event in round_events:
+                if not show_all and not event.is_public:
+                    continue
+                if compact_level >= COMPACT_DROP_SPEECH and event.event_type in ("speak", "last_word"):
+                    omitted += 1
+                elif encoding == ENCODING_COMPACT:
+                    events[key].append(event.code(brief=compact_level >= COMPACT_TRUNCATE))
+                elif compact_level >= COMPACT_TRUNCATE:
+                    events[key].append(event.brief())
+                else:
+                    events[key].append(event.desc())
+            if omitted:
+                events[key].append(f"（省略了{omitted}条较早的发言）")
+        if self.day_count == 0 and encoding == ENCODING_TEXT:
             events["白天事件"].append("此时游戏还没开始,不会发言和投票事件")
         
         if not events["白天事件"]:
@@ -208,15 +283,25 @@ class History:
         if self.is_recording:
             self.rounds[self.day_count].add_event(self.is_daytime, event)
 
-    def get_history(self, show_all = False):
+    def get_history(self, show_all = False, compact_level = COMPACT_NONE, keep_recent = 0, encoding = ENCODING_TEXT):
         '''
         构造一个事件列表
+        compact_level 只作用于最近 keep_recent 个回合之前的回合
         '''
         history = []
-        for round in self.rounds:
-            history.append(round.get_events(show_all))
+        n_older = max(len(self.rounds) - keep_recent, 0)
+        for i, round in enumerate(self.rounds):
+            history.append(round.get_events(show_all, compact_level if i < n_older else COMPACT_NONE, encoding))
         return history
 
+    def iter_events(self):
+        '''
+        按时间顺序遍历所有事件（每个回合先白天后夜晚），新事件总是出现在末尾
+        '''
+        for round in self.rounds:
+            yield from round.day_events
+            yield from round.night_events
+
     def toggle_day_night(self):
         self.is_daytime = not self.is_daytime
         if self.is_daytime:
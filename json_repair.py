@@ -0,0 +1,200 @@
+"""
+模型输出的JSON容错解析
+先按标准JSON解析，失败时在本地修复常见问题后再解析，避免为了格式问题重新请求整个提示词：
+```json 代码块、前后多余文字、尾随逗号、未加引号的键、单引号和中文引号、全角冒号逗号、
+# 注释、字符串中未转义的双引号、Python 的 True/False/None，以及输出被截断时未闭合的字符串和括号
+"""
+
+import json
+import re
+
+_FENCE_PATTERN = re.compile(r'```(?:json)?\s*([\s\S]*?)\s*```', re.IGNORECASE)
+# 字符串开始引号 -> 结束引号
+_QUOTES = {'"': '"', "'": "'", '“': '”', '‘': '’'}
+_FULLWIDTH = {'：': ':', '，': ','}
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+_STRUCTURE = set('{}[],:"\'“”‘’：，#') | {' ', '\t', '\r', '\n'}
+_CLOSERS = {'{': '}', '[': ']'}
+_UNQUOTED_KEY = re.compile(r'\s*[^\s{}\[\],:"\'“”‘’：，#]+\s*[:：]')
+
+
+def extract_block(text):
+    """去掉 ```json 代码块和JSON前后的说明文字"""
+    match = _FENCE_PATTERN.search(text)
+    if match:
+        text = match.group(1)
+    start = text.find('{')
+    if start == -1:
+        return text.strip()
+    end = text.rfind('}')
+    # 没有结束括号时可能是被截断了，保留到结尾交给修复
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def _next_significant(text, i):
+    while i < len(text) and text[i] in ' \t\r\n':
+        i += 1
+    return text[i] if i < len(text) else ''
+
+
+def _last_significant(out):
+    for piece in reversed(out):
+        stripped = piece.rstrip()
+        if stripped:
+            return stripped[-1]
+    return ''
+
+
+def _strip_trailing_comma(out):
+    while out and not out[-1].strip():
+        out.pop()
+    if out and out[-1] == ',':
+        out.pop()
+
+
+def _close_allowed(text, i):
+    """i 处的引号后面是否像JSON结构：结尾、冒号、括号，或逗号后面紧跟下一个键/值"""
+    nxt = _next_significant(text, i)
+    if nxt in ('', '}', ']', ':', '：'):
+        return True
+    if nxt in (',', '，'):
+        j = text.index(nxt, i) + 1
+        after = _next_significant(text, j)
+        return after in _QUOTES or after in ('', '{', '[', '}', ']') or bool(_UNQUOTED_KEY.match(text, j))
+    return False
+
+
+def _insert_missing_comma(out, stack):
+    # 模板示例里成员之间常常漏写逗号
+    if stack and _last_significant(out) not in ('', '{', '[', ',', ':'):
+        out.append(',')
+
+
+def repair(text):
+    """修复常见格式问题，返回修复后的JSON文本"""
+    out = []
+    stack = []
+    key_start = None  # 当前对象中最后一个键在 out 中的位置，截断时用来丢掉不完整的键
+    i, n = 0, len(text)
+    while i < n:
+        ch = _FULLWIDTH.get(text[i], text[i])
+        if ch in _QUOTES:
+            # 字符串：结束引号后面必须是结构字符，否则按字符串内容处理（模型常常不转义发言中的引号）
+            close = _QUOTES[ch]
+            _insert_missing_comma(out, stack)
+            is_key = stack and stack[-1] == '{' and _last_significant(out) in ('{', ',')
+            if is_key:
+                key_start = len(out)
+            chars = []
+            depth = 0  # 中文引号包裹的字符串里还可能有成对的中文引号
+            i += 1
+            closed = False
+            while i < n:
+                c = text[i]
+                if c == '\\' and i + 1 < n:
+                    chars.append(text[i:i + 2])
+                    i += 2
+                    continue
+                if close != ch and c == ch:
+                    depth += 1
+                elif c == close and depth:
+                    depth -= 1
+                elif (c == close or (close != '"' and c == '"')) and _close_allowed(text, i + 1):
+                    closed = True
+                    i += 1
+                    break
+                chars.append('\\"' if c == '"' else '\\n' if c == '\n' else c)
+                i += 1
+            if not closed and is_key:
+                # 截断在键名里，丢掉这个键
+                del out[key_start:]
+                break
+            out.append('"' + ''.join(chars) + '"')
+            continue
+        if ch == '#':
+            # 模板中 output_format 常带 # 注释
+            while i < n and text[i] != '\n':
+                i += 1
+            continue
+        if ch in '{[':
+            _insert_missing_comma(out, stack)
+            stack.append(ch)
+            out.append(ch)
+        elif ch in '}]':
+            _strip_trailing_comma(out)
+            if stack:
+                out.append(_CLOSERS[stack.pop()])
+        elif ch in ',:' or ch in ' \t\r\n':
+            out.append(ch)
+        else:
+            # 未加引号的键或值
+            j = i
+            while j < n and text[j] not in _STRUCTURE:
+                j += 1
+            word = text[i:j]
+            if not word:
+                # 多余的结束引号等无法识别的结构字符，直接丢掉
+                i += 1
+                continue
+            _insert_missing_comma(out, stack)
+            if stack and stack[-1] == '{' and _next_significant(text, j) in (':', '：'):
+                key_start = len(out)
+                out.append(json.dumps(word, ensure_ascii=False))
+            elif word in _LITERALS:
+                out.append(_LITERALS[word])
+            else:
+                try:
+                    float(word)
+                    out.append(word)
+                except ValueError:
+                    out.append(json.dumps(word, ensure_ascii=False))
+            i = j
+            continue
+        i += 1
+
+    # 输出被截断：去掉没有值的键，再补齐括号
+    _strip_trailing_comma(out)
+    if _last_significant(out) == ':' and key_start is not None:
+        del out[key_start:]
+        _strip_trailing_comma(out)
+    while stack:
+        out.append(_CLOSERS[stack.pop()])
+    return ''.join(out)
+
+
+def parse_json(text):
+    """
+    解析模型输出中的JSON对象，返回 (dict, 是否经过修复)；无法解析时返回 (None, False)
+    """
+    if not isinstance(text, str) or not text.strip():
+        return None, False
+    block = extract_block(text)
+    try:
+        result = json.loads(block, strict=False)
+        if isinstance(result, dict):
+            return result, False
+    except ValueError:
+        pass
+    try:
+        result = json.loads(repair(block), strict=False)
+    except ValueError:
+        return None, False
+    return (result, True) if isinstance(result, dict) else (None, False)
+
+
+_SCHEMA_TYPES = {bool: "boolean", int: "integer", float: "number", str: "string", list: "array", dict: "object"}
+
+
+def schema_from_template(output_format, required_fields):
+    """根据模板的 output_format 示例和 required_fields 生成 JSON Schema，示例无法解析的字段不限制类型"""
+    example, _ = parse_json(output_format) if output_format else (None, False)
+    example = example or {}
+    properties = {}
+    for field in dict.fromkeys(list(example) + list(required_fields)):
+        value_type = _SCHEMA_TYPES.get(type(example.get(field)))
+        properties[field] = {"type": value_type} if value_type else {}
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(required_fields),
+    }
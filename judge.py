@@ -1,6 +1,11 @@
 from llm import BuildModel
+from log import log_context
+from cost import ledger_scope
 import yaml
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 
@@ -44,12 +49,14 @@ class Judge:
             prompt_template['curr_state'] = self.game.history.get_history(show_all=True)
             
             prompt_str = json.dumps(prompt_template, ensure_ascii=False)
-            print(prompt_str)
-            
-            resp, _ = self.model.get_response(prompt_str)
+
+            with log_context(game=self.game.start_time, player="judge", action="judge"), \
+                    ledger_scope(self.game.cost_ledger, player="judge", action="judge"):
+                resp, _ = self.model.get_response(prompt_str)
             if resp:
                 reason = resp['reason']
-                print(reason)
+                logger.info(f"裁判判定: {resp.get('result')}")
+                logger.debug("裁判理由", extra={"payload": reason})
                 result = resp['result']
                 return result
             
@@ -1,122 +1,251 @@
-from openai import OpenAI
-from dashscope import Generation
 from http import HTTPStatus
-from zhipuai import ZhipuAI
+import contextvars
 import json
-import dashscope
-import requests
-import http.client
 import re
 import logging
 import socket
 import datetime
 import os
+import time
+
+from rate_limit import RateLimitedError, get_limiter, retry_after_from_exception, retry_after_from_headers
+from token_budget import estimate_tokens
+from providers import provider_for_model, registry
+from resilience import CircuitOpenError, alternates_for, get_breaker, hedged_call
+import local_pool
+import batching
+import tracing
+import metrics
+import cost
+from json_repair import parse_json
 
 
 logger = logging.getLogger(__name__)
 
+# 本次请求的参数（max_tokens 输出上限、response_schema 原生JSON模式的Schema）；
+# get_response 把参数一路传给实际发出请求的模型（包括对冲和故障转移用的备用端点），
+# limited_generate 在发出请求的线程里设置，各提供商的 generate 通过 output_limit / response_format 读取
+_request_options = contextvars.ContextVar("llm_request_options", default={})
+
+
+def request_option(name):
+    return _request_options.get().get(name)
+
+
+# 提供商SDK在首次创建对应的模型时才导入，只用一个提供商或脚本机器人时不必加载全部SDK
+def openai_client(**kwargs):
+    from openai import OpenAI
+    return OpenAI(**kwargs)
+
+
 class BaseLlm():
     def __init__(self, model_name, force_json=False):
         
         self.model_name = model_name
         self.force_json = force_json
         self.timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        # 按提供商和API KEY共享的限流器、熔断器，以及对冲请求的备用端点，由 BuildModel 设置
+        self.limiter = None
+        self.breaker = None
+        self.alternates = []
+
+    # 是否把 chat_history 作为多轮对话发给模型
+    supports_chat_history = True
+    # 模型允许的最大输出token
+    max_output_tokens = 8192
+    # 提供商原生的JSON输出模式: None 不支持, "json_object" 只保证输出JSON, "json_schema" 按Schema约束输出
+    json_mode = None
+    # 流式请求时是否发送 stream_options.include_usage 让最后一个分块带上 usage
+    stream_usage = True
+
+    def output_limit(self):
+        max_tokens = request_option("max_tokens")
+        if max_tokens:
+            return min(max_tokens, self.max_output_tokens)
+        return self.max_output_tokens
 
     def prepare_messages(self, message, chat_history):
         messages = []
         for msg in chat_history:
-            messages.append({"role": "assistant" if msg["role"] == "bot" else "user", "content": msg["content"]})
+            role = {"bot": "assistant", "system": "system"}.get(msg["role"], "user")
+            messages.append({"role": role, "content": msg["content"]})
         messages.append({"role": "user", "content": message})
         return messages
 
-    def openai_like_generate(self, messages, stream=True, extra_body=None, **kwargs):
+    def response_format(self):
+        '''本次请求使用的原生JSON模式参数，不使用时返回 None'''
+        schema = request_option("response_schema")
+        if not self.force_json or schema is None or not self.json_mode:
+            return None
+        if self.json_mode == "json_schema":
+            return {"type": "json_schema", "json_schema": {"name": "response", "schema": schema}}
+        return {"type": "json_object"}
+
+    def metric_labels(self):
+        return {"provider": provider_for_model(self.model_name) or "none", "model": self.model_name}
+
+    def first_token(self, started):
+        '''收到第一个token时调用，started 为发出请求时的 time.perf_counter()'''
+        tracing.event("first_token")
+        metrics.llm_first_token_seconds.observe(time.perf_counter() - started, **self.metric_labels())
+
+    @staticmethod
+    def json_mode_messages(messages):
+        '''部分提供商要求开启JSON模式时消息中出现 "json" 字样'''
+        if any("json" in str(msg["content"]).lower() for msg in messages):
+            return messages
+        return [{"role": "system", "content": "请只输出一个JSON对象。"}] + messages
+
+    def openai_like_generate(self, messages, stream=True, extra_body=None, client=None, **kwargs):
         try:
             # 设置默认参数以增加AI思考深度
             default_params = {
-                "max_tokens": 8192,  # 增加最大token数量
+                "max_tokens": self.output_limit(),  # 按行动类型设置的输出上限
                 "temperature": 0.8,    # 稍微提高创造性
                 "top_p": 0.95,        # 增加多样性
                 "frequency_penalty": 0.1,  # 减少重复
                 "presence_penalty": 0.1   # 鼓励新话题
             }
 
+            response_format = self.response_format()
+            if response_format:
+                messages = self.json_mode_messages(messages)
+                kwargs.setdefault("response_format", response_format)
             params = {"model": self.model_name, "messages": messages, "stream": stream}
             if extra_body:
                 params["extra_body"] = extra_body
+            if stream and self.stream_usage:
+                params["stream_options"] = {"include_usage": True}
             params.update(default_params)
             params.update(kwargs)
-            response = self.client.chat.completions.create(**params)
+            started = time.perf_counter()
+            response = (client or self.client).chat.completions.create(**params)
             if stream:
                 full_response = ""
+                usage = None
                 for chunk in response:
+                    # usage 一般在最后一个分块中，部分提供商放在 choices[0] 里或每个分块都带累计值，取最后一个
+                    usage = getattr(chunk, "usage", None) or (chunk.choices and getattr(chunk.choices[0], "usage", None)) or usage
                     if chunk.choices and hasattr(chunk.choices[0].delta, 'content') and chunk.choices[0].delta.content:
                         content = chunk.choices[0].delta.content
+                        if not full_response:
+                            self.first_token(started)
                         full_response += content
-                        print(content, end="", flush=True)
+                tracing.event("last_token")
+                cost.report_usage(usage)
                 return full_response, None
             else:
+                tracing.event("last_token")
+                cost.report_usage(getattr(response, "usage", None))
                 return response.choices[0].message.content, None
         except Exception as e:
+            # 限流错误交给 get_response 按 Retry-After 等待
+            if retry_after_from_exception(e) is not None:
+                raise
             return None, str(e)
 
     def generate(self, message, chat_history=[]):
         pass
 
-    def get_response(self, message, chat_history=[]):
+    def limited_generate(self, message, chat_history, options=None):
+        '''按本次请求的参数，在限流器上等待后再请求，结束后按实际用量退回多预留的token'''
+        token = _request_options.set(options or {})
+        try:
+            return self._limited_generate(message, chat_history)
+        finally:
+            _request_options.reset(token)
+
+    def _limited_generate(self, message, chat_history):
+        if not self.limiter:
+            return self.generate(message, chat_history)
+        prompt_tokens = estimate_tokens(message) + sum(estimate_tokens(msg["content"]) for msg in chat_history)
+        with tracing.span("rate_limit_wait", limiter=self.limiter.name):
+            reserved = self.limiter.acquire(prompt_tokens + self.output_limit())
+        used = None
+        try:
+            resp, reason = self.generate(message, chat_history)
+            used = prompt_tokens + estimate_tokens(resp) + estimate_tokens(reason)
+            return resp, reason
+        finally:
+            self.limiter.release(reserved, used)
+
+    @tracing.traced("get_response")
+    def get_response(self, message, chat_history=[], max_tokens=None, response_schema=None, return_raw=False):
+        '''
+        max_tokens 为本次请求的输出上限，由调用方按行动类型给出，None 表示使用模型上限
+        response_schema 为期望的JSON Schema，None 表示不使用原生JSON模式
+        return_raw 为 True 时返回 (resp, reason, raw)，raw 是JSON解析失败时的原始输出，调用方据此追问而不是重新请求整个提示词
+        '''
         max_retries = 3
         retry_count = 0
-        print(f" ---  请求LLM {self.model_name} ---")
-        print(message)
-        print("---")
-        
+        labels = self.metric_labels()
+        usage = cost.new_usage()
+        options = {"max_tokens": max_tokens, "response_schema": response_schema}
+        logger.debug(f"请求LLM {self.model_name}", extra={"payload": message})
+
         while retry_count < max_retries:
+            started = time.perf_counter()
             try:
-                resp, reason = self.generate(message, chat_history)
-                if resp is None:
-                    raise Exception(reason if reason else "未知错误")
+                with tracing.span("llm_attempt", model=self.model_name, attempt=retry_count + 1):
+                    # 多局同步推进时，同一模型的请求按批次提交
+                    resp, reason = batching.call(self, lambda: hedged_call(self, message, chat_history, options))
+                    if resp is None:
+                        raise Exception(reason if reason else "未知错误")
+                metrics.llm_request_seconds.observe(time.perf_counter() - started, outcome="ok", **labels)
+                break
+            except CircuitOpenError as e:
+                # 端点熔断且没有可用的备用端点，直接失败，不再重试
+                metrics.llm_request_seconds.observe(time.perf_counter() - started, outcome="circuit_open", **labels)
+                logger.warning(str(e))
+                resp = None
+                reason = str(e)
                 break
             except Exception as e:
+                metrics.llm_request_seconds.observe(time.perf_counter() - started, outcome="error", **labels)
                 retry_count += 1
+                retry_after = retry_after_from_exception(e)
                 if retry_count >= max_retries:
                     logger.error(f"在尝试{max_retries}次后仍然失败。错误: {str(e)}")
                     resp = None
                     reason = str(e)
                     break
                 logger.warning(f"发生错误: {str(e)}。正在进行第{retry_count}次重试...")
-                import time
-                time.sleep(retry_count * 2)  # 指数退避
-        
-        if reason:
-            print(" --- 推理内容 ---")
-            print(reason)
-            print("-------")
-        
-        print(" --- LLM 响应 ---")
-        print(resp)
-        print("-------")
-
-        if self.force_json:
-            resp_dict = None
-            try:
-                # 匹配被```json包裹的JSON块（非贪婪匹配）
-                json_block_pattern = r'```json\s*([\s\S]*?)\s*```'
-                json_match = re.search(json_block_pattern, resp, re.DOTALL)
-                
-                if json_match:
-                    clean_resp = json_match.group(1)
+                metrics.llm_retries.inc(**labels)
+                delay = retry_after or retry_count * 2  # 优先使用提供商给出的等待时间，否则指数退避
+                if retry_after is not None and self.limiter:
+                    # 被限流时同一个key的其他请求也一起等待
+                    self.limiter.pause(delay)
                 else:
-                    # 直接尝试解析整个响应（已自动去除多余符号）
-                    clean_resp = re.sub(r'```json|```', '', resp).strip()
+                    with tracing.span("retry_backoff", seconds=delay):
+                        time.sleep(delay)
+        
+        # 提供商报告了用量（包括失败的尝试）或请求成功时记账，没有报告的按文本估算
+        if resp is not None or usage["calls"]:
+            usage = cost.finish_usage(usage, self.model_name, message, chat_history, resp, reason)
+            metrics.llm_tokens.inc(usage["prompt_tokens"], direction="input", **labels)
+            metrics.llm_tokens.inc(usage["completion_tokens"], direction="output", **labels)
+            cost.record_call(self.model_name, usage)
+            cost.set_last_usage(usage)
+        else:
+            cost.set_last_usage(None)
 
-                resp_dict = json.loads(clean_resp)
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON解析失败: {str(e)}\n清洗后响应: {clean_resp[:200]}")
-            except Exception as e:
-                logger.error(f"意外错误: {str(e)}\n原始响应: {resp[:200]}")
-            finally:
-                return resp_dict, reason
-        return resp, reason
+        if reason:
+            logger.debug(f"{self.model_name} 推理内容", extra={"payload": reason})
+        logger.debug(f"{self.model_name} 响应", extra={"payload": resp})
+
+        raw = None
+        if self.force_json and resp is not None:
+            # 先按标准JSON解析，失败时在本地修复尾随逗号、未加引号的键、中文引号、截断等问题
+            resp_dict, repaired = parse_json(resp)
+            if resp_dict is None:
+                logger.error(f"JSON解析失败\n原始响应: {resp[:200]}")
+                metrics.json_parse_failures.inc(outcome="failed", **labels)
+                raw = resp
+            elif repaired:
+                logger.warning(f"JSON格式有误，已在本地修复\n原始响应: {resp[:200]}")
+                metrics.json_parse_failures.inc(outcome="repaired", **labels)
+            resp = resp_dict
+        return (resp, reason, raw) if return_raw else (resp, reason)
     
 class M302Llm(BaseLlm):
     def __init__(self, model_name, api_key, force_json=False, timeout=30):
@@ -126,11 +255,15 @@ class M302Llm(BaseLlm):
 
     def generate(self, message, chat_history=[]):
         messages = self.prepare_messages(message, chat_history)
-        payload = json.dumps({
+        payload = {
             "model": self.model_name,
             "reasoning_effort": "high",
             "messages": messages
-        })
+        }
+        if request_option("max_tokens"):
+            payload["max_tokens"] = self.output_limit()
+        payload = json.dumps(payload)
+        import http.client
         try:
             conn = http.client.HTTPSConnection("api.302.ai", timeout=self.timeout)  
             headers = {
@@ -141,7 +274,10 @@ class M302Llm(BaseLlm):
             conn.request("POST", "/v1/chat/completions", payload, headers)
             res = conn.getresponse()
             data = res.read().decode("utf-8")
+            if res.status == 429:
+                raise RateLimitedError(f"请求被限流: {data[:200]}", retry_after_from_headers(res.getheaders()))
             response = json.loads(data)
+            cost.report_usage(response.get("usage"))
             content = response["choices"][0]["message"]["content"]
             # 提取推理内容
             reasoning_patterns = [
@@ -170,6 +306,8 @@ class M302Llm(BaseLlm):
         except socket.timeout:
             logger.warning("API请求超时")
             return None, None
+        except RateLimitedError:
+            raise
         except Exception as e:
             logger.error(f"请求失败：{str(e)}")
             return None, None
@@ -180,8 +318,10 @@ class M302Llm(BaseLlm):
 class DeepSeekLlm(BaseLlm):
     def __init__(self, model_name, api_key, force_json=False):
         super().__init__(model_name, force_json)
+        # deepseek-reasoner 不支持 response_format
+        self.json_mode = "json_object" if model_name == "deepseek-chat" else None
         self.api_key = api_key
-        self.client = OpenAI(api_key=self.api_key, base_url="https://api.deepseek.com", timeout=1800)
+        self.client = openai_client(api_key=self.api_key, base_url="https://api.deepseek.com", timeout=1800)
 
     def generate(self, message, chat_history=[]):
         messages = self.prepare_messages(message, chat_history)
@@ -189,28 +329,47 @@ class DeepSeekLlm(BaseLlm):
 
 
 class QwenLlm(BaseLlm):
+    json_mode = "json_object"
+
     def __init__(self, model_name, api_key, force_json=False):
         super().__init__(model_name, force_json)
         self.api_key = api_key
+        import dashscope
         dashscope.api_key = self.api_key
 
     def generate(self, message, chat_history=[]):
         messages = self.prepare_messages(message, chat_history)
+        extra_params = {}
+        response_format = self.response_format()
+        if response_format:
+            messages = self.json_mode_messages(messages)
+            extra_params["response_format"] = response_format
+        from dashscope import Generation
+        started = time.perf_counter()
         response = Generation.call(
             self.model_name,
             messages=messages,
             result_format='message',
             stream=True,
-            incremental_output=True
+            incremental_output=True,
+            max_tokens=self.output_limit(),
+            **extra_params
         )
 
         full_response = ""
+        usage = None
         for partial_response in response:
             if partial_response.status_code == HTTPStatus.OK:
+                # 每个分块的 usage 都是累计值，取最后一个
+                usage = getattr(partial_response, "usage", None) or usage
                 content = partial_response.output.choices[0]['message']['content']
+                if content and not full_response:
+                    self.first_token(started)
                 full_response += content
             else:
-                print(f'请求 ID: {partial_response.request_id}, 状态码: {partial_response.status_code}, 错误代码: {partial_response.code}, 错误信息: {partial_response.message}')
+                logger.error(f'请求 ID: {partial_response.request_id}, 状态码: {partial_response.status_code}, 错误代码: {partial_response.code}, 错误信息: {partial_response.message}')
+        tracing.event("last_token")
+        cost.report_usage(usage)
         return full_response, None
 
 class BaichuanLlm(BaseLlm):
@@ -232,20 +391,30 @@ class BaichuanLlm(BaseLlm):
             "temperature": 0.7,
             "top_p": 0.9
         }
+        if request_option("max_tokens"):
+            data["max_tokens"] = self.output_limit()
 
+        import requests
         response = requests.post(self.api_url, headers=headers, json=data, timeout=30)
 
         if response.status_code == 200:
             result = response.json()
+            cost.report_usage(result.get("usage"))
             return result['choices'][0]['message']['content'], None
+        elif response.status_code == 429:
+            raise RateLimitedError(f"请求被限流: {response.text}", retry_after_from_headers(response.headers))
         else:
             raise Exception(f"请求失败: {response.status_code}, {response.text}")
 
 
 class ZhipuLlm(BaseLlm):
+    # ZhipuAI SDK 不接受 stream_options，流式响应的最后一个分块本身带有 usage
+    stream_usage = False
+
     def __init__(self, model_name, api_key, force_json=False):
         super().__init__(model_name, force_json)
         self.api_key = api_key
+        from zhipuai import ZhipuAI
         self.client = ZhipuAI(api_key=self.api_key)
 
     def generate(self, message, chat_history=[]):
@@ -254,10 +423,12 @@ class ZhipuLlm(BaseLlm):
 
 
 class KimiLlm(BaseLlm):
+    json_mode = "json_object"
+
     def __init__(self, model_name, api_key, force_json=False):
         super().__init__(model_name, force_json)
         self.api_key = api_key
-        self.client = OpenAI(api_key=self.api_key, base_url="https://api.moonshot.cn/v1", timeout=1800)
+        self.client = openai_client(api_key=self.api_key, base_url="https://api.moonshot.cn/v1", timeout=1800)
 
     def generate(self, message, chat_history=[]):
         messages = self.prepare_messages(message, chat_history)
@@ -268,7 +439,7 @@ class DouBaoLlm(BaseLlm):
     def __init__(self, model_name, api_key, force_json=False):
         super().__init__(model_name, force_json)
         self.api_key = api_key
-        self.client = OpenAI(
+        self.client = openai_client(
                 base_url='https://ark.cn-beijing.volces.com/api/v3/',
                 api_key=self.api_key
             )
@@ -279,10 +450,13 @@ class DouBaoLlm(BaseLlm):
 
 
 class HunyuanLlm(BaseLlm):
+    # 混元的流式分块都带有累计的 usage
+    stream_usage = False
+
     def __init__(self, model_name, api_key, force_json=False):
         super().__init__(model_name, force_json)
         self.api_key = api_key
-        self.client = OpenAI(
+        self.client = openai_client(
             api_key=self.api_key,
             base_url="https://api.hunyuan.cloud.tencent.com/v1",
             timeout=1800
@@ -294,86 +468,53 @@ class HunyuanLlm(BaseLlm):
 
 
 class SiliconReasoner(BaseLlm):
+    max_output_tokens = 4096
+
     def __init__(self, model_name, api_key, force_json=False):
         super().__init__(model_name, force_json)
         
-        self.client = OpenAI(
+        self.client = openai_client(
                 base_url='https://api.siliconflow.cn/v1/',
                 api_key=api_key,
                 timeout=1800
             )
 
     def generate(self, message, chat_history=[]):
-        messages = [{"role": "user", "content": message}]
-        return self.openai_like_generate(messages, stream=True, max_tokens=4096)
+        messages = self.prepare_messages(message, chat_history)
+        return self.openai_like_generate(messages, stream=True)
 
 
 class HumanLlm(BaseLlm):
-    def __init__(self, model_name):
+    supports_chat_history = False
+
+    def __init__(self, model_name, api_key="", force_json=False):
         super().__init__(model_name)
-        pass
     
     def generate(self, message, chat_history=[]):
         pass
 
 class OpenAILlm(BaseLlm):
+    json_mode = "json_schema"
+
     def __init__(self, model_name, api_key, force_json=False):
         super().__init__(model_name, force_json)
+        if model_name == "o1-mini":
+            self.json_mode = None
         self.api_key = api_key
-        self.client = OpenAI(api_key=self.api_key, timeout=1800)
+        self.client = openai_client(api_key=self.api_key, timeout=1800)
 
     def generate(self, message, chat_history=[]):
         messages = self.prepare_messages(message, chat_history)
         return self.openai_like_generate(messages, stream=True)
 
 
-M302LLM_SUPPORTED_MODELS = [
-    "m302/o3-mini",
-    "m302/o3-mini-2025-01-31",
-    "gemini-2.0-flash-thinking-exp-01-21",
-    "claude-3-7-sonnet-latest",
-    "claude-3-7-sonnet-thinking"
-    ]
-
-SILICONFLOW_SUPPORTED_MODELS = [
-    "deepseek-ai/DeepSeek-R1",
-    "Pro/deepseek-ai/DeepSeek-R1"
-    ]
-
-OPENAI_SUPPORTED_MODELS = [
-    "gpt-4.1",
-    "gpt-4.1-mini",
-    "gpt-4.1-nano",
-    "gpt-4o",
-    "gpt-4o-mini",
-    "o1-mini",
-    "o3-mini",
-    "o4-mini"
-]
-
-XAI_SUPPORTED_MODELS = [
-    "grok-3-latest"
-]
-
-XAIREASON_SUPPORTED_MODELS = [
-    "grok-3-mini-beta",
-    "grok-3-mini-fast-beta"
-]
-
-OPENROUTER_SUPPORTED_MODELS = [
-    "openrouter/google/gemini-2.5-pro-exp-03-25:free",
-    "openrouter/anthropic/claude-3.7-sonnet",
-    "openrouter/anthropic/claude-3.7-sonnet:thinking",
-    "openrouter/moonshotai/kimi-vl-a3b-thinking:free",
-    "openrouter/deepseek/deepseek-r1:free"
-]
-
-
 class XAiLlm(BaseLlm):
+    json_mode = "json_object"
+
     def __init__(self, model_name, api_key, force_json=False):
         super().__init__(model_name, force_json)
         self.api_key = api_key
-        self.client = OpenAI(
+        self.client = openai_client(
             api_key=self.api_key,
             base_url="https://api.x.ai/v1",
             timeout=1800
@@ -388,7 +529,7 @@ class XAIReason(BaseLlm):
     def __init__(self, model_name, api_key, force_json=False):
         super().__init__(model_name, force_json)
         self.api_key = api_key
-        self.client = OpenAI(
+        self.client = openai_client(
             api_key=self.api_key,
             base_url="https://api.x.ai/v1",
             timeout=1800
@@ -402,9 +543,12 @@ class XAIReason(BaseLlm):
                 messages=messages,
                 reasoning_effort="high",
                 stream=False,
-                temperature=0.7
+                temperature=0.7,
+                max_tokens=self.output_limit()
             )
             
+            # 推理token在 usage.completion_tokens_details.reasoning_tokens 中
+            cost.report_usage(getattr(response, "usage", None))
             # 获取主要响应内容
             content = response.choices[0].message.content
             
@@ -412,18 +556,44 @@ class XAIReason(BaseLlm):
             reasoning_content = None
             if hasattr(response.choices[0].message, 'reasoning_content'):
                 reasoning_content = response.choices[0].message.reasoning_content
-                print("\n--- 推理过程 ---")
-                print(reasoning_content)
-                print("---------------")
             
             return content, reasoning_content
         except Exception as e:
+            if retry_after_from_exception(e) is not None:
+                raise
             return None, str(e)
         
+class LocalPoolLlm(BaseLlm):
+    """
+    本地 vLLM 副本池，模型名为 pool/<服务端模型名>，如 pool/Qwen3-32B-AWQ
+    每次请求发给未完成请求最少的健康端点，端点配置见 local_pool.py
+    """
+    # vLLM 的 guided decoding 支持按Schema约束输出
+    json_mode = "json_schema"
+
+    def __init__(self, model_name, api_key, force_json=False):
+        super().__init__(model_name, force_json)
+        self.served_model = model_name[len(local_pool.POOL_PREFIX):]
+
+    def generate(self, message, chat_history=[]):
+        messages = self.prepare_messages(message, chat_history)
+        pool = local_pool.get_pool()
+        endpoint = pool.acquire()
+        resp = None
+        try:
+            resp, reason = self.openai_like_generate(messages, stream=False, client=endpoint.client, model=self.served_model)
+            return resp, reason
+        finally:
+            pool.release(endpoint, resp is not None)
+
+
 class LocalQwenLlm(BaseLlm):
+    # 脚本机器人需要从单条消息中解析玩家编号、角色等字段
+    supports_chat_history = False
+
     def __init__(self, model_name, api_key, force_json=False):
         super().__init__(model_name, force_json)
-        self.client = OpenAI(
+        self.client = openai_client(
             api_key="dummy_key",  # 本地API不需要真实密钥
             base_url="http://172.16.13.100:8000/v1",
             timeout=1800
@@ -1012,13 +1182,9 @@ class LocalQwenLlm(BaseLlm):
                 }
 
             content = json.dumps(response, ensure_ascii=False)
-            print(" --- LLM 响应 ---")
-            print(content)
-            print("-------")
-
             return content, None
         except Exception as e:
-            print(f"请求失败: {str(e)}")
+            logger.error(f"请求失败: {str(e)}")
             # 返回默认响应
             default_response = {
                 "thinking": "处理中",
@@ -1028,13 +1194,45 @@ class LocalQwenLlm(BaseLlm):
             return content, str(e)
 
 
+class MockLlm(LocalQwenLlm):
+    """
+    不发网络请求的模拟模型，用于基准测试和压测: 按 LocalQwenLlm 的脚本策略立即生成回答，
+    模型名 mock/<毫秒数> 在返回前等待相应的时间，模拟网络和推理延迟，如 mock/300
+    """
+
+    def __init__(self, model_name, api_key="", force_json=False):
+        BaseLlm.__init__(self, model_name, force_json)
+        _, _, latency = model_name.partition("/")
+        self.latency = int(latency) / 1000 if latency.isdigit() else 0
+
+    def generate(self, message, chat_history=[]):
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            message_dict = json.loads(message)
+        except ValueError:
+            message_dict = {}
+        if "player_state" in message_dict:
+            # 裁判: 按存活人数判断
+            alive = [p["角色"] for p in message_dict["player_state"] if p.get("存活") == "存活"]
+            wolves = alive.count("狼人")
+            if wolves == 0:
+                result = "村民胜利"
+            elif wolves >= len(alive) - wolves:
+                result = "狼人胜利"
+            else:
+                result = "胜负未分"
+            return json.dumps({"reason": f"存活狼人{wolves}名，好人{len(alive) - wolves}名", "result": result}, ensure_ascii=False), None
+        return super().generate(message, chat_history)
+
+
 class OpenRouterLlm(BaseLlm):
     def __init__(self, model_name, api_key, force_json=False):
         # Remove 'openrouter/' prefix from model_name if it exists
         if model_name.startswith("openrouter/"):
             model_name = model_name[11:]
         super().__init__(model_name, force_json)
-        self.client = OpenAI(
+        self.client = openai_client(
             api_key=api_key,
             base_url="https://openrouter.ai/api/v1",
             timeout=1800)
@@ -1045,35 +1243,19 @@ class OpenRouterLlm(BaseLlm):
     
 
 def BuildModel(model_name, api_key, force_json=False):
-    if model_name == "Qwen3-32B-AWQ":
-        return LocalQwenLlm(model_name, api_key, force_json)
-    elif model_name in M302LLM_SUPPORTED_MODELS:
-        return M302Llm(model_name, api_key, force_json)
-    elif model_name in SILICONFLOW_SUPPORTED_MODELS:
-        return SiliconReasoner(model_name, api_key, force_json)
-    elif model_name in ["deepseek-reasoner", "deepseek-chat"]:
-        return DeepSeekLlm(model_name, api_key, force_json)
-    elif model_name in ["qwen-max", "qwen-max-longcontext", "qwen-plus", "qwen-long", "qwen-max-2025-01-25"]:
-        return QwenLlm(model_name, api_key, force_json)
-    elif model_name in ["Baichuan4", "Baichuan3-Turbo", "Baichuan3-Turbo-128k", "Baichuan2-Turbo", "Baichuan2-Turbo-192k"]:
-        return BaichuanLlm(model_name, api_key, force_json)
-    elif model_name in ["glm-3-turbo", "glm-4", "glm-4v", "glm-4-plus"]:
-        return ZhipuLlm(model_name, api_key, force_json)
-    elif model_name in ["moonshot-v1-32k"]:
-        return KimiLlm(model_name, api_key, force_json)
-    elif model_name.startswith("ep-"):
-        return DouBaoLlm(model_name, api_key, force_json)
-    elif model_name in ["hunyuan-large", "hunyuan-turbo-latest"]:
-        return HunyuanLlm(model_name, api_key, force_json)
-    elif model_name == "human":
-        return HumanLlm(model_name)
-    elif model_name in XAI_SUPPORTED_MODELS:
-        return XAiLlm(model_name, api_key, force_json)
-    elif model_name in XAIREASON_SUPPORTED_MODELS:
-        return XAIReason(model_name, api_key, force_json)
-    elif model_name in OPENAI_SUPPORTED_MODELS:
-        return OpenAILlm(model_name, api_key, force_json)
-    elif model_name in OPENROUTER_SUPPORTED_MODELS:
-        return OpenRouterLlm(model_name, api_key, force_json)
-    else:
-        raise ValueError("未知的模型名称:", model_name)
\ No newline at end of file
+    """按提供商注册表（见 providers.py）创建模型，并挂上该提供商和API KEY共享的限流器、熔断器"""
+    provider = provider_for_model(model_name)
+    model = registry.build(model_name, api_key, force_json)
+    model.limiter = get_limiter(provider, api_key)
+    model.breaker = get_breaker(provider, api_key)
+    # 对冲请求用的备用 key/端点，使用同一个模型
+    for alternate in alternates_for(model_name):
+        alt_key = alternate.get("api_key", api_key)
+        alt_model = registry.build(model_name, alt_key, force_json)
+        base_url = alternate.get("base_url", "")
+        if base_url and hasattr(alt_model, "client"):
+            alt_model.client = openai_client(api_key=alt_key, base_url=base_url, timeout=1800)
+        alt_model.limiter = get_limiter(provider, alt_key)
+        alt_model.breaker = get_breaker(provider, alt_key, base_url)
+        model.alternates.append(alt_model)
+    return model
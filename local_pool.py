@@ -0,0 +1,158 @@
+"""
+本地推理端点池
+多个本地 vLLM 副本组成一个池，请求发给当前未完成请求最少的健康端点；
+后台线程定期探测各端点，连续失败的端点移出轮换，探测恢复后重新加入
+端点在 config.json 的 local_pool.endpoints 中配置，也可以用环境变量 LOCAL_POOL_ENDPOINTS（逗号分隔）
+"""
+
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+POOL_PREFIX = "pool/"
+
+DEFAULT_POOL = {
+    "endpoints": [],
+    "api_key": "dummy_key",     # 本地API不需要真实密钥
+    "health_path": "/models",   # 相对 base_url 的探测地址，vLLM 的 OpenAI 兼容接口都有
+    "health_interval": 10,      # 探测间隔（秒）
+    "health_timeout": 3,
+    "max_failures": 2,          # 连续失败多少次移出轮换
+}
+
+
+class Endpoint:
+    def __init__(self, base_url, api_key):
+        from openai import OpenAI
+        self.base_url = base_url.rstrip("/")
+        self.client = OpenAI(api_key=api_key, base_url=self.base_url, timeout=1800)
+        self.outstanding = 0
+        self.served = 0
+        self.failures = 0
+        self.healthy = True
+
+    def snapshot(self):
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "served": self.served,
+            "failures": self.failures,
+        }
+
+
+class EndpointPool:
+    def __init__(self, settings):
+        self.settings = dict(DEFAULT_POOL, **settings)
+        self.endpoints = [Endpoint(url, self.settings["api_key"]) for url in self.settings["endpoints"]]
+        self.cond = threading.Condition()
+        self.next_index = 0
+        self.stopped = threading.Event()
+        self.prober = None
+        if self.endpoints and self.settings["health_interval"]:
+            self.prober = threading.Thread(target=self._probe_loop, name="local-pool-health", daemon=True)
+            self.prober.start()
+
+    def acquire(self):
+        """选出未完成请求最少的健康端点；全部不健康时仍然选一个，让请求自己失败并触发重试"""
+        if not self.endpoints:
+            raise ValueError("local_pool 没有配置任何端点")
+        with self.cond:
+            candidates = [e for e in self.endpoints if e.healthy] or self.endpoints
+            # 并列时轮转起点，避免总是压在第一个端点上
+            start = self.next_index % len(candidates)
+            self.next_index += 1
+            ordered = candidates[start:] + candidates[:start]
+            endpoint = min(ordered, key=lambda e: e.outstanding)
+            endpoint.outstanding += 1
+            return endpoint
+
+    def release(self, endpoint, success):
+        with self.cond:
+            endpoint.outstanding -= 1
+            if success:
+                endpoint.served += 1
+                endpoint.failures = 0
+                return
+            endpoint.failures += 1
+            if endpoint.healthy and endpoint.failures >= self.settings["max_failures"]:
+                endpoint.healthy = False
+                logger.warning(f"本地端点 {endpoint.base_url} 连续失败{endpoint.failures}次，移出轮换")
+
+    def probe(self, endpoint):
+        import requests
+        try:
+            resp = requests.get(
+                endpoint.base_url + self.settings["health_path"],
+                headers={"Authorization": f"Bearer {self.settings['api_key']}"},
+                timeout=self.settings["health_timeout"],
+            )
+            ok = resp.status_code == 200
+        except requests.RequestException:
+            ok = False
+        with self.cond:
+            if ok and not endpoint.healthy:
+                logger.info(f"本地端点 {endpoint.base_url} 已恢复")
+            elif not ok and endpoint.healthy:
+                logger.warning(f"本地端点 {endpoint.base_url} 健康检查失败，移出轮换")
+            endpoint.healthy = ok
+            if ok:
+                endpoint.failures = 0
+        return ok
+
+    def _probe_loop(self):
+        while not self.stopped.is_set():
+            for endpoint in self.endpoints:
+                self.probe(endpoint)
+            self.stopped.wait(self.settings["health_interval"])
+
+    def stop(self):
+        self.stopped.set()
+
+    def summary(self):
+        with self.cond:
+            return {e.base_url: e.snapshot() for e in self.endpoints}
+
+
+def load_settings(config=None):
+    """合并 config.json 中的 local_pool 配置，端点为空时使用环境变量 LOCAL_POOL_ENDPOINTS"""
+    settings = dict(DEFAULT_POOL, **(config or {}).get("local_pool", {}))
+    if not settings["endpoints"]:
+        env = os.environ.get("LOCAL_POOL_ENDPOINTS", "")
+        settings["endpoints"] = [url.strip() for url in env.split(",") if url.strip()]
+    return settings
+
+
+_settings = None
+_pool = None
+_lock = threading.Lock()
+
+
+def configure(config):
+    """配置变化时停掉旧的端点池，下次使用时按新配置创建"""
+    global _settings, _pool
+    settings = load_settings(config)
+    with _lock:
+        if settings == _settings:
+            return
+        if _pool is not None:
+            _pool.stop()
+        _settings = settings
+        _pool = None
+
+
+def get_pool():
+    """所有 pool/ 模型共用一个端点池，第一次使用时创建"""
+    global _settings, _pool
+    with _lock:
+        if _pool is None:
+            if _settings is None:
+                _settings = load_settings()
+            _pool = EndpointPool(_settings)
+        return _pool
+
+
+def summary():
+    with _lock:
+        return _pool.summary() if _pool is not None else {}
@@ -1,3 +1,15 @@
+import atexit
+import contextvars
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
 from colorama import Fore, Back, Style, init
 
 # 初始化 colorama
@@ -23,6 +35,127 @@ def print_yellow(message, bg=False):
     color = f"{Fore.YELLOW}{Back.YELLOW}" if bg else Fore.YELLOW
     print(f"{color}{message}{Style.RESET_ALL}")
 
+
+# 日志配置：终端只输出 level 及以上的简短信息，完整的提示词和响应以 DEBUG 级别写入 JSON Lines 文件；
+# 两个输出都由后台线程写入，多局并发时调用方不会阻塞在终端输出上
+DEFAULT_LOGGING = {
+    "level": "INFO",                 # 终端日志级别，设为 DEBUG 时终端也输出完整的提示词和响应
+    "file_level": "DEBUG",           # 文件日志级别
+    "file": "logs/wolf_bot.jsonl",   # 为空时不写文件
+}
+
+NOISY_LOGGERS = ("httpx", "httpcore", "openai", "urllib3", "dashscope")
+
+# 当前线程（或协程）的日志上下文，如 {"game": ..., "player": 3, "action": "vote"}
+_log_context = contextvars.ContextVar("log_context", default={})
+_config_lock = threading.Lock()
+_installed = {"settings": None, "handler": None, "listener": None}
+
+
+@contextmanager
+def log_context(**fields):
+    """在 with 块内的日志记录中附加上下文字段，嵌套时合并"""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """在产生日志的线程中取出上下文，交给后台线程格式化"""
+
+    def filter(self, record):
+        record.context = dict(_log_context.get())
+        record.ctx = " ".join(f"{key}={value}" for key, value in record.context.items())
+        return True
+
+
+class ConsoleFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(ctx)s] %(message)s", "%H:%M:%S")
+
+    def format(self, record):
+        text = super().format(record)
+        payload = getattr(record, "payload", None)
+        return f"{text}\n{payload}" if payload is not None else text
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            **getattr(record, "context", {}),
+            "message": record.getMessage(),
+        }
+        payload = getattr(record, "payload", None)
+        if payload is not None:
+            entry["payload"] = payload
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler.prepare 会把异常堆栈拼进 message 并清除 exc_info，文件里就没有单独的 exception 字段；
+    这里只合并消息参数，异常留给各输出自己格式化
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(config=None):
+    """按 config.json 的 logging 配置日志输出，配置不变时重复调用不做任何事"""
+    settings = dict(DEFAULT_LOGGING, **(config or {}).get("logging", {}))
+    with _config_lock:
+        if settings == _installed["settings"]:
+            return
+        _stop_logging()
+        handlers = []
+        console = logging.StreamHandler()
+        console.setLevel(settings["level"].upper())
+        console.setFormatter(ConsoleFormatter())
+        handlers.append(console)
+        if settings["file"]:
+            os.makedirs(os.path.dirname(settings["file"]) or ".", exist_ok=True)
+            file_handler = logging.FileHandler(settings["file"], encoding="utf-8")
+            file_handler.setLevel(settings["file_level"].upper())
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+
+        log_queue = queue.SimpleQueue()
+        handler = ContextQueueHandler(log_queue)
+        handler.addFilter(ContextFilter())
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(min(h.level for h in handlers))
+        # SDK 的 DEBUG 日志（每个HTTP请求）太多，只保留警告
+        for name in NOISY_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+        _installed.update(settings=settings, handler=handler, listener=listener)
+
+
+def _stop_logging():
+    if _installed["handler"] is not None:
+        logging.getLogger().removeHandler(_installed["handler"])
+        _installed["listener"].stop()
+        for handler in _installed["listener"].handlers:
+            handler.close()
+    _installed.update(settings=None, handler=None, listener=None)
+
+
+atexit.register(_stop_logging)
+
+
 # 示例用法
 if __name__ == "__main__":
     print_red("This is a red message")
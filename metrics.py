@@ -0,0 +1,147 @@
+"""
+运行指标
+进程内的计数器、仪表和直方图，web.py 的 /metrics 接口按 Prometheus 文本格式输出。
+记录只是在锁内加几个数，直方图使用固定的桶，不依赖 prometheus_client。
+"""
+
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+PHASE_BUCKETS = (10, 30, 60, 120, 300, 600, 1200, 2400)
+
+_registry = []
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.values = {}  # 标签值元组 -> 数值（直方图为 [各桶计数, 总和, 总数]）
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def label_text(self, key, extra=None):
+        pairs = list(zip(self.labels, key)) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted(self.values.items())
+            for key, value in items:
+                lines.extend(self.render_value(key, value))
+        return lines
+
+    def render_value(self, key, value):
+        return [f"{self.name}{self.label_text(key)} {value}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            item = self.values.get(key)
+            if item is None:
+                item = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            item[0][index] += 1
+            item[1] += value
+            item[2] += 1
+
+    def render(self):
+        # 渲染时复制一份，避免在锁内格式化
+        with self.lock:
+            items = sorted((key, [list(value[0]), value[1], value[2]]) for key, value in self.values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self.label_text(key, ('le', str(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{self.label_text(key)} {total}")
+            lines.append(f"{self.name}_count{self.label_text(key)} {count}")
+        return lines
+
+
+def render():
+    """所有指标的 Prometheus 文本格式"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+llm_request_seconds = Histogram(
+    "wolfbot_llm_request_seconds", "每次LLM请求尝试的耗时", ("provider", "model", "outcome"))
+llm_first_token_seconds = Histogram(
+    "wolfbot_llm_first_token_seconds", "从发出请求到收到第一个token的耗时", ("provider", "model"))
+llm_retries = Counter(
+    "wolfbot_llm_retries_total", "get_response 内的重试次数", ("provider", "model"))
+llm_tokens = Counter(
+    "wolfbot_llm_tokens_total", "输入和输出token数", ("provider", "model", "direction"))
+json_parse_failures = Counter(
+    "wolfbot_json_parse_failures_total", "响应不是合法JSON的次数，outcome 为 repaired（本地修复成功）或 failed",
+    ("provider", "model", "outcome"))
+missing_field_failures = Counter(
+    "wolfbot_missing_field_failures_total", "响应缺少必要字段的次数", ("action",))
+action_retries = Counter(
+    "wolfbot_action_retries_total", "handle_action 的恢复次数，kind 为 followup / reprompt / request_failed",
+    ("action", "kind"))
+action_seconds = Histogram(
+    "wolfbot_action_seconds", "handle_action 的耗时（含重试）", ("action",))
+active_games = Gauge(
+    "wolfbot_active_games", "进行中的游戏数")
+phase_seconds = Histogram(
+    "wolfbot_phase_seconds", "白天和夜晚阶段的耗时", ("phase",), buckets=PHASE_BUCKETS)
+breaker_state = Gauge(
+    "wolfbot_breaker_state", "端点熔断器状态: 0 关闭, 1 半开, 2 打开", ("endpoint",))
+breaker_opened = Counter(
+    "wolfbot_breaker_opened_total", "熔断器打开的次数", ("endpoint",))
+hedged_requests = Counter(
+    "wolfbot_hedged_requests_total", "主端点超过 p95 延迟后发出的对冲请求数", ("model", "endpoint"))
+hedge_wins = Counter(
+    "wolfbot_hedge_wins_total", "对冲请求先于主请求成功返回的次数", ("model", "endpoint"))
+failovers = Counter(
+    "wolfbot_failovers_total", "主端点熔断时改用备用端点的请求数", ("model", "endpoint"))
+active_games.set(0)
@@ -8,132 +8,13 @@ import json
 import os
 from typing import Dict, List, Any
 
+from providers import registry
+
 class ModelConfigManager:
     def __init__(self):
-        self.supported_models = {
-            # 本地模型
-            "local": {
-                "name": "本地模型",
-                "models": ["Qwen3-32B-AWQ"],
-                "api_key_required": False,
-                "base_url": "http://172.16.13.100:8000/v1",
-                "description": "本地部署的Qwen模型"
-            },
-
-            # OpenAI模型
-            "openai": {
-                "name": "OpenAI",
-                "models": ["gpt-4o", "gpt-4o-mini", "gpt-4.1", "gpt-4.1-mini", "o1-mini", "o3-mini", "o4-mini"],
-                "api_key_required": True,
-                "base_url": "https://api.openai.com/v1",
-                "description": "OpenAI官方模型"
-            },
-
-            # DeepSeek模型
-            "deepseek": {
-                "name": "DeepSeek",
-                "models": ["deepseek-chat", "deepseek-reasoner"],
-                "api_key_required": True,
-                "base_url": "https://api.deepseek.com",
-                "description": "DeepSeek AI模型"
-            },
-
-            # 通义千问模型
-            "qwen": {
-                "name": "通义千问",
-                "models": ["qwen-max", "qwen-plus", "qwen-long", "qwen-max-longcontext", "qwen-max-2025-01-25"],
-                "api_key_required": True,
-                "base_url": "https://dashscope.aliyuncs.com/compatible-mode/v1",
-                "description": "阿里云通义千问模型"
-            },
-
-            # 智谱AI模型
-            "zhipuai": {
-                "name": "智谱AI",
-                "models": ["glm-3-turbo", "glm-4", "glm-4v", "glm-4-plus"],
-                "api_key_required": True,
-                "base_url": "https://open.bigmodel.cn/api/paas/v4",
-                "description": "智谱AI GLM模型"
-            },
-
-            # 月之暗面模型
-            "moonshot": {
-                "name": "月之暗面",
-                "models": ["moonshot-v1-32k"],
-                "api_key_required": True,
-                "base_url": "https://api.moonshot.cn/v1",
-                "description": "月之暗面Kimi模型"
-            },
-
-            # 豆包模型
-            "doubao": {
-                "name": "豆包",
-                "models": ["ep-xxxx"],  # 需要具体endpoint
-                "api_key_required": True,
-                "base_url": "https://ark.cn-beijing.volces.com/api/v3",
-                "description": "字节跳动豆包模型"
-            },
-
-            # 腾讯混元模型
-            "hunyuan": {
-                "name": "腾讯混元",
-                "models": ["hunyuan-large", "hunyuan-turbo-latest"],
-                "api_key_required": True,
-                "base_url": "https://api.hunyuan.cloud.tencent.com/v1",
-                "description": "腾讯混元大模型"
-            },
-
-            # 百川AI模型
-            "baichuan": {
-                "name": "百川AI",
-                "models": ["Baichuan4", "Baichuan3-Turbo", "Baichuan3-Turbo-128k", "Baichuan2-Turbo", "Baichuan2-Turbo-192k"],
-                "api_key_required": True,
-                "base_url": "https://api.baichuan-ai.com/v1",
-                "description": "百川AI大模型"
-            },
-
-            # xAI模型
-            "xai": {
-                "name": "xAI",
-                "models": ["grok-3-latest", "grok-3-mini-beta", "grok-3-mini-fast-beta"],
-                "api_key_required": True,
-                "base_url": "https://api.x.ai/v1",
-                "description": "马斯克xAI Grok模型"
-            },
-
-            # SiliconFlow模型
-            "siliconflow": {
-                "name": "SiliconFlow",
-                "models": ["deepseek-ai/DeepSeek-R1", "Pro/deepseek-ai/DeepSeek-R1"],
-                "api_key_required": True,
-                "base_url": "https://api.siliconflow.cn/v1",
-                "description": "SiliconFlow推理模型"
-            },
-
-            # OpenRouter模型
-            "openrouter": {
-                "name": "OpenRouter",
-                "models": [
-                    "openrouter/google/gemini-2.5-pro-exp-03-25:free",
-                    "openrouter/anthropic/claude-3.7-sonnet",
-                    "openrouter/anthropic/claude-3.7-sonnet:thinking",
-                    "openrouter/moonshotai/kimi-vl-a3b-thinking:free",
-                    "openrouter/deepseek/deepseek-r1:free"
-                ],
-                "api_key_required": True,
-                "base_url": "https://openrouter.ai/api/v1",
-                "description": "OpenRouter多模型聚合"
-            },
-
-            # M302AI模型
-            "m302ai": {
-                "name": "M302AI",
-                "models": ["m302/o3-mini", "m302/o3-mini-2025-01-31", "gemini-2.0-flash-thinking-exp-01-21", "claude-3-7-sonnet-latest", "claude-3-7-sonnet-thinking"],
-                "api_key_required": True,
-                "base_url": "https://api.302.ai",
-                "description": "M302AI推理模型"
-            }
-        }
+        # 提供商目录统一在 providers.py 中维护
+        registry.load_plugins()
+        self.supported_models = registry.providers
 
     def list_supported_providers(self) -> List[Dict[str, Any]]:
         """列出所有支持的AI提供商"""
@@ -197,7 +78,24 @@ class ModelConfigManager:
             "display_divine_action": True,
             "display_vote_action": True,
             "display_model": True,
-            "auto_play": True
+            "auto_play": True,
+            "role_posterior_hints": False,
+            "token_budget": {"default": 16000, "keep_recent_rounds": 2, "models": {}},
+            "chat_session": False,
+            "thinking_level": "full",
+            "structured_output": True,
+            "cost": {"currency": "USD", "prices": {}},
+            "tracing": {"enabled": False, "dir": "logs"},
+            "profiling": {"enabled": False, "mode": "cprofile", "scope": "game", "interval_ms": 5, "min_ms": 0,
+                          "tracemalloc": False, "tracemalloc_frames": 10, "dir": "logs"},
+            "logging": {"level": "INFO", "file_level": "DEBUG", "file": "logs/wolf_bot.jsonl"},
+            "action_validation": {"enabled": True, "policy": "nearest", "actions": {"cure_or_poison": "abstain"}},
+            "local_pool": {"endpoints": [], "health_interval": 10, "max_failures": 2},
+            "resilience": {"breaker": {"error_rate": 0.5, "cooldown": 30}, "hedging": {"enabled": False, "percentile": 95, "alternates": {}}},
+            "prompt_tier": {"mode": "auto", "latency_target": None},
+            "output_tokens": {"enabled": True, "adaptive": True, "percentile": 99, "actions": {}, "models": {}},
+            "event_encoding": {"default": "text", "models": {}},
+            "history_summary": {"enabled": False, "summarizer": "scripted", "model_name": "", "api_key": "", "keep_recent_rounds": 1}
         }
 
     def save_config(self, config: Dict[str, Any], filename: str = "config.json"):
@@ -0,0 +1,181 @@
+"""
+按行动类型限制输出token
+投票、刀人等只需要一个数字的决策不再使用 8192 的上限；
+上限可以在 config.json 中按行动和模型配置，并根据最近对局实际输出长度的 p99 自动收紧
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+from collections import deque
+
+from prompt_tier import split_tier
+
+logger = logging.getLogger(__name__)
+
+# 各行动的默认输出上限（含 thinking 字段），行动名取自提示词文件名 prompts/prompt_<行动>.yaml
+DEFAULT_ACTION_TOKENS = {
+    "vote": 1024,
+    "kill": 1024,
+    "divine": 1024,
+    "cure_or_poison": 1024,
+    "hunter_revenge": 1024,
+    "lastword": 2048,
+    "speak": 3072,
+}
+# 未配置的行动保持原来的上限
+DEFAULT_MAX_TOKENS = 8192
+
+# 观测记录保存在这里，跨对局、跨进程累积
+STATS_FILE = "logs/output_tokens.json"
+
+
+def action_name(prompt_file):
+    """prompts/prompt_speak_fast.yaml -> speak_fast"""
+    name = os.path.splitext(os.path.basename(prompt_file))[0]
+    return name[len("prompt_"):] if name.startswith("prompt_") else name
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class OutputStats:
+    """
+    进程内所有对局共用的输出长度样本
+    新样本先记在内存里，由对局在阶段切换和结束时调用 flush 合并写回统计文件；
+    写回时重新读取文件，把其他进程写入的样本一起合并，不会互相覆盖
+    """
+
+    def __init__(self, stats_file, window):
+        self.stats_file = stats_file
+        self.window = window
+        self.pending = {}  # 上次写回之后的新样本
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.observed = self.merge(self.read(), {})
+
+    def read(self):
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return {}
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取输出长度统计失败: {e}")
+            return {}
+
+    def merge(self, data, pending):
+        return {
+            key: deque(list(data.get(key, [])) + pending.get(key, []), maxlen=self.window)
+            for key in set(data) | set(pending)
+        }
+
+    def values(self, key):
+        with self.lock:
+            return list(self.observed.get(key, ()))
+
+    def add(self, key, value):
+        with self.lock:
+            if key not in self.observed:
+                self.observed[key] = deque(maxlen=self.window)
+            self.observed[key].append(value)
+            if self.stats_file:
+                self.pending.setdefault(key, []).append(value)
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        with self.flush_lock:
+            data = self.merge(self.read(), pending)
+            # 先写临时文件再替换，避免其他进程读到半个文件
+            tmp_file = f"{self.stats_file}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump({key: list(values) for key, values in data.items()}, f)
+                os.replace(tmp_file, self.stats_file)
+            except OSError as e:
+                logger.warning(f"保存输出长度统计失败: {e}")
+                return
+        with self.lock:
+            # 采用文件中合并后的样本，再补上写回期间新记录的样本
+            self.observed = self.merge(data, self.pending)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_stats(stats_file=STATS_FILE, window=500):
+    """同一个统计文件和窗口大小在进程内只有一份样本"""
+    with _stores_lock:
+        key = (stats_file, window)
+        if key not in _stores:
+            _stores[key] = OutputStats(stats_file, window)
+        return _stores[key]
+
+
+class OutputBudget:
+    """
+    输出上限 = 模型覆盖配置 > 行动配置 > 默认表
+    开启 adaptive 且样本足够时，取 min(上限, p99 × headroom)，但不低于 floor
+    """
+
+    def __init__(self, config=None, stats_file=STATS_FILE):
+        config = (config or {}).get("output_tokens", {})
+        self.enabled = config.get("enabled", True)
+        self.actions = dict(DEFAULT_ACTION_TOKENS, **config.get("actions", {}))
+        self.model_overrides = config.get("models", {})
+        self.adaptive = config.get("adaptive", True)
+        self.q = config.get("percentile", 99)
+        self.headroom = config.get("headroom", 1.2)
+        self.min_samples = config.get("min_samples", 20)
+        self.window = config.get("window", 500)
+        self.floor = config.get("floor", 256)
+        self.stats = get_stats(stats_file, self.window)
+
+    def cap(self, model_name, action):
+        """fast/simple 档位的提示词没有单独配置时沿用基础行动的上限"""
+        overrides = self.model_overrides.get(model_name, {})
+        base, _ = split_tier(action)
+        for name in (action, base):
+            if name in overrides:
+                return overrides[name]
+        for name in (action, base):
+            if name in self.actions:
+                return self.actions[name]
+        return DEFAULT_MAX_TOKENS
+
+    @staticmethod
+    def stats_key(model_name, action, variant):
+        return f"{model_name}/{action}" + (f"/{variant}" if variant and variant != "full" else "")
+
+    def get_limit(self, model_name, action, retry=False, variant=""):
+        """
+        本次请求的输出上限；重试时（上次可能被截断）直接使用配置的上限
+        variant 区分同一行动的不同输出格式（如思考级别），各自统计长度
+        """
+        if not self.enabled:
+            return None
+        cap = self.cap(model_name, action)
+        if retry or not self.adaptive:
+            return cap
+        values = self.stats.values(self.stats_key(model_name, action, variant))
+        if len(values) < self.min_samples:
+            return cap
+        adaptive = math.ceil(percentile(values, self.q) * self.headroom)
+        return min(cap, max(self.floor, adaptive))
+
+    def record(self, model_name, action, completion_tokens, variant=""):
+        """记录一次成功请求的输出token数（含推理过程），在 flush 时写回文件"""
+        self.stats.add(self.stats_key(model_name, action, variant), completion_tokens)
+
+    def flush(self):
+        """阶段切换和对局结束时调用，把新样本合并写回统计文件"""
+        self.stats.flush()
@@ -0,0 +1,226 @@
+"""
+角色后验推断
+用NumPy维护与某个玩家已知信息一致的全部角色分配，给出每个座位是狼人的边缘概率
+9人局 [狼人×3, 预言家, 女巫, 猎人, 村民×3] 只有 9!/(3!·3!) = 10080 种分配，直接枚举；
+更大的板子改为按约束采样近似
+"""
+
+from itertools import combinations
+from math import factorial
+import numpy as np
+
+from simulator import ROLE_CODES, ROLE_NAMES, WOLF, DEFAULT_ROLES
+
+# 超过这个数量的分配改用采样
+MAX_ENUMERATE = 200000
+
+_enumeration_cache = {}
+
+
+def count_assignments(roles):
+    """不同角色分配的数量（多重集排列数）"""
+    total = factorial(sum(roles.values()))
+    for count in roles.values():
+        total //= factorial(count)
+    return total
+
+
+def enumerate_assignments(roles):
+    """枚举所有不同的角色分配，返回 (M, N) 的角色编码数组，结果按板子缓存"""
+    key = tuple(sorted(roles.items()))
+    if key not in _enumeration_cache:
+        n = sum(roles.values())
+        partial = np.full((1, n), -1, dtype=np.int8)
+        for role_name, count in roles.items():
+            free = n - (partial[0] >= 0).sum()
+            free_seats = np.nonzero(partial < 0)[1].reshape(len(partial), free)
+            combos = np.array(list(combinations(range(free), count)), dtype=np.int64).reshape(-1, count)
+            # 每个已有的部分分配 × 每种座位组合
+            expanded = np.repeat(partial, len(combos), axis=0)
+            seats = free_seats[:, combos].reshape(-1, count)
+            expanded[np.arange(len(expanded))[:, None], seats] = ROLE_CODES[role_name]
+            partial = expanded
+        _enumeration_cache[key] = partial
+    return _enumeration_cache[key]
+
+
+class RolePosterior:
+    """
+    一个玩家视角下的角色后验
+    硬约束（自己的身份、狼队友、查验结果、游戏仍在继续）直接删除不一致的分配，
+    软证据（投票、夜晚死亡）按似然调整权重
+    """
+
+    def __init__(self, roles=None, max_enumerate=MAX_ENUMERATE, n_samples=50000, seed=None):
+        self.roles = dict(roles or DEFAULT_ROLES)
+        self.n_players = sum(self.roles.values())
+        self.rng = np.random.default_rng(seed)
+        self.n_samples = n_samples
+        self.exact = count_assignments(self.roles) <= max_enumerate
+        self.alive = np.ones(self.n_players, dtype=bool)
+        # 已知身份的座位 {座位下标: 角色编码}，已知阵营的座位 {座位下标: 是否狼人}
+        self.known_roles = {}
+        self.known_teams = {}
+        # 软证据记录，重新采样时需要重放
+        self.soft_evidence = []
+        self.processed_events = 0
+        self._reset_support()
+
+    def _reset_support(self):
+        if self.exact:
+            self.assignments = enumerate_assignments(self.roles)
+        else:
+            self.assignments = self._sample(self.n_samples)
+        self.weights = np.ones(len(self.assignments))
+        self._apply_hard_constraints()
+        for factor_fn in self.soft_evidence:
+            self.weights *= factor_fn(self.assignments)
+
+    def _sample(self, n_samples):
+        """在已知身份和已知阵营的约束下均匀采样角色分配"""
+        n = self.n_players
+        lineup = []
+        for role_name, count in self.roles.items():
+            lineup += [ROLE_CODES[role_name]] * count
+        for code in self.known_roles.values():
+            lineup.remove(code)
+        wolf_flagged = [s for s, is_wolf in self.known_teams.items() if is_wolf and s not in self.known_roles]
+        good_flagged = [s for s, is_wolf in self.known_teams.items() if not is_wolf and s not in self.known_roles]
+        free = [s for s in range(n) if s not in self.known_roles and s not in self.known_teams]
+        wolves_left = lineup.count(WOLF) - len(wolf_flagged)
+        goods = np.array([code for code in lineup if code != WOLF], dtype=np.int8)
+        if wolves_left < 0 or wolves_left > len(free):
+            raise ValueError("已知信息与板子配置矛盾")
+
+        samples = np.full((n_samples, n), -1, dtype=np.int8)
+        for seat, code in self.known_roles.items():
+            samples[:, seat] = code
+        samples[:, wolf_flagged] = WOLF
+        # 剩余的狼人随机落在未知座位上
+        if wolves_left:
+            free = np.array(free)
+            chosen = self.rng.random((n_samples, len(free))).argsort(axis=1)[:, :wolves_left]
+            samples[np.arange(n_samples)[:, None], free[chosen]] = WOLF
+        # 其余好人角色随机排列到剩下的座位
+        if len(goods):
+            seats = np.nonzero(samples < 0)[1].reshape(n_samples, len(goods))
+            perm = goods[self.rng.random((n_samples, len(goods))).argsort(axis=1)]
+            samples[np.arange(n_samples)[:, None], seats] = perm
+        return samples
+
+    def _keep(self, mask):
+        self.assignments = self.assignments[mask]
+        self.weights = self.weights[mask]
+        # 采样模式下有效样本太少时按当前约束重新采样
+        if not self.exact and len(self.assignments) < self.n_samples // 10:
+            self._reset_support()
+
+    def _apply_hard_constraints(self):
+        mask = np.ones(len(self.assignments), dtype=bool)
+        for seat, code in self.known_roles.items():
+            mask &= self.assignments[:, seat] == code
+        for seat, is_wolf in self.known_teams.items():
+            mask &= (self.assignments[:, seat] == WOLF) == is_wolf
+        mask &= self._game_continues_mask()
+        self.assignments = self.assignments[mask]
+        self.weights = self.weights[mask]
+
+    def _game_continues_mask(self):
+        """游戏还在进行说明存活狼人至少1个，且不多于存活好人（与 check_winner 一致）"""
+        wolves = (self.assignments[:, self.alive] == WOLF).sum(axis=1)
+        others = self.alive.sum() - wolves
+        return (wolves >= 1) & (wolves <= others)
+
+    def observe_role(self, player_idx, role_type):
+        """得知某个玩家的确切身份（自己的身份、狼队友、公开翻牌）"""
+        seat, code = player_idx - 1, ROLE_CODES[role_type]
+        self.known_roles[seat] = code
+        self._keep(self.assignments[:, seat] == code)
+
+    def observe_team(self, player_idx, is_wolf):
+        """得知某个玩家的阵营（预言家查验结果）"""
+        seat = player_idx - 1
+        self.known_teams[seat] = is_wolf
+        self._keep((self.assignments[:, seat] == WOLF) == is_wolf)
+
+    def observe_death(self, player_idx, night_death=False, wolf_factor=0.3):
+        """
+        玩家出局，游戏仍在继续
+        夜晚出局可能是被狼杀或被毒，狼人极少自刀，按 wolf_factor 降低其为狼人的权重
+        """
+        seat = player_idx - 1
+        self.alive[seat] = False
+        if night_death:
+            self._add_soft_evidence(lambda a: np.where(a[:, seat] == WOLF, wolf_factor, 1.0))
+        self._keep(self._game_continues_mask())
+
+    def observe_vote(self, voter_idx, target_idx, teammate_factor=0.2):
+        """投票证据：狼人很少投票给狼队友"""
+        if target_idx is None or target_idx < 1:
+            return
+        voter, target = voter_idx - 1, target_idx - 1
+        self._add_soft_evidence(
+            lambda a: np.where((a[:, voter] == WOLF) & (a[:, target] == WOLF), teammate_factor, 1.0))
+
+    def _add_soft_evidence(self, factor_fn):
+        self.soft_evidence.append(factor_fn)
+        self.weights = self.weights * factor_fn(self.assignments)
+
+    def observe_event(self, event, viewer_idx):
+        """按 history 中的事件增量更新，viewer_idx 为持有该后验的玩家"""
+        event_type = event.event_type
+        if event_type == "divine" and event.player_idx == viewer_idx:
+            self.observe_team(event.target_idx, event.result == "狼人")
+        elif event_type == "kill":
+            self.observe_death(event.player_idx, night_death=True)
+        elif event_type == "execute":
+            for vote in getattr(event, "votes", []):
+                self.observe_vote(vote["player_idx"], vote["vote_id"])
+            self.observe_death(event.player_idx)
+        elif event_type == "attack":
+            self.observe_death(event.player_idx)
+
+    def role_probabilities(self):
+        """返回 {玩家编号: {角色: 概率}}"""
+        total = self.weights.sum()
+        result = {}
+        for seat in range(self.n_players):
+            result[seat + 1] = {}
+            for role_name in self.roles:
+                mass = self.weights[self.assignments[:, seat] == ROLE_CODES[role_name]].sum()
+                result[seat + 1][role_name] = float(mass / total) if total else 0.0
+        return result
+
+    def wolf_probabilities(self):
+        """返回每个座位是狼人的边缘概率 {玩家编号: 概率}"""
+        total = self.weights.sum()
+        if not total:
+            return {seat + 1: 0.0 for seat in range(self.n_players)}
+        marginal = self.weights @ (self.assignments == WOLF) / total
+        return {seat + 1: float(p) for seat, p in enumerate(marginal)}
+
+    def most_likely_wolf(self, candidates):
+        """在候选玩家中选择狼人概率最高的一个，概率相同随机选"""
+        if not candidates:
+            return -1
+        probs = self.wolf_probabilities()
+        best = max(probs[c] for c in candidates)
+        top = [c for c in candidates if probs[c] == best]
+        return int(self.rng.choice(top))
+
+    def support_size(self):
+        return len(self.assignments)
+
+
+def build_posterior(player):
+    """为游戏中的某个玩家建立后验：自己的身份，狼人额外知道队友"""
+    roles = {}
+    for p in player.game.players:
+        roles[p.role_type] = roles.get(p.role_type, 0) + 1
+    posterior = RolePosterior(roles)
+    posterior.observe_role(player.player_index, player.role_type)
+    if player.role_type == ROLE_NAMES[WOLF]:
+        for p in player.game.players:
+            if p.role_type == ROLE_NAMES[WOLF] and p.player_index != player.player_index:
+                posterior.observe_role(p.player_index, p.role_type)
+    return posterior
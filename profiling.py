@@ -0,0 +1,334 @@
+"""
+按需性能剖析
+开启后按接口请求或按整局游戏记录Python侧的CPU热点，可选在白天/夜晚切换时记录内存快照:
+  cprofile: 确定性剖析，输出 profile_<游戏>_<名称>.prof，用 python -m pstats 或 snakeviz 查看
+  sampling: 每隔 interval_ms 采样一次调用栈，开销小，输出 profile_<游戏>_<名称>.folded（折叠栈格式，
+            可以直接拖进 https://www.speedscope.app 或用 flamegraph.pl 生成火焰图）
+  tracemalloc: 在开局、每次白天/夜晚切换和结束时保存 memory_<游戏>_<序号>_<阶段>.txt，列出分配最多的代码行和与上一个快照的差异
+scope 为 request 时每个接口请求一个文件（只保存耗时超过 min_ms 的请求），为 game 时整局一个文件，
+web.py 的 /profiles 列出和下载这些文件。
+
+config.json:
+    "profiling": {"enabled": false, "mode": "cprofile", "scope": "game", "interval_ms": 5, "min_ms": 0,
+                  "tracemalloc": false, "tracemalloc_frames": 10, "dir": "logs"}
+环境变量优先于 config.json: WOLF_BOT_PROFILE=cprofile|sampling 开启剖析，WOLF_BOT_PROFILE_SCOPE=request|game，
+WOLF_BOT_TRACEMALLOC=1 开启内存快照
+"""
+
+import cProfile
+import collections
+import contextlib
+import itertools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILING = {
+    "enabled": False,
+    "mode": "cprofile",          # cprofile / sampling
+    "scope": "game",             # request / game
+    "interval_ms": 5,            # sampling 模式的采样间隔
+    "min_ms": 0,                 # request 模式只保存耗时超过这个值的请求
+    "tracemalloc": False,
+    "tracemalloc_frames": 10,
+    "dir": "logs",
+}
+MODES = ("cprofile", "sampling")
+# 内存快照文本中列出的行数
+TOP_ALLOCATIONS = 30
+# /profiles 只提供这些文件
+PROFILE_FILE_PATTERN = re.compile(r"^(profile|memory)_[\w.-]+\.(prof|folded|txt)$")
+
+_settings = {}
+_lock = threading.Lock()
+_started_tracemalloc = False  # 只停止由这里开启的 tracemalloc
+_seq = itertools.count(1)
+_games = {}       # 游戏ID -> 整局的 Profiler
+# Python 3.12 起整个进程同时只能有一个 cProfile 处于开启状态（再 enable 会抛 ValueError），
+# 所以 cprofile 模式下同一时刻只剖析一个线程；lockstep 多局并行时其他线程这一步不剖析，需要完整数据时用 sampling 模式
+_cprofile_busy = threading.Lock()
+_snapshots = {}   # 游戏ID -> (序号, 上一个内存快照)
+
+
+def _from_env(settings):
+    mode = os.environ.get("WOLF_BOT_PROFILE", "").lower()
+    if mode in MODES:
+        settings.update(enabled=True, mode=mode)
+    elif mode in ("0", "off", "false"):
+        settings["enabled"] = False
+    scope = os.environ.get("WOLF_BOT_PROFILE_SCOPE", "").lower()
+    if scope in ("request", "game"):
+        settings["scope"] = scope
+    if os.environ.get("WOLF_BOT_TRACEMALLOC"):
+        settings["tracemalloc"] = os.environ["WOLF_BOT_TRACEMALLOC"] not in ("0", "false")
+    return settings
+
+
+def configure(config=None):
+    global _settings, _started_tracemalloc
+    settings = _from_env(dict(DEFAULT_PROFILING, **(config or {}).get("profiling", {})))
+    if settings["mode"] not in MODES:
+        raise ValueError(f"无效的剖析模式: {settings['mode']}")
+    with _lock:
+        _settings = settings
+    if settings["tracemalloc"] and not tracemalloc.is_tracing():
+        tracemalloc.start(settings["tracemalloc_frames"])
+        _started_tracemalloc = True
+    elif not settings["tracemalloc"] and _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def enabled(scope=None):
+    return _settings["enabled"] and (scope is None or _settings["scope"] == scope)
+
+
+def profile_dir():
+    return _settings["dir"]
+
+
+def _safe(name):
+    return re.sub(r"[^\w.-]+", "_", str(name)).strip("_") or "root"
+
+
+class _Sampler(threading.Thread):
+    """所有 sampling 剖析共用一个采样线程，只采样正在剖析的线程"""
+
+    def __init__(self):
+        super().__init__(daemon=True, name="profiling-sampler")
+        self.targets = {}  # 线程ID -> Profiler
+        self.lock = threading.Lock()
+
+    def add(self, thread_id, profiler):
+        with self.lock:
+            self.targets[thread_id] = profiler
+
+    def remove(self, thread_id):
+        with self.lock:
+            self.targets.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            time.sleep(_settings["interval_ms"] / 1000)
+            with self.lock:
+                targets = list(self.targets.items())
+            if not targets:
+                continue
+            frames = sys._current_frames()
+            for thread_id, profiler in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profiler.add_sample(_collapse(frame))
+
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+_sampler = None
+
+
+def _get_sampler():
+    global _sampler
+    with _lock:
+        if _sampler is None:
+            _sampler = _Sampler()
+            _sampler.start()
+        return _sampler
+
+
+class Profiler:
+    """一次请求或一局游戏的剖析，可以在多个线程中先后进入，同一时刻只剖析一个线程"""
+
+    def __init__(self, game_id, name):
+        self.game_id = game_id
+        self.name = name
+        self.mode = _settings["mode"]
+        self.profile = cProfile.Profile() if self.mode == "cprofile" else None
+        self.stacks = collections.Counter()
+        self.busy = threading.Lock()
+        self.finished = False
+        self.saved = False
+        self.active_count = 0
+        self.skipped = 0  # 因为其他 cProfile 正在运行而没有剖析的次数
+
+    def add_sample(self, stack):
+        self.stacks[stack] += 1
+
+    @contextlib.contextmanager
+    def active(self):
+        # 同一局的并发请求（如观战轮询）不剖析，避免多个线程同时写入同一个 cProfile
+        if not self.busy.acquire(blocking=False):
+            yield self
+            return
+        if self.profile is not None and not self._enable_cprofile():
+            self.busy.release()
+            yield self
+            return
+        self.active_count += 1
+        thread_id = threading.get_ident()
+        if self.profile is None:
+            _get_sampler().add(thread_id, self)
+        try:
+            yield self
+        finally:
+            if self.profile is not None:
+                self.profile.disable()
+                _cprofile_busy.release()
+            else:
+                _get_sampler().remove(thread_id)
+            self.active_count -= 1
+            self.busy.release()
+            if self.finished:
+                self.save()
+
+    def _enable_cprofile(self):
+        """开启 cProfile，其他线程或外部工具的 cProfile 正在运行时跳过这次剖析，返回是否开启"""
+        if not _cprofile_busy.acquire(blocking=False):
+            self.skipped += 1
+            return False
+        try:
+            self.profile.enable()
+        except ValueError as e:
+            _cprofile_busy.release()
+            self.skipped += 1
+            logger.debug(f"无法开启 cProfile，跳过本次剖析: {e}")
+            return False
+        return True
+
+    def finish(self):
+        """游戏结束时调用，正在剖析的线程退出后保存"""
+        self.finished = True
+        if not self.active_count:
+            self.save()
+
+    def save(self):
+        with _lock:
+            if self.saved:
+                return None
+            self.saved = True
+        os.makedirs(profile_dir(), exist_ok=True)
+        base = os.path.join(profile_dir(), f"profile_{_safe(self.game_id)}_{_safe(self.name)}")
+        if self.profile is not None:
+            path = base + ".prof"
+            self.profile.dump_stats(path)
+        else:
+            path = base + ".folded"
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        logger.info(f"剖析结果已保存到 {path}")
+        return path
+
+
+@contextlib.contextmanager
+def profile_request(game_id, name):
+    """scope 为 request 时剖析一次接口请求，为 game 时计入该局的剖析"""
+    if not _settings["enabled"]:
+        yield
+        return
+    if _settings["scope"] == "game":
+        with game_profiler(game_id).active():
+            yield
+        return
+    profiler = Profiler(game_id, f"{name}_{next(_seq)}")
+    start = time.perf_counter()
+    with profiler.active():
+        yield
+    if (time.perf_counter() - start) * 1000 >= _settings["min_ms"]:
+        profiler.save()
+
+
+class _NoopProfiler:
+    @contextlib.contextmanager
+    def active(self):
+        yield self
+
+    def finish(self):
+        pass
+
+
+_NOOP = _NoopProfiler()
+
+
+def game_profiler(game_id):
+    """一局游戏的剖析，scope 不是 game 时返回什么都不做的对象"""
+    if not enabled("game"):
+        return _NOOP
+    with _lock:
+        profiler = _games.get(game_id)
+        if profiler is None:
+            profiler = _games[game_id] = Profiler(game_id, "game")
+    return profiler
+
+
+def finish_game(game_id):
+    """对局结束或被重新开局时保存该局的剖析和最后一个内存快照"""
+    with _lock:
+        profiler = _games.pop(game_id, None)
+        has_snapshot = game_id in _snapshots
+    if profiler is not None:
+        profiler.finish()
+    if has_snapshot:
+        memory_snapshot(game_id, "end")
+        with _lock:
+            _snapshots.pop(game_id, None)
+
+
+def memory_snapshot(game_id, label):
+    """开启 tracemalloc 时保存一份内存分配统计，并与该局上一个快照比较"""
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+    with _lock:
+        index, previous = _snapshots.get(game_id, (0, None))
+        _snapshots[game_id] = (index + 1, snapshot)
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [f"当前 {current / 2 ** 20:.1f} MB, 峰值 {peak / 2 ** 20:.1f} MB", "", f"分配最多的 {TOP_ALLOCATIONS} 行:"]
+    lines += [str(stat) for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]]
+    if previous is not None:
+        lines += ["", f"与上一个快照相比增长最多的 {TOP_ALLOCATIONS} 行:"]
+        lines += [str(stat) for stat in snapshot.compare_to(previous, "lineno")[:TOP_ALLOCATIONS]]
+    os.makedirs(profile_dir(), exist_ok=True)
+    path = os.path.join(profile_dir(), f"memory_{_safe(game_id)}_{index:03d}_{_safe(label)}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def list_profiles():
+    """剖析目录中的剖析和内存快照文件，按修改时间从新到旧"""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    files = []
+    for name in os.listdir(directory):
+        if PROFILE_FILE_PATTERN.match(name):
+            stat = os.stat(os.path.join(directory, name))
+            files.append({"name": name, "size": stat.st_size, "modified": stat.st_mtime})
+    return sorted(files, key=lambda item: item["modified"], reverse=True)
+
+
+def profile_path(name):
+    """下载时只接受 list_profiles 中的文件名，返回完整路径，不存在时返回 None"""
+    if not PROFILE_FILE_PATTERN.match(name):
+        return None
+    path = os.path.join(profile_dir(), name)
+    return path if os.path.isfile(path) else None
+
+
+configure()
@@ -0,0 +1,91 @@
+"""
+提示词档位选择
+发言和查验有 full / fast / simple 三档提示词（prompts/prompt_<行动>[_fast|_simple].yaml），
+根据 config.json 中的延迟目标和模型实测延迟为每次决策选择质量最高、又能满足目标的档位
+"""
+
+import os
+import threading
+
+TIER_FULL, TIER_FAST, TIER_SIMPLE = "full", "fast", "simple"
+# 按质量从高到低排列
+TIERS = (TIER_FULL, TIER_FAST, TIER_SIMPLE)
+
+PROMPT_DIR = "prompts"
+
+
+def prompt_file(action, tier):
+    suffix = "" if tier == TIER_FULL else f"_{tier}"
+    return f"{PROMPT_DIR}/prompt_{action}{suffix}.yaml"
+
+
+def split_tier(action):
+    """speak_fast -> (speak, fast)，没有档位后缀的返回 full"""
+    for tier in TIERS[1:]:
+        if action.endswith(f"_{tier}"):
+            return action[:-len(tier) - 1], tier
+    return action, TIER_FULL
+
+
+def available_tiers(action):
+    return [tier for tier in TIERS if os.path.exists(prompt_file(action, tier))]
+
+
+class PromptTierSelector:
+    """
+    prompt_tier 配置:
+        mode: auto 按延迟自动选择; full / fast / simple 固定档位
+        latency_target: 每次决策的目标延迟（秒），不设置时 auto 模式始终使用 full
+        alpha: 延迟指数滑动平均的系数
+        probe_every: 每隔多少次决策重新试一次更高的档位，刷新它的延迟
+    """
+
+    def __init__(self, config=None):
+        config = (config or {}).get("prompt_tier", {})
+        self.mode = config.get("mode", "auto")
+        self.latency_target = config.get("latency_target")
+        self.alpha = config.get("alpha", 0.3)
+        self.probe_every = config.get("probe_every", 20)
+        self.latency = {}  # (模型, 行动, 档位) -> 滑动平均延迟
+        self.decisions = {}  # (模型, 行动) -> 决策次数
+        self.lock = threading.Lock()
+
+    def select(self, model_name, action):
+        """返回 (提示词文件, 档位)"""
+        tiers = available_tiers(action)
+        if not tiers:
+            return prompt_file(action, TIER_FULL), TIER_FULL
+        if self.mode in tiers:
+            return prompt_file(action, self.mode), self.mode
+        if self.mode != "auto" or not self.latency_target:
+            return prompt_file(action, tiers[0]), tiers[0]
+
+        with self.lock:
+            count = self.decisions.get((model_name, action), 0) + 1
+            self.decisions[(model_name, action)] = count
+            chosen = None
+            for tier in tiers:
+                latency = self.latency.get((model_name, action, tier))
+                # 没有测量过的档位先试一次
+                if latency is None or latency <= self.latency_target:
+                    chosen = tier
+                    break
+            if chosen is None:
+                chosen = min(tiers, key=lambda t: self.latency[(model_name, action, t)])
+            # 定期试探更高一档，避免一次慢请求让高档位永远不再被选中
+            index = tiers.index(chosen)
+            if index > 0 and self.probe_every and count % self.probe_every == 0:
+                chosen = tiers[index - 1]
+        return prompt_file(action, chosen), chosen
+
+    def record(self, model_name, action, seconds):
+        """记录一次请求的延迟，action 为提示词文件对应的行动名（如 speak_fast）"""
+        base, tier = split_tier(action)
+        key = (model_name, base, tier)
+        with self.lock:
+            previous = self.latency.get(key)
+            self.latency[key] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def summary(self):
+        with self.lock:
+            return {"/".join(key): round(value, 3) for key, value in self.latency.items()}
@@ -0,0 +1,308 @@
+"""
+模型提供商注册表
+提供商目录（模型列表、base_url、环境变量、默认限流额度）和模型到实现类的映射只在这里维护一份，
+BuildModel、ModelConfigManager、EnhancedLlmManager、限流和token估算都从这里读取。
+查找顺序: 精确的模型名（字典查找）-> 前缀规则（如 ep-、openrouter/、pool/），按前缀长度从长到短匹配。
+
+实现类写成 "模块:类名"，第一次创建该模型时才导入，构造参数为 (model_name, api_key, force_json)。
+第三方包可以在 wolf_bot.providers 入口点组中注册一个函数，参数为 ProviderRegistry，例如 pyproject.toml 中:
+    [project.entry-points."wolf_bot.providers"]
+    mock = "my_package.mock_llm:register"
+"""
+
+import importlib
+import logging
+import threading
+from importlib.metadata import entry_points
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "wolf_bot.providers"
+
+# rate_limit: 每个API KEY的默认额度（rpm 每分钟请求数, tpm 每分钟token数, concurrency 并发数, 0 或缺省表示不限），
+# 按各平台入门档设置，可以在 config.json 的 rate_limits 中按账号实际额度覆盖
+# llm_class: 提供商默认的实现类；model_classes: 个别模型使用的实现类；prefixes: 按前缀匹配的模型名
+BUILTIN_PROVIDERS = {
+    # 本地模型
+    "local": {
+        "name": "本地模型",
+        "models": ["Qwen3-32B-AWQ"],
+        "api_key_required": False,
+        "base_url": "http://172.16.13.100:8000/v1",
+        "description": "本地部署的Qwen模型",
+        "rate_limit": {"concurrency": 8},
+        "llm_class": "llm:LocalQwenLlm",
+    },
+
+    # 本地模型池，端点在 config.json 的 local_pool.endpoints 中配置
+    "local_pool": {
+        "name": "本地模型池",
+        "models": ["pool/Qwen3-32B-AWQ"],
+        "prefixes": ["pool/"],
+        "api_key_required": False,
+        "base_url": "",
+        "description": "多个本地vLLM副本，按未完成请求数负载均衡",
+        "rate_limit": {},
+        "llm_class": "llm:LocalPoolLlm",
+    },
+
+    # 模拟模型，不发网络请求，mock/<毫秒数> 模拟响应延迟
+    "mock": {
+        "name": "模拟模型",
+        "models": ["mock"],
+        "prefixes": ["mock/"],
+        "api_key_required": False,
+        "base_url": "",
+        "description": "按脚本策略立即回答，用于基准测试和压测",
+        "rate_limit": {},
+        "llm_class": "llm:MockLlm",
+    },
+
+    # OpenAI模型
+    "openai": {
+        "name": "OpenAI",
+        "models": ["gpt-4o", "gpt-4o-mini", "gpt-4.1", "gpt-4.1-mini", "gpt-4.1-nano", "o1-mini", "o3-mini", "o4-mini"],
+        "api_key_required": True,
+        "env_key": "OPENAI_API_KEY",
+        "base_url": "https://api.openai.com/v1",
+        "description": "OpenAI官方模型",
+        "rate_limit": {"rpm": 500, "tpm": 200000, "concurrency": 16},
+        "llm_class": "llm:OpenAILlm",
+    },
+
+    # DeepSeek模型
+    "deepseek": {
+        "name": "DeepSeek",
+        "models": ["deepseek-chat", "deepseek-reasoner"],
+        "api_key_required": True,
+        "env_key": "DEEPSEEK_API_KEY",
+        "base_url": "https://api.deepseek.com",
+        "description": "DeepSeek AI模型",
+        "rate_limit": {"concurrency": 16},
+        "llm_class": "llm:DeepSeekLlm",
+    },
+
+    # 通义千问模型
+    "qwen": {
+        "name": "通义千问",
+        "models": ["qwen-max", "qwen-plus", "qwen-long", "qwen-max-longcontext", "qwen-max-2025-01-25"],
+        "api_key_required": True,
+        "env_key": "QWEN_API_KEY",
+        "base_url": "https://dashscope.aliyuncs.com/compatible-mode/v1",
+        "description": "阿里云通义千问模型",
+        "rate_limit": {"rpm": 600, "tpm": 1000000, "concurrency": 16},
+        "llm_class": "llm:QwenLlm",
+    },
+
+    # 智谱AI模型
+    "zhipuai": {
+        "name": "智谱AI",
+        "models": ["glm-3-turbo", "glm-4", "glm-4v", "glm-4-plus"],
+        "api_key_required": True,
+        "env_key": "ZHIPUAI_API_KEY",
+        "base_url": "https://open.bigmodel.cn/api/paas/v4",
+        "description": "智谱AI GLM模型",
+        "rate_limit": {"concurrency": 5},
+        "llm_class": "llm:ZhipuLlm",
+    },
+
+    # 月之暗面模型
+    "moonshot": {
+        "name": "月之暗面",
+        "models": ["moonshot-v1-32k"],
+        "api_key_required": True,
+        "env_key": "MOONSHOT_API_KEY",
+        "base_url": "https://api.moonshot.cn/v1",
+        "description": "月之暗面Kimi模型",
+        "rate_limit": {"rpm": 200, "tpm": 128000, "concurrency": 10},
+        "llm_class": "llm:KimiLlm",
+    },
+
+    # 豆包模型，模型名为火山方舟的推理接入点 ep-xxxx
+    "doubao": {
+        "name": "豆包",
+        "models": ["ep-xxxx"],
+        "prefixes": ["ep-"],
+        "api_key_required": True,
+        "env_key": "DOUBAO_API_KEY",
+        "base_url": "https://ark.cn-beijing.volces.com/api/v3",
+        "description": "字节跳动豆包模型",
+        "rate_limit": {"rpm": 1000, "tpm": 800000, "concurrency": 16},
+        "llm_class": "llm:DouBaoLlm",
+    },
+
+    # 腾讯混元模型
+    "hunyuan": {
+        "name": "腾讯混元",
+        "models": ["hunyuan-large", "hunyuan-turbo-latest"],
+        "api_key_required": True,
+        "env_key": "HUNYUAN_API_KEY",
+        "base_url": "https://api.hunyuan.cloud.tencent.com/v1",
+        "description": "腾讯混元大模型",
+        "rate_limit": {"concurrency": 5},
+        "llm_class": "llm:HunyuanLlm",
+    },
+
+    # 百川AI模型
+    "baichuan": {
+        "name": "百川AI",
+        "models": ["Baichuan4", "Baichuan3-Turbo", "Baichuan3-Turbo-128k", "Baichuan2-Turbo", "Baichuan2-Turbo-192k"],
+        "api_key_required": True,
+        "env_key": "BAICHUAN_API_KEY",
+        "base_url": "https://api.baichuan-ai.com/v1",
+        "description": "百川AI大模型",
+        "rate_limit": {"rpm": 120, "concurrency": 8},
+        "llm_class": "llm:BaichuanLlm",
+    },
+
+    # xAI模型
+    "xai": {
+        "name": "xAI",
+        "models": ["grok-3-latest", "grok-3-mini-beta", "grok-3-mini-fast-beta"],
+        "api_key_required": True,
+        "env_key": "XAI_API_KEY",
+        "base_url": "https://api.x.ai/v1",
+        "description": "马斯克xAI Grok模型",
+        "rate_limit": {"rpm": 480, "concurrency": 16},
+        "llm_class": "llm:XAiLlm",
+        "model_classes": {"grok-3-mini-beta": "llm:XAIReason", "grok-3-mini-fast-beta": "llm:XAIReason"},
+    },
+
+    # SiliconFlow模型
+    "siliconflow": {
+        "name": "SiliconFlow",
+        "models": ["deepseek-ai/DeepSeek-R1", "Pro/deepseek-ai/DeepSeek-R1"],
+        "api_key_required": True,
+        "env_key": "SILICONFLOW_API_KEY",
+        "base_url": "https://api.siliconflow.cn/v1",
+        "description": "SiliconFlow推理模型",
+        "rate_limit": {"rpm": 1000, "tpm": 50000, "concurrency": 8},
+        "llm_class": "llm:SiliconReasoner",
+    },
+
+    # OpenRouter模型，openrouter/ 后面是 OpenRouter 上的模型名
+    "openrouter": {
+        "name": "OpenRouter",
+        "models": [
+            "openrouter/google/gemini-2.5-pro-exp-03-25:free",
+            "openrouter/anthropic/claude-3.7-sonnet",
+            "openrouter/anthropic/claude-3.7-sonnet:thinking",
+            "openrouter/moonshotai/kimi-vl-a3b-thinking:free",
+            "openrouter/deepseek/deepseek-r1:free"
+        ],
+        "prefixes": ["openrouter/"],
+        "api_key_required": True,
+        "env_key": "OPENROUTER_API_KEY",
+        "base_url": "https://openrouter.ai/api/v1",
+        "description": "OpenRouter多模型聚合",
+        "rate_limit": {"rpm": 20, "concurrency": 8},
+        "llm_class": "llm:OpenRouterLlm",
+    },
+
+    # M302AI模型
+    "m302ai": {
+        "name": "M302AI",
+        "models": ["m302/o3-mini", "m302/o3-mini-2025-01-31", "gemini-2.0-flash-thinking-exp-01-21", "claude-3-7-sonnet-latest", "claude-3-7-sonnet-thinking"],
+        "api_key_required": True,
+        "env_key": "M302AI_API_KEY",
+        "base_url": "https://api.302.ai",
+        "description": "M302AI推理模型",
+        "rate_limit": {"concurrency": 8},
+        "llm_class": "llm:M302Llm",
+    },
+}
+
+# 不属于任何提供商的模型（不限流、不计入提供商统计）
+BUILTIN_MODELS = {
+    "human": "llm:HumanLlm",
+}
+
+
+def load_class(path):
+    """"llm:OpenAILlm" -> 类对象；传入的已经是可调用对象时原样返回"""
+    if not isinstance(path, str):
+        return path
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+class ProviderRegistry:
+    def __init__(self):
+        self.providers = {}    # 提供商ID -> 目录信息
+        self.models = {}       # 模型名 -> (提供商ID, 实现类)
+        self.prefixes = []     # [(前缀, 提供商ID, 实现类)]，按前缀长度从长到短
+        self.plugins_loaded = False
+        self.lock = threading.Lock()
+
+    def register_provider(self, provider_id, info):
+        """注册或替换一个提供商，info 的字段同 BUILTIN_PROVIDERS"""
+        info = dict(info)
+        info.setdefault("name", provider_id)
+        info.setdefault("models", [])
+        info.setdefault("api_key_required", True)
+        info.setdefault("base_url", "")
+        info.setdefault("description", "")
+        info.setdefault("rate_limit", {})
+        self.providers[provider_id] = info
+        model_classes = info.get("model_classes", {})
+        for model_name in info["models"]:
+            self.register_model(model_name, provider_id, model_classes.get(model_name, info.get("llm_class")))
+        for prefix in info.get("prefixes", []):
+            self.register_prefix(prefix, provider_id, info.get("llm_class"))
+
+    def register_model(self, model_name, provider_id, llm_class):
+        self.models[model_name] = (provider_id, llm_class)
+        if provider_id in self.providers and model_name not in self.providers[provider_id]["models"]:
+            self.providers[provider_id]["models"].append(model_name)
+
+    def register_prefix(self, prefix, provider_id, llm_class):
+        self.prefixes = [item for item in self.prefixes if item[0] != prefix]
+        self.prefixes.append((prefix, provider_id, llm_class))
+        self.prefixes.sort(key=lambda item: len(item[0]), reverse=True)
+
+    def load_plugins(self):
+        """加载入口点中注册的提供商，只加载一次"""
+        with self.lock:
+            if self.plugins_loaded:
+                return
+            self.plugins_loaded = True
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            try:
+                entry_point.load()(self)
+            except Exception as e:
+                logger.warning(f"加载提供商插件 {entry_point.name} 失败: {e}")
+
+    def lookup(self, model_name):
+        """返回 (提供商ID, 实现类)，找不到时返回 (None, None)"""
+        self.load_plugins()
+        if model_name in self.models:
+            return self.models[model_name]
+        for prefix, provider_id, llm_class in self.prefixes:
+            if model_name.startswith(prefix):
+                return provider_id, llm_class
+        return None, None
+
+    def provider_for_model(self, model_name):
+        return self.lookup(model_name)[0]
+
+    def get_provider(self, provider_id):
+        self.load_plugins()
+        return self.providers.get(provider_id, {})
+
+    def build(self, model_name, api_key, force_json=False):
+        _, llm_class = self.lookup(model_name)
+        if llm_class is None:
+            raise ValueError("未知的模型名称:", model_name)
+        return load_class(llm_class)(model_name, api_key, force_json)
+
+
+registry = ProviderRegistry()
+for _provider_id, _info in BUILTIN_PROVIDERS.items():
+    registry.register_provider(_provider_id, _info)
+for _model_name, _llm_class in BUILTIN_MODELS.items():
+    registry.register_model(_model_name, None, _llm_class)
+
+
+def provider_for_model(model_name):
+    """根据模型名称找到提供商"""
+    return registry.provider_for_model(model_name)
@@ -31,7 +31,7 @@ class DivineAction extends Action {
             const role = this.get_role(diviner.index);
             const response = await this.game.gameData.divine({player_idx: diviner.index});
             
-            if (this.game.display_thinking && this.game.display_divine_action) {
+            if (this.game.display_thinking && this.game.display_divine_action && response.thinking) {
                 await this.game.ui.showPlayer(diviner.index);
                 await this.game.ui.speak(`${diviner.index}号 ${role} 思考中`, this.game.auto_play,response.thinking, true);
                 await this.game.ui.hidePlayer();
@@ -69,7 +69,7 @@ class WolfAction extends Action {
         }
         const role = this.get_role(wolf.index);
         if (this.game.display_wolf_action) {
-            if (this.game.display_thinking) {
+            if (this.game.display_thinking && response.reason) {
                 await this.game.ui.speak(`${wolf.index}号 ${role} 思考中：`, this.game.auto_play,response.reason, true);
             }
             await this.game.ui.speak(`${wolf.index}号 ${role} `, this.game.auto_play, killWho);
@@ -155,7 +155,7 @@ class WitchAction extends Action {
             }
             const role = this.get_role(witch.index);
             if (this.game.display_witch_action) {
-                if (this.game.display_thinking) {
+                if (this.game.display_thinking && result.thinking) {
                     await this.game.ui.speak(`${witch.index}号 ${role} 思考中：`,this.game.auto_play, result.thinking, true);
                 }
                 await this.game.ui.speak(`${witch.index}号 ${role} `, this.game.auto_play,cureWho + poisonWho);
@@ -259,7 +259,7 @@ class SpeakAction extends Action {
                 player_idx: this.player_idx,
                 content: speak_content
             });
-            if (this.game.display_thinking && result.thinking != "") {
+            if (this.game.display_thinking && result.thinking) {
                 await this.game.ui.speak(`${this.player_idx}号 ${role} 思考中：`,this.game.auto_play, result.thinking, true);
             }
             await this.game.ui.speak(`${this.player_idx}号 ${role} 发言：`, this.game.auto_play,result.speak);
@@ -298,7 +298,7 @@ class VoteAction extends Action {
 
             if (this.game.display_vote_action) {
                 await this.game.ui.showPlayer(this.player_idx);
-                if (this.game.display_thinking) {
+                if (this.game.display_thinking && result.thinking) {
                     await this.game.ui.speak(`${this.player_idx}号 ${role} 思考中：`, this.game.auto_play,result.thinking, true);
                 }
                 const vote_id = result.vote;
@@ -51,7 +51,7 @@ class Game {
             
             await this.ui.showPlayer(player_idx);
             const role = this.display_role ? this.players[player_idx - 1].role_type : "玩家";
-            if (this.display_thinking) {
+            if (this.display_thinking && result.thinking) {
                 await this.ui.speak(`${player_idx}号 ${role} 思考中：`, this.auto_play,result.thinking, true);
             }
             await this.ui.speak(`${player_idx}号 ${role} 发表遗言：`, this.auto_play,result.speak);
@@ -0,0 +1,188 @@
+"""
+按提供商和API KEY限流
+每个 (提供商, API KEY) 有一个请求数令牌桶（rpm）、一个token数令牌桶（tpm）和一个并发上限，
+请求前在桶上等待而不是触发 429；提供商返回 Retry-After 时整个桶暂停到指定时间
+默认额度配置在 providers.py 提供商目录中各提供商的 rate_limit 里，可以在 config.json 的 rate_limits 里覆盖
+"""
+
+import hashlib
+import re
+import threading
+import time
+
+from providers import registry
+
+
+class RateLimitedError(Exception):
+    """提供商返回了限流错误，retry_after 为建议等待的秒数"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """容量为 capacity、每秒补充 rate 的令牌桶，capacity 为 0 表示不限"""
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """还需要等待多久才能取出 amount 个令牌"""
+        if not self.capacity:
+            return max(0.0, self.paused_until - now)
+        self._refill(now)
+        amount = min(amount, self.capacity)  # 单个请求超过桶容量时按桶满处理，避免永远等待
+        wait = 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+        return max(wait, self.paused_until - now)
+
+    def take(self, amount):
+        """取出令牌，返回实际扣除的数量（超过容量时按容量扣除，不限时为 0）"""
+        if not self.capacity:
+            return 0
+        amount = min(amount, self.capacity)
+        self.tokens -= amount
+        return amount
+
+    def give_back(self, amount):
+        if self.capacity:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ProviderLimiter:
+    def __init__(self, name, rpm=0, tpm=0, concurrency=0):
+        self.name = name
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.concurrency = threading.BoundedSemaphore(concurrency) if concurrency else None
+        self.cond = threading.Condition()
+        self.waited = 0.0  # 累计等待时间，便于观察限流是否成为瓶颈
+
+    def acquire(self, estimated_tokens=0):
+        """阻塞直到可以发出请求，返回实际预留的token数"""
+        if self.concurrency:
+            self.concurrency.acquire()
+        start = time.monotonic()
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(estimated_tokens, now))
+                if wait <= 0:
+                    break
+                self.cond.wait(wait)
+            self.requests.take(1)
+            reserved = self.tokens.take(estimated_tokens)
+            self.waited += time.monotonic() - start
+        return reserved
+
+    def release(self, reserved_tokens=0, used_tokens=None):
+        """请求结束：归还并发名额，按实际用量退回多预留的token"""
+        with self.cond:
+            if used_tokens is not None and used_tokens < reserved_tokens:
+                self.tokens.give_back(reserved_tokens - used_tokens)
+            self.cond.notify_all()
+        if self.concurrency:
+            self.concurrency.release()
+
+    def pause(self, seconds):
+        """提供商要求等待时，暂停这个 key 的所有请求"""
+        with self.cond:
+            until = time.monotonic() + seconds
+            self.requests.paused_until = max(self.requests.paused_until, until)
+            self.tokens.paused_until = max(self.tokens.paused_until, until)
+            self.cond.notify_all()
+
+
+_DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    """解析 '20'、'1.5'、'6m0s'、'250ms' 这样的时长，返回秒"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def retry_after_from_headers(headers):
+    """从响应头中读取建议等待时间（Retry-After、retry-after-ms、x-ratelimit-reset-*）"""
+    if not headers:
+        return None
+    lowered = {str(k).lower(): v for k, v in dict(headers).items()}
+    if "retry-after-ms" in lowered:
+        seconds = parse_duration(lowered["retry-after-ms"])
+        return seconds / 1000 if seconds is not None else None
+    for key in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens", "x-ratelimit-reset"):
+        seconds = parse_duration(lowered.get(key))
+        if seconds is not None:
+            return seconds
+    return None
+
+
+def retry_after_from_exception(exc):
+    """从SDK抛出的异常中取出建议等待时间，不是限流错误返回 None"""
+    if isinstance(exc, RateLimitedError):
+        return exc.retry_after if exc.retry_after is not None else 0.0
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return None
+    seconds = retry_after_from_headers(getattr(response, "headers", None))
+    return seconds if seconds is not None else 0.0
+
+
+_limiters = {}
+_overrides = {}
+_lock = threading.Lock()
+
+
+def configure(config):
+    """
+    读取 config.json 中的 rate_limits 覆盖配置，形如 {"deepseek": {"rpm": 60, "tpm": 0, "concurrency": 4}}
+    每局游戏开始时都会调用；配置没有变化时保留已有的限流器，同时进行的多局游戏共用同一个 key 的额度
+    """
+    global _overrides
+    overrides = dict((config or {}).get("rate_limits", {}))
+    with _lock:
+        if overrides == _overrides:
+            return
+        _overrides = overrides
+        _limiters.clear()
+
+
+def get_limiter(provider, api_key=""):
+    """同一提供商的同一个 API KEY 共用一个限流器，没有配置额度时返回 None"""
+    if provider is None:
+        return None
+    key_hash = hashlib.sha1((api_key or "").encode("utf-8")).hexdigest()[:8]
+    name = f"{provider}/{key_hash}"
+    with _lock:
+        if name not in _limiters:
+            settings = dict(registry.get_provider(provider).get("rate_limit", {}))
+            settings.update(_overrides.get(provider, {}))
+            if not any(settings.get(k) for k in ("rpm", "tpm", "concurrency")):
+                _limiters[name] = None
+            else:
+                _limiters[name] = ProviderLimiter(name, settings.get("rpm", 0), settings.get("tpm", 0), settings.get("concurrency", 0))
+        return _limiters[name]
+
+
+def summary():
+    with _lock:
+        return {name: round(limiter.waited, 3) for name, limiter in _limiters.items() if limiter}
@@ -0,0 +1,269 @@
+"""
+熔断与对冲请求
+每个提供商端点（提供商 + API KEY + base_url）有一个熔断器，按最近请求的错误率和慢请求比例打开，
+冷却后放行一个探测请求；可选的对冲请求在主请求超过该端点 p95 延迟后，向同一模型的备用 key/端点再发一份，
+取先返回的结果
+"""
+
+import contextvars
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN = "closed", "open", "half_open"
+# /metrics 中熔断器状态的数值
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+DEFAULT_BREAKER = {
+    "window": 40,               # 统计最近多少次请求
+    "min_calls": 8,             # 样本少于这个数时不熔断
+    "error_rate": 0.5,          # 失败（含慢请求）比例超过该值时打开
+    "slow_call_seconds": 180,   # 超过这个耗时的请求按失败计
+    "cooldown": 30,             # 打开后多少秒进入半开状态
+}
+DEFAULT_HEDGING = {
+    "enabled": False,
+    "percentile": 95,
+    "min_samples": 10,
+    "alternates": {},           # {模型名: [{"api_key": "...", "base_url": "..."}]}
+}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class CircuitBreaker:
+    def __init__(self, name, settings=None):
+        settings = dict(DEFAULT_BREAKER, **(settings or {}))
+        self.name = name
+        self.window = settings["window"]
+        self.min_calls = settings["min_calls"]
+        self.error_rate_threshold = settings["error_rate"]
+        self.slow_call_seconds = settings["slow_call_seconds"]
+        self.cooldown = settings["cooldown"]
+        self.calls = deque(maxlen=self.window)  # (是否失败, 耗时)
+        self._set_state(STATE_CLOSED)
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """是否放行一次请求；半开状态只放行一个探测请求"""
+        with self.lock:
+            if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self._set_state(STATE_HALF_OPEN)
+                self.probe_in_flight = False
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success, seconds):
+        failed = not success or seconds > self.slow_call_seconds
+        with self.lock:
+            self.calls.append((failed, seconds))
+            if self.state == STATE_HALF_OPEN:
+                if failed:
+                    self._open()
+                else:
+                    self._set_state(STATE_CLOSED)
+                    self.calls.clear()
+                self.probe_in_flight = False
+                return
+            if self.state == STATE_CLOSED and len(self.calls) >= self.min_calls and self.error_rate() > self.error_rate_threshold:
+                self._open()
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.breaker_state.set(STATE_VALUES[state], endpoint=self.name)
+
+    def _open(self):
+        self._set_state(STATE_OPEN)
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        metrics.breaker_opened.inc(endpoint=self.name)
+        logger.warning(f"端点 {self.name} 熔断，{self.cooldown}秒后重试")
+
+    def error_rate(self):
+        if not self.calls:
+            return 0.0
+        return sum(1 for failed, _ in self.calls if failed) / len(self.calls)
+
+    def latency_percentile(self, q, min_samples=1):
+        """成功请求的延迟分位数，样本不足返回 None"""
+        with self.lock:
+            latencies = [seconds for failed, seconds in self.calls if not failed]
+        if len(latencies) < min_samples:
+            return None
+        return percentile(latencies, q)
+
+    def snapshot(self):
+        with self.lock:
+            latencies = [seconds for failed, seconds in self.calls if not failed]
+            return {
+                "state": self.state,
+                "calls": len(self.calls),
+                "error_rate": round(self.error_rate(), 3),
+                "p50": round(percentile(latencies, 50), 3) if latencies else None,
+                "p95": round(percentile(latencies, 95), 3) if latencies else None,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+_settings = {"breaker": dict(DEFAULT_BREAKER), "hedging": dict(DEFAULT_HEDGING)}
+_breakers = {}
+_hedge_stats = {}
+_lock = threading.Lock()
+# 对冲请求和被放弃的慢请求在这里运行
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+def configure(config):
+    """
+    读取 config.json 中的 resilience 配置
+    每局游戏开始时都会调用；配置没有变化时保留已有的熔断器和对冲统计，同时进行的多局游戏共用端点状态
+    """
+    resilience = (config or {}).get("resilience", {})
+    breaker = dict(DEFAULT_BREAKER, **resilience.get("breaker", {}))
+    hedging = dict(DEFAULT_HEDGING, **resilience.get("hedging", {}))
+    with _lock:
+        if breaker == _settings["breaker"] and hedging == _settings["hedging"]:
+            return
+        _settings["breaker"] = breaker
+        _settings["hedging"] = hedging
+        _breakers.clear()
+        _hedge_stats.clear()
+
+
+def endpoint_name(provider, api_key="", base_url=""):
+    key_hash = hashlib.sha1(f"{api_key or ''}|{base_url or ''}".encode("utf-8")).hexdigest()[:8]
+    return f"{provider}/{key_hash}"
+
+
+def get_breaker(provider, api_key="", base_url=""):
+    if provider is None:
+        return None
+    name = endpoint_name(provider, api_key, base_url)
+    with _lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, _settings["breaker"])
+        return _breakers[name]
+
+
+def hedging_settings():
+    return _settings["hedging"]
+
+
+def alternates_for(model_name):
+    """对冲请求的备用 key/端点，未开启对冲时为空"""
+    hedging = _settings["hedging"]
+    if not hedging.get("enabled"):
+        return []
+    return hedging.get("alternates", {}).get(model_name, [])
+
+
+def call_with_breaker(model, message, chat_history, options=None, admitted=False):
+    """
+    经过熔断器请求一次，返回 (resp, reason)；熔断时抛出 CircuitOpenError
+    options 为本次请求的参数（输出上限、JSON Schema），备用端点的请求也使用同样的参数
+    admitted 为 True 表示调用方已经通过 breaker.allow() 取得放行（如半开状态的探测请求）
+    """
+    breaker = model.breaker
+    if breaker and not admitted and not breaker.allow():
+        raise CircuitOpenError(f"端点 {breaker.name} 处于熔断状态")
+    start = time.monotonic()
+    success = False
+    try:
+        resp, reason = model.limited_generate(message, chat_history, options)
+        success = resp is not None
+        return resp, reason
+    finally:
+        if breaker:
+            breaker.record(success, time.monotonic() - start)
+
+
+def _count(model, kind):
+    """记一次对冲或故障转移，同时计入 /metrics，endpoint 为主端点"""
+    with _lock:
+        stats = _hedge_stats.setdefault(model.model_name, {"hedged": 0, "hedge_won": 0, "failover": 0})
+        stats[kind] += 1
+    counter = {"hedged": metrics.hedged_requests, "hedge_won": metrics.hedge_wins, "failover": metrics.failovers}[kind]
+    counter.inc(model=model.model_name, endpoint=model.breaker.name if model.breaker else "")
+
+
+def hedged_call(model, message, chat_history, options=None):
+    """
+    主端点熔断时改用可用的备用端点，冷却结束后仍把一个探测请求发给主端点，探测成功后恢复；
+    否则先请求主端点，超过其 p95 延迟仍未返回时向备用端点发出对冲请求，取先成功的结果
+    """
+    alternates = [alt for alt in getattr(model, "alternates", []) if alt.breaker is None or alt.breaker.state != STATE_OPEN]
+    if not alternates:
+        return call_with_breaker(model, message, chat_history, options)
+
+    if model.breaker and model.breaker.state != STATE_CLOSED:
+        # allow() 在冷却结束后进入半开状态并放行一个探测请求，探测不对冲
+        if model.breaker.allow():
+            return call_with_breaker(model, message, chat_history, options, admitted=True)
+        _count(model, "failover")
+        return call_with_breaker(alternates[0], message, chat_history, options)
+
+    hedging = _settings["hedging"]
+    delay = model.breaker.latency_percentile(hedging["percentile"], hedging["min_samples"]) if model.breaker else None
+    if delay is None:
+        return call_with_breaker(model, message, chat_history, options)
+
+    # 请求在线程池中执行，沿用调用方的日志上下文
+    primary = _executor.submit(contextvars.copy_context().run, call_with_breaker, model, message, chat_history, options)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    _count(model, "hedged")
+    hedge = _executor.submit(contextvars.copy_context().run, call_with_breaker, alternates[0], message, chat_history, options)
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                resp, reason = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if resp is not None:
+                if future is hedge:
+                    _count(model, "hedge_won")
+                return resp, reason
+            error = error or Exception(reason or "未知错误")
+    raise error
+
+
+def summary():
+    with _lock:
+        breakers = dict(_breakers)
+        hedges = {name: dict(stats) for name, stats in _hedge_stats.items()}
+    return {
+        "breakers": {name: breaker.snapshot() for name, breaker in breakers.items()},
+        "hedging": hedges,
+    }
@@ -1,11 +1,52 @@
 from llm import BuildModel
 from history import *
 from log import *
+from session import order_prompt
+from output_budget import action_name
+from routing import ModelRouter, DEFAULT_ROUTE
+from json_repair import parse_json, schema_from_template
+from tracing import span, start_span
+import metrics
+from cost import last_usage, ledger_scope
 import yaml
 import json
 import time
 from datetime import datetime
 import random
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 思考输出级别: full 完整思考, brief 一句话, none 不输出思考字段
+THINKING_FULL, THINKING_BRIEF, THINKING_NONE = "full", "brief", "none"
+# 各模板中承载思考过程的字段
+THINKING_FIELDS = ("thinking", "reason")
+BRIEF_THINKING_LENGTH = 30
+
+
+def apply_thinking_level(prompt_dict, level):
+    '''按思考级别改写模板的 output_format、required_fields 和 instructions，返回被改写的思考字段'''
+    fields = [field for field in prompt_dict.get('required_fields', []) if field in THINKING_FIELDS]
+    if level == THINKING_FULL or not fields:
+        return fields
+    output_format = prompt_dict.get('output_format', '')
+    if level == THINKING_NONE:
+        output_format = re.sub(r'^\s*"(?:%s)":.*\n' % "|".join(fields), '', output_format, flags=re.MULTILINE)
+        prompt_dict['required_fields'] = [f for f in prompt_dict['required_fields'] if f not in fields]
+        note = f"不需要输出{'、'.join(fields)}字段，直接给出决定。"
+    else:
+        output_format = re.sub(r'("(?:%s)":\s*")([^"]*)"' % "|".join(fields),
+                               rf'\g<1>\g<2>，一句话，不超过{BRIEF_THINKING_LENGTH}字"', output_format)
+        note = f"{'、'.join(fields)}只写一句话，不超过{BRIEF_THINKING_LENGTH}字。"
+    prompt_dict['output_format'] = output_format
+    required = "，".join(f"'{field}'" for field in prompt_dict['required_fields'])
+    instructions = re.sub(r"请确保输出包含.*?字段[。.]?", f"请确保输出包含 {required} 字段。", prompt_dict.get('instructions', ''))
+    if instructions and instructions[-1] not in "。.！!":
+        instructions += "。"
+    prompt_dict['instructions'] = instructions + note
+    return fields
+
 
 class BaseRole:
     def __init__(self, player_index, role_type, model_name, api_key, game):
@@ -14,15 +55,20 @@ class BaseRole:
         self.is_alive = True
         self.game = game
         self.model = BuildModel(model_name, api_key, force_json=True) 
+        # 按行动类型路由的模型，self.model 始终是玩家展示的模型
+        self.router = ModelRouter(self.model)
+        self.active_model = self.model
+        self.role_posterior = None
+        self.history_summary = None
+        self.session = None
 
 
     def __str__(self):
         return f"你的玩家编号: {self.player_index}, 角色类型: {self.role_type}"
     
     def error(self, e, resp):
-        print("\033[91m发生错误:\033[0m")
-        print("\033[91m{}\033[0m".format(e))
-        print("\033[91m{}\033[0m".format(resp))
+        logger.error(f"发生错误: {e}")
+        logger.debug("出错的内容", extra={"payload": resp})
 
     def get_players_state(self):
         state = []
@@ -31,16 +77,92 @@ class BaseRole:
             state.append(f"{player.player_index}号玩家: {status}")
         return state
 
+    def get_role_posterior(self):
+        '''从该玩家视角推断的角色后验，按新增事件增量更新'''
+        from posterior import build_posterior
+        if self.role_posterior is None:
+            self.role_posterior = build_posterior(self)
+        events = list(self.game.history.iter_events())
+        for event in events[self.role_posterior.processed_events:]:
+            self.role_posterior.observe_event(event, self.player_index)
+        self.role_posterior.processed_events = len(events)
+        return self.role_posterior
+
+    def get_wolf_probability_hints(self):
+        probs = self.get_role_posterior().wolf_probabilities()
+        return [
+            f"{player.player_index}号玩家: {probs[player.player_index]:.0%}"
+            for player in self.game.players
+            if player.is_alive and player.player_index != self.player_index
+        ]
+
+    def get_event_encoding(self):
+        '''该玩家的模型使用的事件编码，在 config.json 的 event_encoding 中按模型配置'''
+        encoding_config = self.game.config.get('event_encoding', {})
+        return encoding_config.get('models', {}).get(self.active_model.model_name, encoding_config.get('default', ENCODING_TEXT))
+
+    def render_events(self, compact_level=COMPACT_NONE, keep_recent=0):
+        '''生成提示词中的事件列表，开启滚动摘要时较早的回合用摘要代替'''
+        encoding = self.get_event_encoding()
+        if self.history_summary:
+            return self.history_summary.render_events(self.game.summary_keep_recent, compact_level, keep_recent, encoding)
+        return self.game.history.get_history(compact_level=compact_level, keep_recent=keep_recent, encoding=encoding)
+
     def prompt_preprocess(self, prompt_template):
         prompt_template['角色'] = f"你是一名{self.role_type}"
         prompt_template['第几天'] = f'当前是第{self.game.current_day}天'
         prompt_template['你的玩家编号'] = f"你是{self.player_index}号玩家"
-        prompt_template['事件'] = self.game.history.get_history()
+        prompt_template['事件'] = self.render_events()
+        if self.get_event_encoding() == ENCODING_COMPACT:
+            prompt_template['事件编码说明'] = EVENT_LEGEND
         prompt_template['玩家状态'] = self.get_players_state()
         prompt_template['随机数种子'] = int(time.time() * 1000) + random.randint(1, 1000)
+        if self.game.config.get('role_posterior_hints'):
+            prompt_template['狼人概率参考'] = self.get_wolf_probability_hints()
         return prompt_template
 
+    def request_fields(self, model, prompt_str, chat_history, raw_resp, fields, output_format, max_tokens=None, structured=False):
+        '''在原对话后追问一次，只要求输出缺少的字段，返回解析出的字典'''
+        example, _ = parse_json(output_format)
+        example = example or {}
+        followup = {
+            "问题": f"你上一次的回答缺少或无法解析这些字段: {'、'.join(fields)}",
+            "instructions": "只输出包含这些字段的JSON对象，不要重复其他内容。",
+            "output_format": json.dumps({field: example.get(field, "") for field in fields}, ensure_ascii=False),
+        }
+        history = chat_history + [{"role": "user", "content": prompt_str}, {"role": "bot", "content": raw_resp}]
+        # 原请求使用原生JSON模式时，追问只约束缺少的字段
+        schema = schema_from_template(output_format, fields) if structured else None
+        resp, _ = model.get_response(json.dumps(followup, ensure_ascii=False), history, max_tokens=max_tokens, response_schema=schema)
+        return resp
+
+    def validate_action(self, action, resp, **context):
+        '''按当前游戏状态检查模型选择的目标，不合法时在本地修正，不再重新请求'''
+        self.game.action_validator.validate(self, action, resp, **context)
+
+    def get_route_key(self, action, extra_data):
+        '''路由使用的行动名，子类可以细分（如狼人第二轮投票）'''
+        return action
+
     def handle_action(self, prompt_file, extra_data=None, retry_count=0):
+        action = action_name(prompt_file)
+        with log_context(game=self.game.start_time, player=self.player_index, role=self.role_type, action=action), \
+                ledger_scope(self.game.cost_ledger, player=self.player_index, role=self.role_type, action=action), \
+                span("handle_action", action=action, retry=retry_count):
+            if retry_count:
+                return self.run_action(prompt_file, extra_data, retry_count)
+            # 重试会递归调用 handle_action，只在最外层计时
+            started = time.perf_counter()
+            try:
+                return self.run_action(prompt_file, extra_data, retry_count)
+            finally:
+                metrics.action_seconds.observe(time.perf_counter() - started, action=action)
+
+    def run_action(self, prompt_file, extra_data=None, retry_count=0):
+        action = action_name(prompt_file)
+        model, route = self.router.resolve(self.get_route_key(action, extra_data))
+        self.active_model = model
+        build_span = start_span("build_prompt", model=model.model_name, route=route)
         with open(prompt_file, 'r', encoding='utf-8') as file:
             prompt_template = yaml.safe_load(file)
             prompt_dict = self.prompt_preprocess(prompt_template)
@@ -68,34 +190,91 @@ class BaseRole:
             
             if extra_data:
                 prompt_dict.update(extra_data)
+
+            # 按模型的token预算压缩较早回合的事件
+            prompt_dict, token_report = self.game.token_budget.fit(prompt_dict, model.model_name, self.render_events)
+
+            # 按思考级别改写输出格式，不展示思考时可以少生成大部分输出
+            thinking_level = self.game.config.get('thinking_level', THINKING_FULL)
+            thinking_fields = apply_thinking_level(prompt_dict, thinking_level)
+
+            # 按行动类型限制输出长度，重试时放宽到配置的上限
+            max_tokens = self.game.output_budget.get_limit(model.model_name, action, retry=retry_count > 0, variant=thinking_level)
+            # 支持的提供商使用原生JSON模式，按模板的输出格式约束
+            required_fields = prompt_dict.get('required_fields', [])
+            output_format = prompt_dict.get('output_format', '')
+            structured = self.game.config.get('structured_output', True)
+            response_schema = schema_from_template(output_format, required_fields) if structured else None
+
+            # 会话只用于玩家自己的模型，路由到其他模型的请求单独发送
+            session = self.session if route == DEFAULT_ROUTE else None
+            if session:
+                # 多轮对话：固定前缀放在system消息里，只追加新事件
+                prompt_str, chat_history, pending = session.build(prompt_dict, token_report["budget"])
+                token_report["prompt_tokens"] = session.token_count(prompt_str, chat_history)
+            else:
+                prompt_str = json.dumps(order_prompt(prompt_dict), ensure_ascii=False)
+                chat_history = []
+            build_span.set(prompt_tokens=token_report["prompt_tokens"])
+            build_span.finish()
+            request_start = time.time()
+            resp, reason, raw_resp = model.get_response(prompt_str, chat_history, max_tokens=max_tokens, response_schema=response_schema, return_raw=True)
+            # 提供商返回的用量，记录输出长度时优先于按文本估算（追问会覆盖，先取出来）
+            usage = last_usage()
+            elapsed = time.time() - request_start
+            self.game.prompt_tiers.record(model.model_name, action, elapsed)
             
-            prompt_str = json.dumps(prompt_dict, ensure_ascii=False)
-            resp, reason = self.model.get_response(prompt_str)
-            
-            if resp is None:
+            # 模型有回复但本地修复后仍无法解析，按缺少全部字段追问
+            if resp is None and not raw_resp:
                 self.error("请求失败", prompt_str)
                 if retry_count < 10:
-                    print_red("重新发起请求")
+                    logger.warning("重新发起请求")
+                    metrics.action_retries.inc(action=action, kind="request_failed")
                     time.sleep(10)
                     return self.handle_action(prompt_file, extra_data, retry_count+1)
                 return None
 
-            # 检查响应中是否包含必要字段
-            required_fields = prompt_template.get('required_fields', [])
-            if required_fields:
-                missing_fields = [field for field in required_fields if field not in resp]
-                if missing_fields:
-                    self.error(f"响应缺少必要字段: {missing_fields}", resp)
-                    if retry_count < 10:
-                        print_red("重新发起请求")
-                        time.sleep(10)
-                        return self.handle_action(prompt_file, extra_data, retry_count+1)
-                    return None
+            # 检查响应中是否包含必要字段，思考字段只用于展示，缺少时补空字符串
+            resp = resp or {}
+            missing_fields = [field for field in required_fields if field not in resp and field not in THINKING_FIELDS]
+            if missing_fields:
+                metrics.missing_field_failures.inc(action=action)
+            if missing_fields and model.supports_chat_history:
+                self.error(f"响应缺少必要字段: {missing_fields}", raw_resp or resp)
+                logger.warning("追问缺少的字段")
+                self.game.parse_recovery["followup"] += 1
+                metrics.action_retries.inc(action=action, kind="followup")
+                followup = self.request_fields(model, prompt_str, chat_history, raw_resp or json.dumps(resp, ensure_ascii=False), missing_fields, output_format, max_tokens, response_schema is not None)
+                if followup:
+                    resp.update({field: followup[field] for field in missing_fields if field in followup})
+                missing_fields = [field for field in missing_fields if field not in resp]
+            if missing_fields:
+                self.error(f"响应缺少必要字段: {missing_fields}", raw_resp or resp)
+                if retry_count < 10:
+                    # 格式问题不需要等待，直接重新请求
+                    logger.warning("重新发起请求")
+                    self.game.parse_recovery["reprompt"] += 1
+                    metrics.action_retries.inc(action=action, kind="reprompt")
+                    return self.handle_action(prompt_file, extra_data, retry_count+1)
+                return None
+
+            if session:
+                session.commit(pending, resp)
+
+            token_report = self.game.token_budget.record(self.player_index, token_report, json.dumps(resp, ensure_ascii=False), reason, usage)
+            self.game.output_budget.record(model.model_name, action, token_report['completion_tokens'], variant=thinking_level)
+            self.game.route_stats.record(route, model.model_name, elapsed, token_report['prompt_tokens'], token_report['completion_tokens'])
+            # 没有生成思考字段时补空字符串，下游统一按可能为空处理
+            for field in thinking_fields:
+                resp.setdefault(field, '')
 
             # 日志记录保持原样
             with open(f'logs/llm_{self.game.start_time}.txt', 'a', encoding='utf-8') as log_file:
                 log_file.write(f"--- {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
                 log_file.write(f"--- {self.player_index}号玩家 ({self.role_type}) ---\n")
+                if route != DEFAULT_ROUTE:
+                    log_file.write(f"---路由---: {route} -> {model.model_name}\n")
+                log_file.write(f"---token---: 输入{token_report['prompt_tokens']}(压缩前{token_report['original_tokens']}, 预算{token_report['budget']}, 压缩级别{token_report['compact_level']}), 输出{token_report['completion_tokens']}(上限{max_tokens}), 耗时{elapsed:.1f}秒\n")
                 log_file.write(f"---输入---:\n{prompt_str}\n")
                 log_file.write(f"---输出---:\n{json.dumps(resp, ensure_ascii=False)}\n")
                 if reason:
@@ -111,9 +290,12 @@ class BaseRole:
         if not content:
             if extra_data is None:
                 extra_data={}
-            resp_dict = self.handle_action('prompts/prompt_speak.yaml', extra_data)
+            prompt_file, tier = self.game.prompt_tiers.select(self.router.resolve('speak')[0].model_name, 'speak')
+            resp_dict = self.handle_action(prompt_file, extra_data)
             if resp_dict:
-                self.game.history.add_event(SpeakEvent(self.player_index, resp_dict['speak']))
+                speak_event = SpeakEvent(self.player_index, resp_dict['speak'])
+                speak_event.set_replay_data(prompt_tier=tier)
+                self.game.history.add_event(speak_event)
                 return resp_dict
         else:
             self.game.history.add_event(SpeakEvent(self.player_index, content))
@@ -125,6 +307,7 @@ class BaseRole:
                 extra_data={}
             resp_dict = self.handle_action('prompts/prompt_vote.yaml', extra_data)
             if resp_dict:
+                self.validate_action('vote', resp_dict)
                 vote_id = resp_dict['vote']
                 self.game.history.add_event(VoteEvent(self.player_index, vote_id))
                 return resp_dict
@@ -222,12 +405,12 @@ class Hunter(BaseRole):
         thinking += f"   - 场上还有{len(alive_players)}名存活玩家\n"
         thinking += f"   - 作为猎人，我应该优先攻击最可疑的玩家\n"
 
-        # 简单策略：随机选择一个存活玩家
-        import random
+        # 根据角色后验选择狼人概率最高的存活玩家
         if alive_players:
-            target = random.choice(alive_players)
+            probs = self.get_role_posterior().wolf_probabilities()
+            target = self.role_posterior.most_likely_wolf(alive_players)
             thinking += f"4. 决定：攻击{target}号玩家\n"
-            thinking += f"5. 理由：根据当前局势判断，{target}号玩家威胁最大\n"
+            thinking += f"5. 理由：根据当前局势推算，{target}号玩家是狼人的概率最高({probs[target]:.0%})\n"
 
             # 执行攻击
             self.game.attack(target)
@@ -273,13 +456,22 @@ class Seer(BaseRole):
     def divine(self):
         """决定查看谁的身份"""
         extra_data = self.make_extra_data()
-        resp_dict = self.handle_action('prompts/prompt_divine.yaml', extra_data)
+        prompt_file, tier = self.game.prompt_tiers.select(self.router.resolve('divine')[0].model_name, 'divine')
+        resp_dict = self.handle_action(prompt_file, extra_data)
         if resp_dict:
+            self.validate_action('divine', resp_dict)
             divine_id = resp_dict['divine']
+            if divine_id == -1:
+                # 没有可查验的存活玩家，本晚不查验
+                logger.warning(f"{self.player_index}号玩家(预言家)没有可查验的目标，跳过查验")
+                return resp_dict
             is_good_man = "好人" if self.game.players[divine_id-1].role_type != "狼人" else "狼人"
             self.divine_result.append(
                 f"【{divine_id}号玩家】是 {is_good_man}."
             )
+            divine_event = DivineEvent(self.player_index, divine_id, is_good_man)
+            divine_event.set_replay_data(divine=divine_id, result=is_good_man, thinking=resp_dict.get('thinking', ''), prompt_tier=tier)
+            self.game.history.add_event(divine_event)
             return resp_dict
     
 
@@ -315,6 +507,12 @@ class Wolf(BaseRole):
         return super().speak(content, extra_data)
     
     
+    def get_route_key(self, action, extra_data):
+        '''第二轮投票时已经知道队友的选择，可以单独路由到更快的模型'''
+        if action == 'kill' and extra_data and extra_data.get('第几轮投票') == 2:
+            return 'kill_round2'
+        return action
+
     def decide_kill(self, kill_id, want_kill=None):
         extra_data = self.make_extra_data()
         if want_kill:
@@ -325,6 +523,7 @@ class Wolf(BaseRole):
         resp_dict = {}
         if kill_id == -100:
             resp_dict = self.handle_action('prompts/prompt_kill.yaml', extra_data)
+            self.validate_action('kill', resp_dict)
         else:
             resp_dict['kill'] = kill_id
             resp_dict['reason'] = ''
@@ -368,6 +567,8 @@ class Witch(BaseRole):
             extra_data['今晚发生了什么'] = "没有人将被杀害"
         resp_dict = self.handle_action('prompts/prompt_cure_or_poison.yaml', extra_data)
         if resp_dict:
-            self.cured_someone = someone_will_be_killed if resp_dict['cure'] == 1 else 0
+            self.validate_action('cure_or_poison', resp_dict, someone_will_be_killed=someone_will_be_killed)
+            if resp_dict['cure'] == 1:
+                self.cured_someone = someone_will_be_killed
             self.poisoned_someone = resp_dict['poison'] if resp_dict['poison'] != -1 else self.poisoned_someone
             return resp_dict
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+按行动类型路由模型
+玩家可以在 config.json 中配置 routes，把遗言、第二轮狼人投票等低风险的行动交给更便宜、更快的模型；
+玩家的身份和展示的模型名不变，token和延迟按路由分别统计
+"""
+
+import threading
+
+from llm import BuildModel
+from prompt_tier import split_tier
+
+# 路由使用的行动名与提示词文件名一致，另外支持 kill_round2（狼人第二轮投票）
+DEFAULT_ROUTE = "default"
+
+
+class ModelRouter:
+    """
+    players[i].routes 示例:
+        {"lastword": {"model_name": "deepseek-chat", "api_key": "..."},
+         "kill_round2": {"model_name": "deepseek-chat", "api_key": "..."}}
+    查找顺序: 完整行动名 -> 去掉 fast/simple 档位的行动名 -> 玩家自己的模型
+    """
+
+    def __init__(self, default_model, routes=None):
+        self.default_model = default_model
+        self.routes = routes or {}
+        self.models = {}
+        self.lock = threading.Lock()
+
+    def resolve(self, route_key):
+        """返回 (模型, 命中的路由名)"""
+        base, _ = split_tier(route_key)
+        for key in (route_key, base):
+            if key in self.routes:
+                return self._build(key), key
+        return self.default_model, DEFAULT_ROUTE
+
+    def _build(self, key):
+        with self.lock:
+            if key not in self.models:
+                route = self.routes[key]
+                self.models[key] = BuildModel(route["model_name"], route.get("api_key", ""), force_json=True)
+            return self.models[key]
+
+
+class RouteStats:
+    """按 (路由, 模型) 统计调用次数、延迟和token"""
+
+    def __init__(self):
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def record(self, route, model_name, seconds, prompt_tokens, completion_tokens):
+        with self.lock:
+            item = self.stats.setdefault(f"{route}/{model_name}", {
+                "calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+            item["calls"] += 1
+            item["seconds"] += seconds
+            item["prompt_tokens"] += prompt_tokens
+            item["completion_tokens"] += completion_tokens
+
+    def summary(self):
+        with self.lock:
+            return {
+                key: dict(item, mean_seconds=round(item["seconds"] / item["calls"], 3))
+                for key, item in self.stats.items()
+            }
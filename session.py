@@ -0,0 +1,113 @@
+"""
+多轮对话会话
+把游戏规则、角色和玩家编号放在固定的 system 前缀里，之后每次请求只追加上次以来的新事件和本次任务，
+让提供商的前缀缓存（DeepSeek、OpenAI、vLLM 等）可以命中之前的全部对话
+"""
+
+import json
+
+from history import ENCODING_COMPACT
+from providers import provider_for_model
+from token_budget import estimate_tokens
+
+# 同一个玩家整局不变的字段，组成稳定前缀
+STABLE_KEYS = ('游戏规则', '你的玩家编号', '角色', '事件编码说明')
+# 每次都变化的字段，放在最后，不影响前面内容的缓存
+VOLATILE_KEYS = ('随机数种子',)
+
+
+def order_prompt(prompt_dict):
+    """
+    按缓存友好的顺序重排提示词：固定字段 -> 事件（只在末尾增长） -> 本次任务 -> 随机数种子
+    单条消息模式下也能让同一玩家的连续请求共享较长的前缀
+    """
+    ordered = {key: prompt_dict[key] for key in STABLE_KEYS if key in prompt_dict}
+    if '事件' in prompt_dict:
+        ordered['事件'] = prompt_dict['事件']
+    for key, value in prompt_dict.items():
+        if key not in ordered and key not in VOLATILE_KEYS:
+            ordered[key] = value
+    for key in VOLATILE_KEYS:
+        if key in prompt_dict:
+            ordered[key] = prompt_dict[key]
+    return ordered
+
+
+def iter_public_events(history):
+    """按时间顺序遍历事件，附带发生时间，与 History.iter_events 的顺序一致"""
+    for round in history.rounds:
+        for phase, events in (("白天", round.day_events), ("夜晚", round.night_events)):
+            for event in events:
+                yield f"第{round.day_count + 1}天{phase}", event
+
+
+class ChatSession:
+    """
+    一个玩家的对话会话
+    第一次请求发送完整事件，之后只追加新事件；对话超过token预算时重新开始
+    """
+
+    def __init__(self, player):
+        self.player = player
+        self.system_prompt = None
+        self.chat_history = []  # [{"role": "user"/"bot", "content": ...}]
+        self.event_cursor = 0   # 已经发给模型的事件数量
+
+    def reset(self):
+        self.system_prompt = None
+        self.chat_history = []
+        self.event_cursor = 0
+
+    def new_events(self):
+        events = list(iter_public_events(self.player.game.history))
+        compact = self.player.get_event_encoding() == ENCODING_COMPACT
+        delta = [f"{when}: {event.code() if compact else event.desc()}"
+                 for when, event in events[self.event_cursor:] if event.is_public]
+        return delta, len(events)
+
+    def build(self, prompt_dict, budget):
+        """
+        生成 (本次消息, 对话历史, 待提交的状态)，请求成功后调用 commit
+        """
+        model_name = self.player.model.model_name
+        provider = provider_for_model(model_name)
+        stable = {key: prompt_dict[key] for key in STABLE_KEYS if key in prompt_dict}
+        stable["说明"] = "这是一局连续进行的游戏。之后每条消息包含自上次以来的新事件和本次任务，请只按本次任务的output_format输出JSON"
+        system_prompt = json.dumps(stable, ensure_ascii=False)
+        if system_prompt != self.system_prompt:
+            self.reset()
+            self.system_prompt = system_prompt
+
+        task = {key: value for key, value in prompt_dict.items() if key not in STABLE_KEYS and key != '事件'}
+        if self.chat_history:
+            delta, cursor = self.new_events()
+            message = order_prompt(dict({"新事件": delta}, **task))
+            history_tokens = sum(estimate_tokens(turn["content"], provider) for turn in self.chat_history)
+            if history_tokens + estimate_tokens(system_prompt, provider) > budget:
+                # 对话太长，下次从完整事件重新开始
+                self.reset()
+                self.system_prompt = system_prompt
+        if not self.chat_history:
+            _, cursor = self.new_events()
+            delta = prompt_dict.get('事件', [])
+            message = order_prompt(dict({"事件": delta}, **task))
+
+        message_str = json.dumps(message, ensure_ascii=False)
+        chat_history = [{"role": "system", "content": system_prompt}] + self.chat_history
+        pending = {"cursor": cursor, "events": delta, "instructions": task.get("instructions", "")}
+        return message_str, chat_history, pending
+
+    def commit(self, pending, resp):
+        """
+        记录本轮对话，历史中的用户消息只保留事件和任务说明，模型回复去掉thinking以控制长度
+        """
+        first_turn = not self.chat_history
+        self.chat_history.append({"role": "user", "content": json.dumps(
+            {"事件" if first_turn else "新事件": pending["events"], "instructions": pending["instructions"]}, ensure_ascii=False)})
+        reply = {key: value for key, value in resp.items() if key != 'thinking'}
+        self.chat_history.append({"role": "bot", "content": json.dumps(reply, ensure_ascii=False)})
+        self.event_cursor = pending["cursor"]
+
+    def token_count(self, message_str, chat_history):
+        provider = provider_for_model(self.player.model.model_name)
+        return estimate_tokens(message_str, provider) + sum(estimate_tokens(turn["content"], provider) for turn in chat_history)
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+批量对局模拟器
+把夜晚/白天/投票/胜负判定写成带batch维度的NumPy数组运算，
+不调用LLM，只使用脚本策略，用于评估不同板子配置（角色数量、女巫/猎人规则、平票处理）的平衡性
+
+用法:
+    python simulator.py --games 1000000
+    python simulator.py --games 200000 --kill-tie random --execute-tie random
+    python simulator.py --variants variants.json --json
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+
+# 角色编码
+VILLAGER, WOLF, SEER, WITCH, HUNTER = 0, 1, 2, 3, 4
+ROLE_NAMES = {
+    VILLAGER: "村民",
+    WOLF: "狼人",
+    SEER: "预言家",
+    WITCH: "女巫",
+    HUNTER: "猎人"
+}
+ROLE_CODES = {name: code for code, name in ROLE_NAMES.items()}
+
+# 胜负编码
+UNDECIDED, WOLF_WIN, VILLAGER_WIN = 0, 1, 2
+RESULT_NAMES = {
+    UNDECIDED: "胜负未分",
+    WOLF_WIN: "狼人胜利",
+    VILLAGER_WIN: "村民胜利"
+}
+
+# 与 game.initialize_roles 一致的默认板子
+DEFAULT_ROLES = {"狼人": 3, "预言家": 1, "女巫": 1, "猎人": 1, "村民": 3}
+
+
+class BoardVariant:
+    """板子配置：角色数量 + 规则变体 + 脚本策略参数"""
+
+    def __init__(self, roles=None, witch_self_cure=True, witch_one_potion_per_night=True,
+                 hunter_revenge_on_poison=False, kill_tie="second_round", execute_tie="no_execute",
+                 parity="wolf", max_days=20, cure_prob=0.6, poison_prob_peace=0.3,
+                 poison_prob_after_kill=0.4, name=None):
+        self.roles = dict(roles or DEFAULT_ROLES)
+        for role_name in self.roles:
+            if role_name not in ROLE_CODES:
+                raise ValueError(f"无效的角色 '{role_name}'")
+        # 女巫能否自救 / 同一晚是否只能用一种药
+        self.witch_self_cure = witch_self_cure
+        self.witch_one_potion_per_night = witch_one_potion_per_night
+        # 猎人被毒死时能否开枪（前端规则为不能）
+        self.hunter_revenge_on_poison = hunter_revenge_on_poison
+        # 狼人平票处理: second_round(与 get_wolf_want_kill + 前端两轮投票一致) / no_kill / random
+        if kill_tie not in ("second_round", "no_kill", "random"):
+            raise ValueError(f"无效的kill_tie: {kill_tie}")
+        self.kill_tie = kill_tie
+        # 白天平票处理: no_execute(与 /execute 一致) / random
+        if execute_tie not in ("no_execute", "random"):
+            raise ValueError(f"无效的execute_tie: {execute_tie}")
+        self.execute_tie = execute_tie
+        # 狼人数等于好人数时 check_winner 交给裁判LLM判断，这里用固定规则代替: wolf / continue
+        if parity not in ("wolf", "continue"):
+            raise ValueError(f"无效的parity: {parity}")
+        self.parity = parity
+        self.max_days = max_days
+        # 脚本策略参数，默认值与 LocalQwenLlm 的脚本决策一致
+        self.cure_prob = cure_prob
+        self.poison_prob_peace = poison_prob_peace
+        self.poison_prob_after_kill = poison_prob_after_kill
+        self.name = name or "default"
+
+    @property
+    def n_players(self):
+        return sum(self.roles.values())
+
+    def role_vector(self):
+        vector = []
+        for role_name, count in self.roles.items():
+            vector += [ROLE_CODES[role_name]] * count
+        return np.array(vector, dtype=np.int8)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "roles": self.roles,
+            "witch_self_cure": self.witch_self_cure,
+            "witch_one_potion_per_night": self.witch_one_potion_per_night,
+            "hunter_revenge_on_poison": self.hunter_revenge_on_poison,
+            "kill_tie": self.kill_tie,
+            "execute_tie": self.execute_tie,
+            "parity": self.parity,
+            "max_days": self.max_days
+        }
+
+
+def check_winner(roles, alive, parity="wolf"):
+    """
+    与 WerewolfGame.check_winner 相同的胜负条件(按行向量化):
+    狼人数 > 好人数 狼人胜利; 狼人数 == 0 村民胜利; 好人数 > 狼人数 胜负未分;
+    相等时原逻辑交给裁判LLM，这里由 parity 决定
+    """
+    wolves = (alive & (roles == WOLF)).sum(axis=1)
+    others = (alive & (roles != WOLF)).sum(axis=1)
+    result = np.full(roles.shape[0], UNDECIDED, dtype=np.int8)
+    result[wolves > others] = WOLF_WIN
+    result[wolves == 0] = VILLAGER_WIN
+    if parity == "wolf":
+        result[(wolves == others) & (wolves > 0)] = WOLF_WIN
+    return result
+
+
+def _pick(rng, candidates):
+    """在最后一维为True的位置中均匀随机选一个，没有候选返回-1"""
+    counts = candidates.sum(axis=-1)
+    # 在候选数量内抽一个序号，再用累加和定位到第几个True
+    nth = (rng.random(counts.shape, dtype=np.float32) * counts).astype(np.int16)
+    choice = (candidates.cumsum(axis=-1, dtype=np.int16) > nth[..., None]).argmax(axis=-1)
+    return np.where(counts > 0, choice, -1)
+
+
+def _tally(targets, n):
+    """统计票数, targets为(B, N)，-1表示弃票; 返回(唯一最高票座位或-1, 最高票座位mask)"""
+    batch = targets.shape[0]
+    valid = targets >= 0
+    flat = (np.arange(batch)[:, None] * n + targets)[valid]
+    counts = np.bincount(flat, minlength=batch * n).reshape(batch, n)
+    top = counts.max(axis=1)
+    leaders = (counts == top[:, None]) & (top[:, None] > 0)
+    winner = np.where(leaders.sum(axis=1) == 1, leaders.argmax(axis=1), -1)
+    return winner, leaders
+
+
+def _rows(mask):
+    return np.nonzero(mask)[0]
+
+
+class BatchSimulator:
+    """按batch推进多局游戏，每一局的状态是数组中的一行"""
+
+    def __init__(self, variant=None, seed=None):
+        self.variant = variant or BoardVariant()
+        self.rng = np.random.default_rng(seed)
+
+    def _deal(self, batch):
+        n = self.variant.n_players
+        base = self.variant.role_vector()
+        order = self.rng.random((batch, n)).argsort(axis=1)
+        return base[order]
+
+    def _wolf_kill(self, roles, alive):
+        v = self.variant
+        batch, n = roles.shape
+        rows = np.arange(batch)[:, None]
+        # 每局狼人数量固定，只对狼人座位抽样，避免对全部 N×N 投票关系计算
+        wolf_seats = np.nonzero(roles == WOLF)[1].reshape(batch, -1)
+        voting = alive[rows, wolf_seats]
+        candidates = alive & (roles != WOLF)
+
+        def wolf_vote(allowed):
+            return _pick(self.rng, np.broadcast_to(allowed[:, None, :], (len(allowed), wolf_seats.shape[1], n)))
+
+        # 第一轮：每只狼独立选择
+        targets = np.full((batch, n), -1, dtype=np.int64)
+        targets[rows, wolf_seats] = np.where(voting, wolf_vote(candidates), -1)
+        kill, leaders = _tally(targets, n)
+        tied = (kill == -1) & leaders.any(axis=1)
+        if v.kill_tie == "second_round" and tied.any():
+            # 第二轮：狼人看到第一轮结果，在平票的玩家里重新选择
+            idx = _rows(tied)
+            targets2 = np.full((len(idx), n), -1, dtype=np.int64)
+            targets2[np.arange(len(idx))[:, None], wolf_seats[idx]] = np.where(voting[idx], wolf_vote(leaders[idx]), -1)
+            kill[idx], _ = _tally(targets2, n)
+        elif v.kill_tie == "random" and tied.any():
+            idx = _rows(tied)
+            kill[idx] = _pick(self.rng, leaders[idx])
+        return kill
+
+    def _night(self, roles, alive, potions, known):
+        v = self.variant
+        batch, n = roles.shape
+        rows = np.arange(batch)
+        seats = np.arange(n)
+
+        # 预言家查验一名未查验过的存活玩家
+        seer_alive = alive & (roles == SEER)
+        seer_rows = _rows(seer_alive.any(axis=1))
+        if len(seer_rows):
+            seer_seat = seer_alive[seer_rows].argmax(axis=1)
+            candidates = alive[seer_rows] & (known[seer_rows] == 0)
+            candidates[np.arange(len(seer_rows)), seer_seat] = False
+            target = _pick(self.rng, candidates)
+            ok = target >= 0
+            r, t = seer_rows[ok], target[ok]
+            known[r, t] = np.where(roles[r, t] == WOLF, 2, 1)
+
+        kill = self._wolf_kill(roles, alive)
+
+        # 女巫决策
+        witch_alive = alive & (roles == WITCH)
+        has_witch = witch_alive.any(axis=1)
+        witch_seat = np.where(has_witch, witch_alive.argmax(axis=1), -1)
+        can_cure = has_witch & potions[:, 0] & (kill >= 0)
+        if not v.witch_self_cure:
+            can_cure &= kill != witch_seat
+        draw = self.rng.random(batch)
+        cured = can_cure & ((kill == witch_seat) | (draw < v.cure_prob))
+        potions[cured, 0] = False
+
+        can_poison = has_witch & potions[:, 1]
+        if v.witch_one_potion_per_night:
+            can_poison &= ~cured
+        poison_prob = np.where(kill >= 0, v.poison_prob_after_kill, v.poison_prob_peace)
+        use_poison = can_poison & (self.rng.random(batch) < poison_prob)
+        poison_candidates = alive & (seats != witch_seat[:, None]) & (seats != kill[:, None])
+        poison = np.where(use_poison, _pick(self.rng, poison_candidates), -1)
+        potions[poison >= 0, 1] = False
+
+        # 结算死亡
+        killed = np.where(cured, -1, kill)
+        dead_kill = _rows(killed >= 0)
+        alive[dead_kill, killed[dead_kill]] = False
+        dead_poison = _rows(poison >= 0)
+        alive[dead_poison, poison[dead_poison]] = False
+
+        # 猎人反击
+        hunter_shot = (killed >= 0) & (roles[rows, np.maximum(killed, 0)] == HUNTER)
+        if v.hunter_revenge_on_poison:
+            hunter_shot |= (poison >= 0) & (roles[rows, np.maximum(poison, 0)] == HUNTER)
+        self._revenge(alive, hunter_shot)
+
+    def _day(self, roles, alive, known):
+        v = self.variant
+        batch, n = roles.shape
+        seats = np.arange(n)
+        voters = alive
+        is_wolf = roles == WOLF
+
+        # 每个投票者的候选: 存活且不是自己
+        candidates = alive[:, None, :] & (seats[:, None] != seats[None, :])[None, :, :]
+        # 狼人不投队友
+        candidates = candidates & ~(is_wolf[:, :, None] & is_wolf[:, None, :])
+        # 预言家: 有存活的已知狼人就投狼，否则不投已验证的好人
+        seer = roles == SEER
+        known_wolf = (known == 2) & alive
+        seer_targets = np.where(known_wolf.any(axis=1)[:, None], known_wolf, alive & (known != 1))
+        seer_targets &= ~seer
+        candidates = np.where(seer[:, :, None], seer_targets[:, None, :], candidates)
+
+        targets = np.where(voters, _pick(self.rng, candidates), -1)
+        executed, leaders = _tally(targets, n)
+        if v.execute_tie == "random":
+            tied = (executed == -1) & leaders.any(axis=1)
+            idx = _rows(tied)
+            executed[idx] = _pick(self.rng, leaders[idx])
+
+        dead = _rows(executed >= 0)
+        alive[dead, executed[dead]] = False
+        hunter_shot = np.zeros(batch, dtype=bool)
+        hunter_shot[dead] = roles[dead, executed[dead]] == HUNTER
+        self._revenge(alive, hunter_shot)
+
+    def _revenge(self, alive, hunter_shot):
+        """猎人随机带走一名存活玩家，与 Hunter.revenge 的规则实现一致"""
+        idx = _rows(hunter_shot)
+        if len(idx):
+            target = _pick(self.rng, alive[idx])
+            ok = target >= 0
+            alive[idx[ok], target[ok]] = False
+
+    def run_batch(self, batch):
+        """模拟 batch 局游戏，返回 (胜负结果, 结束天数, 结束是否在夜晚)"""
+        v = self.variant
+        n = v.n_players
+        roles = self._deal(batch)
+        alive = np.ones((batch, n), dtype=bool)
+        potions = np.ones((batch, 2), dtype=bool)  # [解药, 毒药]
+        known = np.zeros((batch, n), dtype=np.int8)  # 预言家查验结果: 0未知 1好人 2狼人
+        result = np.full(batch, UNDECIDED, dtype=np.int8)
+        end_day = np.full(batch, v.max_days, dtype=np.int16)
+        end_at_night = np.zeros(batch, dtype=bool)
+
+        # 与前端行动顺序一致: 夜晚(预言家 -> 狼人 -> 女巫) -> 检查胜负 -> 白天投票处决 -> 检查胜负
+        # 每次检查胜负后把已结束的对局移出状态数组，后续只计算仍在进行的对局
+        live = np.arange(batch)
+        for day in range(1, v.max_days + 1):
+            for is_night in (True, False):
+                if is_night:
+                    self._night(roles, alive, potions, known)
+                else:
+                    self._day(roles, alive, known)
+                winner = check_winner(roles, alive, v.parity)
+                finished = winner != UNDECIDED
+                done = live[finished]
+                result[done] = winner[finished]
+                end_day[done] = day if is_night else day + 1
+                end_at_night[done] = is_night
+
+                keep = ~finished
+                live = live[keep]
+                roles, alive, potions, known = roles[keep], alive[keep], potions[keep], known[keep]
+                if not len(live):
+                    return result, end_day, end_at_night
+
+        return result, end_day, end_at_night
+
+
+def simulate(variant=None, n_games=100000, batch_size=50000, seed=None):
+    """模拟 n_games 局并统计胜率分布和游戏时长分布"""
+    variant = variant or BoardVariant()
+    simulator = BatchSimulator(variant, seed)
+    start = time.perf_counter()
+
+    counts = np.zeros(3, dtype=np.int64)
+    batch_rates = []
+    lengths = {code: np.zeros(variant.max_days + 2, dtype=np.int64) for code in RESULT_NAMES}
+    night_endings = 0
+    remaining = n_games
+    while remaining > 0:
+        batch = min(batch_size, remaining)
+        result, end_day, end_at_night = simulator.run_batch(batch)
+        batch_counts = np.bincount(result, minlength=3)
+        counts += batch_counts
+        batch_rates.append(batch_counts / batch)
+        for code in RESULT_NAMES:
+            lengths[code] += np.bincount(end_day[result == code], minlength=variant.max_days + 2)
+        night_endings += int(end_at_night.sum())
+        remaining -= batch
+
+    elapsed = time.perf_counter() - start
+    rates = counts / n_games
+    batch_rates = np.array(batch_rates)
+    report = {
+        "variant": variant.to_dict(),
+        "games": n_games,
+        "seconds": round(elapsed, 3),
+        "games_per_second": round(n_games / elapsed) if elapsed > 0 else None,
+        "win_rate": {},
+        "game_length": {},
+        "night_ending_rate": round(night_endings / n_games, 4)
+    }
+    for code, name in RESULT_NAMES.items():
+        rate = rates[code]
+        # 95%置信区间（正态近似）和各batch胜率的离散程度
+        half_width = 1.96 * np.sqrt(rate * (1 - rate) / n_games)
+        report["win_rate"][name] = {
+            "rate": round(float(rate), 4),
+            "ci95": [round(float(max(rate - half_width, 0)), 4), round(float(min(rate + half_width, 1)), 4)],
+            "batch_std": round(float(batch_rates[:, code].std()), 4)
+        }
+        histogram = lengths[code]
+        report["game_length"][name] = {str(day): int(c) for day, c in enumerate(histogram) if c}
+
+    all_lengths = sum(lengths.values())
+    total = all_lengths.sum()
+    if total:
+        days = np.arange(len(all_lengths))
+        report["mean_days"] = round(float((all_lengths * days).sum() / total), 3)
+    return report
+
+
+def print_report(report):
+    print(f"\n📊 板子: {report['variant']['name']}  {report['variant']['roles']}")
+    print(f"   共 {report['games']} 局，用时 {report['seconds']}s ({report['games_per_second']} 局/秒)")
+    for name, info in report["win_rate"].items():
+        print(f"   {name}: {info['rate']:.2%}  95%CI {info['ci95']}  batch标准差 {info['batch_std']}")
+    print(f"   平均结束天数: {report.get('mean_days')}, 夜晚结束比例: {report['night_ending_rate']:.2%}")
+    print("   游戏时长分布(结束于第几天):")
+    for name, histogram in report["game_length"].items():
+        if histogram:
+            total = sum(histogram.values())
+            for day, count in histogram.items():
+                bar = "█" * max(1, round(40 * count / total))
+                print(f"     {name} 第{day}天: {count:>9} {bar}")
+
+
+def parse_roles(text):
+    """解析 '狼人=3,预言家=1,女巫=1,猎人=1,村民=3' 格式的角色配置"""
+    roles = {}
+    for item in text.split(","):
+        name, count = item.split("=")
+        roles[name.strip()] = int(count)
+    return roles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="狼人杀板子平衡性批量模拟")
+    parser.add_argument("--games", type=int, default=100000, help="模拟局数")
+    parser.add_argument("--batch", type=int, default=50000, help="每个batch的局数")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--roles", type=str, default=None, help="如 狼人=3,预言家=1,女巫=1,猎人=1,村民=3")
+    parser.add_argument("--kill-tie", default="second_round", choices=["second_round", "no_kill", "random"])
+    parser.add_argument("--execute-tie", default="no_execute", choices=["no_execute", "random"])
+    parser.add_argument("--parity", default="wolf", choices=["wolf", "continue"])
+    parser.add_argument("--no-witch-self-cure", action="store_true")
+    parser.add_argument("--witch-both-potions", action="store_true", help="允许女巫同一晚同时用两种药")
+    parser.add_argument("--hunter-revenge-on-poison", action="store_true")
+    parser.add_argument("--max-days", type=int, default=20)
+    parser.add_argument("--variants", type=str, default=None, help="包含多个板子配置(BoardVariant参数)的JSON文件")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    args = parser.parse_args()
+
+    if args.variants:
+        with open(args.variants, 'r', encoding='utf-8') as f:
+            variants = [BoardVariant(**item) for item in json.load(f)]
+    else:
+        variants = [BoardVariant(
+            roles=parse_roles(args.roles) if args.roles else None,
+            witch_self_cure=not args.no_witch_self_cure,
+            witch_one_potion_per_night=not args.witch_both_potions,
+            hunter_revenge_on_poison=args.hunter_revenge_on_poison,
+            kill_tie=args.kill_tie,
+            execute_tie=args.execute_tie,
+            parity=args.parity,
+            max_days=args.max_days
+        )]
+
+    reports = [simulate(v, args.games, args.batch, args.seed) for v in variants]
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+    else:
+        for report in reports:
+            print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+滚动历史摘要
+每个回合结束后在后台线程里为每个玩家更新一次较早回合的摘要，
+prompt_preprocess 用摘要代替较早回合的原始事件，使第2天以后的提示词长度基本不变
+"""
+
+import contextvars
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from history import COMPACT_NONE, ENCODING_TEXT
+from llm import BuildModel
+
+logger = logging.getLogger(__name__)
+
+# 最近几个回合不做摘要，提示词中保留原始事件
+SUMMARY_KEEP_RECENT_ROUNDS = 1
+
+# 所有对局共用的后台线程池，摘要不阻塞玩家决策
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary")
+
+
+class ScriptedSummarizer:
+    """本地脚本摘要：只保留出局、处决票型和每人一句话的发言要点，结果对所有玩家相同，按回合缓存"""
+
+    def __init__(self, speech_length=30):
+        self.speech_length = speech_length
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def summarize(self, player, round_idx, previous_summary):
+        with self.lock:
+            if round_idx in self.cache:
+                return self.cache[round_idx]
+        round = player.game.history.rounds[round_idx]
+        items = []
+        for event in round.day_events + round.night_events:
+            if not event.is_public:
+                continue
+            if event.event_type == "speak":
+                items.append(f"{event.player_idx}号:{str(event.description)[:self.speech_length]}")
+            elif event.event_type == "execute":
+                votes = ",".join(
+                    f"{v['player_idx']}→{v['vote_id'] if v['vote_id'] != -1 else '弃'}" for v in event.votes)
+                items.append(f"{event.player_idx}号被处决(票型 {votes})")
+            elif event.event_type == "kill":
+                items.append(f"{event.player_idx}号夜晚出局")
+            elif event.event_type == "attack":
+                items.append(f"{event.player_idx}号被猎人带走")
+            elif event.event_type == "last_word":
+                items.append(f"{event.player_idx}号遗言:{str(event.description)[:self.speech_length]}")
+        text = f"第{round.day_count + 1}天: " + ("; ".join(items) if items else "无事件")
+        with self.lock:
+            self.cache[round_idx] = text
+        return text
+
+
+class LlmSummarizer:
+    """用便宜的模型从该玩家的视角把新回合合并进已有摘要"""
+
+    def __init__(self, model_name, api_key, max_chars=400):
+        self.model = BuildModel(model_name, api_key, force_json=True)
+        self.max_chars = max_chars
+
+    def summarize(self, player, round_idx, previous_summary):
+        round = player.game.history.rounds[round_idx]
+        prompt = {
+            "任务背景": "你在帮助一名狼人杀玩家整理笔记，把本回合的公开事件合并进已有摘要",
+            "你的玩家编号": f"你是{player.player_index}号玩家",
+            "角色": f"你是一名{player.role_type}",
+            "已有摘要": previous_summary or "无",
+            "本回合事件": round.get_events(),
+            "instructions": f"保留出局信息、票型、关键身份声明和可疑行为，摘要不超过{self.max_chars}字。只输出JSON。",
+            "output_format": '{"summary": "摘要"}'
+        }
+        resp, _ = self.model.get_response(json.dumps(prompt, ensure_ascii=False))
+        if resp and resp.get("summary"):
+            return str(resp["summary"])[:self.max_chars * 2]
+        # 模型失败时退回脚本摘要
+        return (previous_summary + "\n" if previous_summary else "") + ScriptedSummarizer().summarize(player, round_idx, previous_summary)
+
+
+class RollingSummary:
+    """
+    一个玩家的滚动摘要
+    scripted 摘要按回合逐条累积，llm 摘要每次把新回合合并成一段新的摘要
+    """
+
+    def __init__(self, player, summarizer, rolling):
+        self.player = player
+        self.summarizer = summarizer
+        self.rolling = rolling
+        self.parts = []  # 按回合顺序的摘要片段
+        self.covered_rounds = 0  # 从第一个回合开始连续完成摘要的回合数
+        self.lock = threading.Lock()
+        # 同一玩家的摘要按回合顺序逐个生成
+        self.update_lock = threading.Lock()
+        self._view_cache = None
+
+    def submit(self, round_idx):
+        """回合结束时调用，在后台生成摘要"""
+        # 后台线程沿用调用方的日志上下文
+        _executor.submit(contextvars.copy_context().run, self._update, round_idx)
+
+    def _update(self, round_idx):
+        # 前面的回合还没有摘要时（任务在另一个线程中还没完成）一并补上，已经覆盖的回合直接跳过
+        with self.update_lock:
+            while self.covered_rounds <= round_idx:
+                self._summarize_next()
+
+    def _summarize_next(self):
+        with self.lock:
+            round_idx = self.covered_rounds
+            previous = self.parts[-1] if (self.rolling and self.parts) else "\n".join(self.parts)
+        try:
+            text = self.summarizer.summarize(self.player, round_idx, previous)
+        except Exception as e:
+            # 摘要失败也要推进回合，否则之后的回合都不会再有摘要
+            logger.error(f"生成{self.player.player_index}号玩家第{round_idx}回合摘要失败，改用脚本摘要: {e}")
+            text = self._fallback(round_idx, previous)
+        with self.lock:
+            if self.rolling:
+                self.parts = [text]
+            else:
+                self.parts.append(text)
+            self.covered_rounds = round_idx + 1
+
+    def _fallback(self, round_idx, previous):
+        """脚本摘要，脚本摘要也失败时直接用该回合的原始事件"""
+        try:
+            text = ScriptedSummarizer().summarize(self.player, round_idx, previous)
+        except Exception as e:
+            logger.error(f"生成{self.player.player_index}号玩家第{round_idx}回合脚本摘要失败，使用原始事件: {e}")
+            round = self.player.game.history.rounds[round_idx]
+            text = f"第{round.day_count + 1}天: " + json.dumps(round.get_events(), ensure_ascii=False)
+        # 滚动摘要每次替换整段，需要带上之前的摘要
+        return previous + "\n" + text if (self.rolling and previous) else text
+
+    def snapshot(self):
+        with self.lock:
+            return self.covered_rounds, "\n".join(self.parts)
+
+    def render_events(self, keep_recent, compact_level=COMPACT_NONE, compact_keep_recent=0, encoding=ENCODING_TEXT):
+        """
+        已摘要且不在最近 keep_recent 个回合内的回合用摘要代替，其余回合输出原始事件
+        同一阶段内重复请求直接返回缓存
+        """
+        history = self.player.game.history
+        covered, text = self.snapshot()
+        n_rounds = len(history.rounds)
+        replaced = min(covered, max(n_rounds - keep_recent, 0))
+        n_events = sum(len(r.day_events) + len(r.night_events) for r in history.rounds)
+        key = (replaced, n_rounds, n_events, compact_level, compact_keep_recent, encoding)
+        if self._view_cache and self._view_cache[0] == key:
+            return self._view_cache[1]
+
+        events = history.get_history(compact_level=compact_level, keep_recent=compact_keep_recent, encoding=encoding)[replaced:]
+        if replaced:
+            events.insert(0, {"时间": f"前{replaced}个回合", "摘要": text})
+        self._view_cache = (key, events)
+        return events
+
+
+def build_summarizer(config):
+    """根据 config.json 中的 history_summary 配置创建摘要器，未启用返回 None"""
+    summary_config = config.get("history_summary", {})
+    if not summary_config.get("enabled"):
+        return None
+    if summary_config.get("summarizer", "scripted") == "llm":
+        return LlmSummarizer(summary_config["model_name"], summary_config.get("api_key", ""))
+    return ScriptedSummarizer()
@@ -0,0 +1,40 @@
+import json
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def mock_config(**overrides):
+    """所有玩家和裁判都使用 mock 模型（不发网络请求），日志只保留警告"""
+    config = {
+        "players": [{"model_name": "mock", "api_key": ""} for _ in range(9)],
+        "judge": {"model_name": "mock", "api_key": ""},
+        "randomize_roles": True,
+        "randomize_position": True,
+        "logging": {"level": "WARNING", "file_level": "WARNING", "file": "logs/wolf_bot.jsonl"},
+    }
+    config.update(overrides)
+    return config
+
+
+@pytest.fixture
+def game_dir(tmp_path, monkeypatch):
+    """
+    游戏从当前目录读取 config.json 和 prompts/，日志写入 logs/；
+    在临时目录中运行，返回写入 config.json 的函数
+    """
+    for name in ("prompts", "public"):
+        os.symlink(os.path.join(ROOT, name), tmp_path / name)
+    (tmp_path / "logs").mkdir()
+    monkeypatch.chdir(tmp_path)
+
+    def write_config(**overrides):
+        config = mock_config(**overrides)
+        with open("config.json", "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False)
+        return config
+
+    write_config()
+    return write_config
@@ -0,0 +1,175 @@
+from types import SimpleNamespace
+
+import pytest
+
+from action_validator import ActionValidator, nearest_target, to_int
+
+ROLES = ["狼人", "狼人", "狼人", "村民", "村民", "村民", "预言家", "女巫", "猎人"]
+
+
+def make_game(dead=()):
+    game = SimpleNamespace(players=[])
+    for index, role in enumerate(ROLES, start=1):
+        game.players.append(SimpleNamespace(
+            player_index=index, role_type=role, is_alive=index not in dead, game=game,
+            cured_someone=0, poisoned_someone=-1,
+        ))
+    return game
+
+
+def player(game, index):
+    return game.players[index - 1]
+
+
+@pytest.fixture
+def validator():
+    return ActionValidator()
+
+
+def test_legal_vote_is_normalized_not_corrected(validator):
+    game = make_game()
+    resp = {"vote": "3号"}
+    assert validator.validate(player(game, 4), "vote", resp) == []
+    assert resp["vote"] == 3
+
+
+def test_vote_for_dead_player_goes_to_nearest_alive(validator):
+    game = make_game(dead=(5,))
+    resp = {"vote": 5}
+    assert validator.validate(player(game, 1), "vote", resp) == [("vote", 5, 4)]
+    assert resp["vote"] == 4
+    assert validator.summary() == {"vote": 1}
+
+
+def test_self_vote_is_corrected(validator):
+    game = make_game()
+    resp = {"vote": 4}
+    validator.validate(player(game, 4), "vote", resp)
+    assert resp["vote"] == 3
+
+
+def test_abstain_policy_and_legal_abstain():
+    validator = ActionValidator({"action_validation": {"policy": "abstain"}})
+    game = make_game(dead=(5,))
+    resp = {"vote": 5}
+    validator.validate(player(game, 1), "vote", resp)
+    assert resp["vote"] == -1
+    resp = {"vote": -1}
+    assert validator.validate(player(game, 1), "vote", resp) == []
+
+
+def test_self_divine_has_no_abstain(validator):
+    game = make_game()
+    resp = {"divine": 7}
+    validator.validate(player(game, 7), "divine", resp)
+    assert resp["divine"] in (6, 8)
+    assert resp["divine"] != 7
+
+
+def test_divine_without_targets_is_minus_one(validator):
+    game = make_game(dead=(1, 2, 3, 4, 5, 6, 8, 9))
+    resp = {"divine": 3}
+    validator.validate(player(game, 7), "divine", resp)
+    assert resp["divine"] == -1
+
+
+def test_seer_skips_divine_without_targets(game_dir):
+    from game import WerewolfGame
+
+    game = WerewolfGame()
+    game.start()
+    seer = next(p for p in game.players if p.role_type == "预言家")
+    for p in game.players:
+        p.is_alive = p is seer
+    seer.handle_action = lambda prompt_file, extra_data: {"divine": 1, "thinking": ""}
+    events_before = sum(len(r.day_events) + len(r.night_events) for r in game.history.rounds)
+    assert seer.divine() == {"divine": -1, "thinking": ""}
+    assert seer.divine_result == []
+    assert sum(len(r.day_events) + len(r.night_events) for r in game.history.rounds) == events_before
+
+
+def test_wolf_cannot_kill_teammate_or_dead(validator):
+    game = make_game(dead=(4,))
+    resp = {"kill": 2}
+    validator.validate(player(game, 1), "kill", resp)
+    # 座位是环形的，离2号最近的非狼人活人是9号（4号已死，5号距离3）
+    assert resp["kill"] == 9
+    resp = {"kill": 4}
+    validator.validate(player(game, 1), "kill", resp)
+    assert resp["kill"] == 5
+
+
+def test_unparseable_target_uses_first_legal(validator):
+    game = make_game()
+    resp = {"vote": "不知道"}
+    validator.validate(player(game, 1), "vote", resp)
+    assert resp["vote"] == 2
+
+
+def test_witch_cannot_cure_after_antidote_used(validator):
+    game = make_game()
+    witch = player(game, 8)
+    witch.cured_someone = 1
+    resp = {"cure": 1, "poison": -1}
+    assert validator.validate(witch, "cure_or_poison", resp, someone_will_be_killed=3) == [("cure", 1, 0)]
+    assert resp == {"cure": 0, "poison": -1}
+
+
+def test_witch_cannot_cure_when_nobody_killed(validator):
+    game = make_game()
+    resp = {"cure": 1, "poison": -1}
+    validator.validate(player(game, 8), "cure_or_poison", resp, someone_will_be_killed=-1)
+    assert resp["cure"] == 0
+
+
+def test_witch_cannot_cure_and_poison_same_night(validator):
+    game = make_game()
+    resp = {"cure": 1, "poison": 2}
+    assert validator.validate(player(game, 8), "cure_or_poison", resp, someone_will_be_killed=3) == [("poison", 2, -1)]
+    assert resp == {"cure": 1, "poison": -1}
+
+
+def test_witch_cannot_poison_twice_self_or_dead(validator):
+    game = make_game(dead=(2,))
+    witch = player(game, 8)
+    for target in (8, 2):
+        resp = {"cure": 0, "poison": target}
+        validator.validate(witch, "cure_or_poison", resp, someone_will_be_killed=3)
+        assert resp["poison"] == -1
+    witch.poisoned_someone = 1
+    resp = {"cure": 0, "poison": 1}
+    validator.validate(witch, "cure_or_poison", resp, someone_will_be_killed=3)
+    assert resp["poison"] == -1
+
+
+def test_legal_witch_actions_pass(validator):
+    game = make_game()
+    resp = {"cure": "1", "poison": -1}
+    assert validator.validate(player(game, 8), "cure_or_poison", resp, someone_will_be_killed=3) == []
+    resp = {"cure": False, "poison": "1号"}
+    assert validator.validate(player(game, 8), "cure_or_poison", resp, someone_will_be_killed=3) == []
+    assert resp == {"cure": 0, "poison": 1}
+
+
+def test_disabled_or_unknown_action_is_untouched():
+    game = make_game()
+    resp = {"vote": 99}
+    assert ActionValidator({"action_validation": {"enabled": False}}).validate(player(game, 1), "vote", resp) == []
+    assert ActionValidator().validate(player(game, 1), "speak", resp) == []
+    assert resp == {"vote": 99}
+
+
+def test_invalid_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ActionValidator({"action_validation": {"policy": "random"}})
+
+
+@pytest.mark.parametrize("value, expected", [(3, 3), ("3号", 3), ("-1", -1), (2.0, 2), (True, 1), ("无", None), (None, None)])
+def test_to_int(value, expected):
+    assert to_int(value) == expected
+
+
+def test_nearest_target_wraps_around_table():
+    assert nearest_target(9, [1, 5], 9) == 1
+    assert nearest_target(3, [2, 4], 9) == 2
+    assert nearest_target(None, [6, 7], 9) == 6
@@ -0,0 +1,111 @@
+import contextvars
+import threading
+
+import pytest
+
+import batching
+from batching import DecisionBatcher
+
+
+def run_games(batcher, n_games, request):
+    """n_games 个登记的游戏线程在同一阶段各提交一次请求"""
+    results = [None] * n_games
+
+    def game(i):
+        batcher.register()
+        try:
+            results[i] = batcher.submit("model", lambda: request(i))
+        finally:
+            batcher.step_done()
+
+    batcher.begin_step(n_games)
+    threads = [threading.Thread(target=game, args=(i,)) for i in range(n_games)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_requests_are_sent_together_when_all_games_wait():
+    batcher = DecisionBatcher(max_batch=16)
+    results = run_games(batcher, 4, lambda i: i * 10)
+    assert results == [0, 10, 20, 30]
+    assert batcher.summary() == {"model": {"batches": 1, "decisions": 4, "max_size": 4, "mean_size": 4.0}}
+    batcher.shutdown()
+
+
+def test_full_queue_is_sent_before_all_games_wait():
+    batcher = DecisionBatcher(max_batch=2)
+    run_games(batcher, 5, lambda i: i)
+    stats = batcher.summary()["model"]
+    assert stats["decisions"] == 5
+    assert stats["max_size"] == 2
+    assert stats["batches"] == 3
+    batcher.shutdown()
+
+
+def test_errors_reach_the_calling_game():
+    batcher = DecisionBatcher()
+    batcher.register()
+    batcher.begin_step(1)
+
+    def fail():
+        raise RuntimeError("server error")
+
+    with pytest.raises(RuntimeError):
+        batcher.submit("model", fail)
+    batcher.shutdown()
+
+
+def test_requests_keep_caller_context():
+    request_id = contextvars.ContextVar("request_id", default=None)
+    batcher = DecisionBatcher()
+    batcher.register()
+    batcher.begin_step(1)
+    request_id.set("game-1")
+    assert batcher.submit("model", request_id.get) == "game-1"
+    batcher.shutdown()
+
+
+def test_call_bypasses_batcher_for_unregistered_threads():
+    class Model:
+        model_name = "m"
+
+    batcher = DecisionBatcher()
+    batching.install(batcher)
+    try:
+        result = []
+        thread = threading.Thread(target=lambda: result.append(batching.call(Model(), lambda: "direct")))
+        thread.start()
+        thread.join(5)
+        assert result == ["direct"]
+        assert batcher.summary() == {}
+    finally:
+        batching.install(None)
+        batcher.shutdown()
+
+
+def test_batch_key_separates_endpoints():
+    class Client:
+        base_url = "http://localhost:8000/v1/"
+
+    class Model:
+        model_name = "Qwen3-32B-AWQ"
+        client = Client()
+
+    assert batching.batch_key(Model()) == "Qwen3-32B-AWQ@http://localhost:8000/v1/"
+    Model.client = None
+    assert batching.batch_key(Model()) == "Qwen3-32B-AWQ"
+
+
+def test_lockstep_games_batch_requests(game_dir):
+    from headless import HeadlessGame, LockstepScheduler
+
+    games = [HeadlessGame(game_id=i, max_days=3) for i in range(3)]
+    for game in games:
+        game.start()
+    batches = LockstepScheduler(games, max_batch=8).run()
+    assert not any(game.error for game in games)
+    assert batches["mock"]["max_size"] > 1
+    assert batches["mock"]["decisions"] >= batches["mock"]["batches"]
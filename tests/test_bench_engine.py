@@ -0,0 +1,71 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import bench_engine  # noqa: E402
+
+
+def test_measure_reports_per_call_times():
+    result = bench_engine.measure(lambda: sum(range(100)), repeat=3)
+    assert result["min_us"] <= result["us_per_op"]
+    assert result["calls"] % 3 == 0
+
+
+def test_compare_flags_slower_micro_and_lower_throughput():
+    baseline = {
+        "history.get_history[text]": {"us_per_op": 100},
+        "game.check_winner": {"us_per_op": 10},
+        "headless[lockstep]": {"games_per_sec": 10},
+        "headless[sequential]": {"games_per_sec": 10},
+    }
+    results = {
+        "history.get_history[text]": {"us_per_op": 120},
+        "game.check_winner": {"us_per_op": 9},
+        "headless[lockstep]": {"games_per_sec": 8},
+        "headless[sequential]": {"games_per_sec": 12},
+        "parse_json[clean]": {"us_per_op": 5},
+    }
+    rows = {name: regressed for name, _, _, _, regressed in bench_engine.compare(results, baseline, 0.1)}
+    assert rows == {
+        "history.get_history[text]": True,
+        "game.check_winner": False,
+        "headless[lockstep]": True,
+        "headless[sequential]": False,
+    }
+
+
+def run_bench(tmp_path, *args):
+    output = tmp_path / "bench.json"
+    proc = subprocess.run(
+        [sys.executable, "benchmarks/bench_engine.py", "--games", "2", "--repeat", "1", "--days", "2",
+         "--output", str(output), *args],
+        cwd=ROOT, capture_output=True, text=True, timeout=300,
+    )
+    return proc, output
+
+
+@pytest.mark.parametrize("only", ["micro", "macro"])
+def test_bench_engine_runs_end_to_end(tmp_path, only):
+    proc, output = run_bench(tmp_path, "--only", only)
+    assert proc.returncode == 0, proc.stderr
+    results = json.loads(output.read_text(encoding="utf-8"))["results"]
+    if only == "macro":
+        assert set(results) == {"headless[sequential]", "headless[lockstep]"}
+        assert all(item["errors"] == 0 for item in results.values())
+    else:
+        assert "role.prompt_preprocess" in results
+        assert results["history.get_history[text]"]["events"] > 0
+
+
+def test_regression_against_baseline_exits_non_zero(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": {"headless[sequential]": {"games_per_sec": 1e9}}}))
+    proc, _ = run_bench(tmp_path, "--only", "macro", "--modes", "sequential", "--baseline", str(baseline))
+    assert proc.returncode == 1
+    assert "回归" in proc.stdout
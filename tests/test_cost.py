@@ -0,0 +1,94 @@
+import contextvars
+from types import SimpleNamespace
+
+import pytest
+
+import cost
+from cost import CostLedger, finish_usage, ledger_scope, new_usage, normalize_usage, record_call, report_usage
+
+
+def test_normalize_openai_and_dashscope_usage():
+    openai_usage = SimpleNamespace(
+        prompt_tokens=100, completion_tokens=50,
+        completion_tokens_details=SimpleNamespace(reasoning_tokens=20),
+        prompt_tokens_details=SimpleNamespace(cached_tokens=64),
+    )
+    assert normalize_usage(openai_usage) == {"prompt_tokens": 100, "completion_tokens": 50, "reasoning_tokens": 20, "cached_tokens": 64}
+    # DeepSeek 的缓存命中字段
+    assert normalize_usage({"prompt_tokens": 10, "completion_tokens": 5, "prompt_cache_hit_tokens": 8})["cached_tokens"] == 8
+    assert normalize_usage({"input_tokens": 7, "output_tokens": 3}) == {"prompt_tokens": 7, "completion_tokens": 3, "reasoning_tokens": 0, "cached_tokens": 0}
+    assert normalize_usage(None) is None
+    assert normalize_usage({"total_tokens": 3}) is None
+
+
+def test_reported_usage_accumulates_across_retries():
+    def run():
+        usage = new_usage()
+        report_usage({"prompt_tokens": 10, "completion_tokens": 2})
+        report_usage({"prompt_tokens": 10, "completion_tokens": 3})
+        return finish_usage(usage, "deepseek-chat", "问题", [], "回答", None)
+
+    result = contextvars.copy_context().run(run)
+    assert result == {"prompt_tokens": 20, "completion_tokens": 5, "reasoning_tokens": 0, "cached_tokens": 0, "source": "reported"}
+
+
+def test_missing_usage_is_estimated_from_text():
+    def run():
+        usage = new_usage()
+        return finish_usage(usage, "deepseek-chat", "问题" * 10, [{"content": "历史"}], "回答", "推理")
+
+    result = contextvars.copy_context().run(run)
+    assert result["source"] == "estimated"
+    assert result["prompt_tokens"] > 0
+    assert result["reasoning_tokens"] > 0
+    assert result["completion_tokens"] > result["reasoning_tokens"]
+
+
+def test_report_outside_get_response_is_ignored():
+    contextvars.Context().run(report_usage, {"prompt_tokens": 1, "completion_tokens": 1})
+
+
+def test_price_uses_cached_input_rate():
+    ledger = CostLedger({"cost": {"prices": {"m": {"input": 2, "output": 10, "cached_input": 1}}}})
+    usage = {"prompt_tokens": 1_000_000, "completion_tokens": 100_000, "reasoning_tokens": 0, "cached_tokens": 400_000}
+    assert ledger.price("m", usage) == pytest.approx(0.6 * 2 + 0.4 * 1 + 0.1 * 10)
+    assert ledger.price("unknown", usage) is None
+
+
+def test_scope_attributes_calls_and_summary_groups():
+    ledger = CostLedger()
+    usage = {"prompt_tokens": 1000, "completion_tokens": 100, "reasoning_tokens": 0, "cached_tokens": 0, "source": "reported"}
+    assert record_call("gpt-4o", usage) is None
+    with ledger_scope(ledger, player=1):
+        with ledger_scope(ledger, action="speak"):
+            entry = record_call("gpt-4o", usage)
+        record_call("mock", dict(usage, source="estimated"))
+    assert entry["player"] == 1 and entry["action"] == "speak"
+    summary = ledger.summary()
+    assert summary["total"]["calls"] == 2
+    assert summary["total"]["estimated_calls"] == 1
+    assert summary["total"]["cost"] == pytest.approx(0.0035)
+    assert summary["players"]["1"]["calls"] == 2
+    assert set(summary["actions"]) == {"speak", ""}
+    assert summary["unpriced_models"] == ["mock"]
+    assert ledger.report()["entries"][0]["model"] == "gpt-4o"
+
+
+def test_last_usage_is_per_context():
+    cost.set_last_usage({"completion_tokens": 1})
+    assert contextvars.Context().run(cost.last_usage) is None
+    assert cost.last_usage() == {"completion_tokens": 1}
+    cost.set_last_usage(None)
+
+
+def test_game_ledger_records_every_player_call(game_dir):
+    from game import WerewolfGame
+
+    game = WerewolfGame()
+    game.start()
+    player = game.players[0]
+    game.divine(next(p.player_index for p in game.players if p.role_type == "预言家"))
+    summary = game.cost_ledger.summary()
+    assert summary["total"]["calls"] >= 1
+    assert "divine" in summary["actions"]
+    assert player.model.model_name in summary["models"]
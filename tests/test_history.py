@@ -0,0 +1,63 @@
+from history import (COMPACT_DROP_SPEECH, COMPACT_NONE, COMPACT_TRUNCATE, ENCODING_COMPACT, BRIEF_SPEECH_LENGTH,
+                     DivineEvent, ExecuteEvent, History, KillEvent, LastWordEvent, SpeakEvent, VoteEvent)
+
+LONG_SPEECH = "我是好人" * 30
+
+
+def build_history():
+    """第1天夜晚3号出局，第2天白天发言、投票处决5号"""
+    history = History()
+    history.add_event(DivineEvent(7, 2, "好人"))
+    history.add_event(KillEvent(3))
+    history.toggle_day_night()
+    history.add_event(SpeakEvent(1, LONG_SPEECH))
+    history.add_event(VoteEvent(1, 5))
+    history.add_event(ExecuteEvent(5, [
+        {"player_idx": 1, "vote_id": 5}, {"player_idx": 2, "vote_id": 5},
+        {"player_idx": 6, "vote_id": 4}, {"player_idx": 4, "vote_id": -1},
+    ]))
+    history.add_event(LastWordEvent(5, "我是村民"))
+    return history
+
+
+def test_compact_codes_match_legend():
+    history = build_history()
+    events = history.get_history(encoding=ENCODING_COMPACT)
+    assert events[0] == {"时间": "第1天", "夜晚事件": ["K3"]}
+    assert events[1]["白天事件"] == [f"S1:{LONG_SPEECH}", "X5|5<1,2|4<6|-<4", "L5:我是村民"]
+
+
+def test_private_events_are_only_shown_with_show_all():
+    history = build_history()
+    events = history.get_history(show_all=True, encoding=ENCODING_COMPACT)
+    assert events[0]["夜晚事件"] == ["D7>2=好人", "K3"]
+    assert "V1>5" in events[1]["白天事件"]
+
+
+def test_truncated_speech_in_both_encodings():
+    history = build_history()
+    text = history.get_history(compact_level=COMPACT_TRUNCATE)[1]["白天事件"][0]
+    code = history.get_history(compact_level=COMPACT_TRUNCATE, encoding=ENCODING_COMPACT)[1]["白天事件"][0]
+    assert LONG_SPEECH[:BRIEF_SPEECH_LENGTH] + "…" in text
+    assert code == f"S1:{LONG_SPEECH[:BRIEF_SPEECH_LENGTH]}…"
+
+
+def test_drop_speech_keeps_key_events():
+    history = build_history()
+    events = history.get_history(compact_level=COMPACT_DROP_SPEECH, encoding=ENCODING_COMPACT)[1]["白天事件"]
+    assert events == ["X5|5<1,2|4<6|-<4", "（省略了2条较早的发言）"]
+
+
+def test_compaction_skips_recent_rounds():
+    history = build_history()
+    events = history.get_history(compact_level=COMPACT_DROP_SPEECH, keep_recent=1)
+    assert events == history.get_history(compact_level=COMPACT_NONE)
+
+
+def test_compact_encoding_is_shorter_than_text():
+    history = build_history()
+    text = str(history.get_history())
+    compact = str(history.get_history(encoding=ENCODING_COMPACT))
+    assert len(compact) < len(text)
+    # 第一天的"游戏还没开始"提示只出现在 text 编码中
+    assert "此时游戏还没开始" in text and "此时游戏还没开始" not in compact
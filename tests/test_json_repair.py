@@ -0,0 +1,82 @@
+import pytest
+
+from json_repair import extract_block, parse_json, schema_from_template
+
+
+def test_valid_json_is_not_marked_repaired():
+    assert parse_json('{"vote": 3, "thinking": "3号可疑"}') == ({"vote": 3, "thinking": "3号可疑"}, False)
+
+
+@pytest.mark.parametrize("text", [
+    '```json\n{"vote": 3}\n```',
+    '好的，我的回答如下：\n```json\n{"vote": 3}\n```\n以上。',
+    '```\n{"vote": 3}\n```',
+    '我投3号 {"vote": 3} 就这样',
+])
+def test_fenced_or_wrapped_json(text):
+    assert parse_json(text) == ({"vote": 3}, False)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"vote": 3,}', {"vote": 3}),
+    ('{"votes": [1, 2,], "vote": 3,\n}', {"votes": [1, 2], "vote": 3}),
+    ('```json\n{"kill": 5,}\n```', {"kill": 5}),
+])
+def test_trailing_commas(text, expected):
+    assert parse_json(text) == (expected, True)
+
+
+def test_truncated_string_and_brackets_are_closed():
+    result, repaired = parse_json('{"thinking": "3号的发言前后矛盾", "speak": "我认为3号是狼，大家跟我一起投')
+    assert repaired
+    assert result == {"thinking": "3号的发言前后矛盾", "speak": "我认为3号是狼，大家跟我一起投"}
+
+
+def test_truncated_after_key_drops_the_key():
+    assert parse_json('{"vote": 3, "thinking":') == ({"vote": 3}, True)
+    assert parse_json('{"vote": 3, "thin') == ({"vote": 3}, True)
+
+
+def test_truncated_nested_array():
+    assert parse_json('{"votes": [1, 2') == ({"votes": [1, 2]}, True)
+
+
+def test_unquoted_keys_single_and_chinese_quotes():
+    result, repaired = parse_json("{thinking: “3号可疑”, 'vote': 3,}")
+    assert repaired
+    assert result == {"thinking": "3号可疑", "vote": 3}
+
+
+def test_fullwidth_punctuation_and_python_literals():
+    assert parse_json('{"cure"： True， "poison"： None}') == ({"cure": True, "poison": None}, True)
+
+
+def test_unescaped_quotes_inside_speech():
+    result, repaired = parse_json('{"speak": "他说"我是预言家"，我不信", "vote": 2}')
+    assert repaired
+    assert result == {"speak": '他说"我是预言家"，我不信', "vote": 2}
+
+
+def test_template_comments_and_missing_commas():
+    text = '{\n  "vote": 3  # 投票目标\n  "thinking": "理由"\n}'
+    assert parse_json(text) == ({"vote": 3, "thinking": "理由"}, True)
+
+
+@pytest.mark.parametrize("text", ["", "   ", None, "没有JSON", "[1, 2, 3]", 42])
+def test_unparseable_or_non_object(text):
+    assert parse_json(text) == (None, False)
+
+
+def test_extract_block_keeps_truncated_tail():
+    assert extract_block('前言 {"vote": 3, "speak": "abc') == '{"vote": 3, "speak": "abc'
+
+
+def test_schema_from_template_types_and_required():
+    schema = schema_from_template('{"thinking": "理由", "vote": 1, "cure": true}', ["vote", "speak"])
+    assert schema["required"] == ["vote", "speak"]
+    assert schema["properties"] == {
+        "thinking": {"type": "string"},
+        "vote": {"type": "integer"},
+        "cure": {"type": "boolean"},
+        "speak": {},
+    }
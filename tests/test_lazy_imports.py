@@ -0,0 +1,28 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SDK_MODULES = ["openai", "dashscope", "zhipuai"]
+
+
+def loaded_sdks(code):
+    """在新的解释器中执行 code，返回执行后已经导入的提供商SDK"""
+    script = f"import sys, json\n{code}\nprint(json.dumps([m for m in {SDK_MODULES!r} if m in sys.modules]))"
+    proc = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_importing_the_engine_loads_no_provider_sdk():
+    assert loaded_sdks("import game, headless, llm") == []
+
+
+def test_mock_models_load_no_provider_sdk():
+    assert loaded_sdks("import llm; llm.BuildModel('mock', ''); llm.BuildModel('mock/5', '')") == []
+
+
+def test_sdk_is_imported_when_its_model_is_built():
+    assert loaded_sdks("import llm; llm.BuildModel('deepseek-chat', 'sk-test')") == ["openai"]
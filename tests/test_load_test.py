@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import load_test  # noqa: E402
+
+
+def test_percentile_nearest_rank():
+    values = [0.1 * i for i in range(1, 101)]
+    assert load_test.percentile(values, 50) == values[49]
+    assert load_test.percentile(values, 99) == values[98]
+    assert load_test.percentile([0.3], 95) == 0.3
+    assert load_test.percentile([], 95) == 0
+
+
+def test_stats_report_per_endpoint():
+    stats = load_test.Stats()
+    for seconds in (0.01, 0.02, 0.03, 0.04):
+        stats.record("/status", seconds, ok=True)
+    stats.record("/vote", 0.5, ok=False)
+    stats.game_finished()
+    report = stats.report(duration=2)
+    assert report["requests"] == 5
+    assert report["rps"] == 2.5
+    assert report["error_rate"] == 0.2
+    assert report["games_finished"] == 1
+    assert report["endpoints"]["/status"] == {
+        "requests": 4, "rps": 2.0, "p50_ms": 20.0, "p95_ms": 40.0, "p99_ms": 40.0, "max_ms": 40.0, "error_rate": 0.0}
+    assert report["endpoints"]["/vote"]["error_rate"] == 1.0
+
+
+def test_load_test_drives_a_local_server(tmp_path):
+    output = tmp_path / "load.json"
+    proc = subprocess.run(
+        [sys.executable, "benchmarks/load_test.py", "--drivers", "1", "--spectators", "2", "--duration", "2",
+         "--output", str(output)],
+        cwd=ROOT, capture_output=True, text=True, timeout=300,
+    )
+    assert proc.returncode == 0, proc.stderr
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert report["error_rate"] == 0
+    assert {"/start", "/status", "/speak"} <= set(report["endpoints"])
@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("requests")
+
+import local_pool
+from llm import LocalPoolLlm
+
+
+class Replica:
+    """模拟一个 vLLM 副本的 OpenAI 兼容接口：/v1/models 和 /v1/chat/completions"""
+
+    def __init__(self, name, delay=0.0):
+        self.name = name
+        self.delay = delay
+        self.healthy = True   # 健康检查是否返回 200
+        self.failing = False  # 对话请求是否返回 500
+        self.served = 0
+        replica = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if replica.healthy:
+                    self.reply(200, {"object": "list", "data": [{"id": "test-model", "object": "model"}]})
+                else:
+                    self.reply(503, {"error": "unhealthy"})
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if replica.failing:
+                    self.reply(500, {"error": {"message": "replica down"}})
+                    return
+                time.sleep(replica.delay)
+                replica.served += 1
+                self.reply(200, {
+                    "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "test-model",
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": replica.name}}],
+                    "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+                })
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        # 客户端保持的长连接不阻塞关闭
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_pool(replicas, **settings):
+    # 健康检查由测试手动触发
+    local_pool.configure({"local_pool": dict({"endpoints": [r.url for r in replicas], "health_interval": 0}, **settings)})
+    pool = local_pool.get_pool()
+    for endpoint in pool.endpoints:
+        # 失败请求不让SDK自动重试，直接计入端点失败次数
+        endpoint.client = endpoint.client.with_options(max_retries=0)
+    return pool
+
+
+@pytest.fixture
+def replicas(request):
+    started = [Replica(f"r{i}", delay=getattr(request, "param", 0.0)) for i in range(3)]
+    yield started
+    local_pool.configure({})
+    for replica in started:
+        replica.close()
+
+
+def ask(model):
+    resp, _ = model.generate("hi")
+    return resp
+
+
+def test_sequential_requests_rotate_across_replicas(replicas):
+    start_pool(replicas)
+    model = LocalPoolLlm("pool/test-model", "")
+    answers = [ask(model) for _ in range(6)]
+    assert sorted(answers) == ["r0", "r0", "r1", "r1", "r2", "r2"]
+    assert [r.served for r in replicas] == [2, 2, 2]
+
+
+@pytest.mark.parametrize("replicas", [0.3], indirect=True)
+def test_concurrent_requests_go_to_least_loaded_replica(replicas):
+    pool = start_pool(replicas)
+    model = LocalPoolLlm("pool/test-model", "")
+    answers = []
+    threads = [threading.Thread(target=lambda: answers.append(ask(model))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 三个请求同时进行时各占一个副本
+    assert sorted(answers) == ["r0", "r1", "r2"]
+    assert all(e["outstanding"] == 0 for e in pool.summary().values())
+
+
+def test_failed_replica_is_ejected_and_rejoins_after_probe(replicas):
+    pool = start_pool(replicas, max_failures=2)
+    model = LocalPoolLlm("pool/test-model", "")
+    bad = replicas[1]
+    bad.failing = True
+    bad.healthy = False
+
+    answers = [ask(model) for _ in range(6)]
+    assert answers.count(None) == 2
+    assert pool.summary()[bad.url]["healthy"] is False
+
+    # 移出轮换后请求只发给其余副本
+    answers = [ask(model) for _ in range(6)]
+    assert None not in answers and "r1" not in answers
+    assert bad.served == 0
+
+    # 仍然不健康时探测不会把它加回来
+    assert pool.probe(pool.endpoints[1]) is False
+    bad.failing = False
+    bad.healthy = True
+    assert pool.probe(pool.endpoints[1]) is True
+    assert pool.summary()[bad.url] == {"healthy": True, "outstanding": 0, "served": 0, "failures": 0}
+    answers = [ask(model) for _ in range(3)]
+    assert sorted(answers) == ["r0", "r1", "r2"]
+
+
+def test_failed_health_check_removes_replica(replicas):
+    pool = start_pool(replicas)
+    replicas[2].healthy = False
+    assert pool.probe(pool.endpoints[2]) is False
+    model = LocalPoolLlm("pool/test-model", "")
+    assert "r2" not in [ask(model) for _ in range(4)]
+
+
+def test_all_unhealthy_still_picks_an_endpoint(replicas):
+    pool = start_pool(replicas)
+    for endpoint in pool.endpoints:
+        endpoint.healthy = False
+    # 全部不健康时仍然发出请求，由重试逻辑决定后续
+    assert ask(LocalPoolLlm("pool/test-model", "")) in ("r0", "r1", "r2")
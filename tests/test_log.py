@@ -0,0 +1,75 @@
+import json
+import logging
+import threading
+
+import pytest
+
+import log
+from log import configure_logging, log_context
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "wolf_bot.jsonl"
+    configure_logging({"logging": {"level": "ERROR", "file_level": "DEBUG", "file": str(path)}})
+    yield path
+    log._stop_logging()
+
+
+def read_entries(path):
+    # 停止后台线程，确保已经写入文件
+    log._stop_logging()
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_file_records_include_context_and_payload(log_file):
+    logger = logging.getLogger("role")
+    with log_context(game="g1", player=3):
+        with log_context(action="vote"):
+            logger.debug("完整响应", extra={"payload": {"vote": 2}})
+        logger.info("发言结束")
+    entry, after = read_entries(log_file)
+    assert entry["logger"] == "role"
+    assert entry["level"] == "DEBUG"
+    assert (entry["game"], entry["player"], entry["action"]) == ("g1", 3, "vote")
+    assert entry["payload"] == {"vote": 2}
+    assert "action" not in after and after["player"] == 3
+
+
+def test_context_is_captured_in_the_logging_thread(log_file):
+    logger = logging.getLogger("game")
+
+    def worker(player):
+        with log_context(player=player):
+            logger.info("行动")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(entry["player"] for entry in read_entries(log_file)) == [0, 1, 2, 3]
+
+
+def test_exceptions_are_written_to_the_file(log_file):
+    try:
+        raise ValueError("bad json")
+    except ValueError:
+        logging.getLogger("llm").exception("解析失败")
+    entry = read_entries(log_file)[0]
+    assert entry["level"] == "ERROR"
+    assert entry["message"] == "解析失败"
+    assert "ValueError: bad json" in entry["exception"]
+
+
+def test_same_settings_do_not_reinstall_handlers(log_file):
+    handler = log._installed["handler"]
+    configure_logging({"logging": {"level": "ERROR", "file_level": "DEBUG", "file": str(log_file)}})
+    assert log._installed["handler"] is handler
+    assert logging.getLogger().handlers.count(handler) == 1
+
+
+def test_noisy_sdk_loggers_are_quieted(log_file):
+    logging.getLogger("httpx").debug("HTTP Request")
+    assert logging.getLogger("httpx").level == logging.WARNING
+    assert read_entries(log_file) == []
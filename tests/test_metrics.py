@@ -0,0 +1,69 @@
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """测试中创建的指标不留在全局的 /metrics 输出里"""
+    monkeypatch.setattr(metrics, "_registry", [])
+    return metrics._registry
+
+
+def test_counter_and_gauge_render_prometheus_text(registry):
+    counter = metrics.Counter("test_requests_total", "请求数", ("model",))
+    counter.inc(model="a")
+    counter.inc(2, model="a")
+    counter.inc(model='b"\\')
+    gauge = metrics.Gauge("test_active", "进行中")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert metrics.render().splitlines() == [
+        "# HELP test_requests_total 请求数",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{model="a"} 3',
+        'test_requests_total{model="b\\"\\\\"} 1',
+        "# HELP test_active 进行中",
+        "# TYPE test_active gauge",
+        "test_active 1",
+    ]
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = metrics.Histogram("test_seconds", "耗时", ("action",), buckets=(1, 5))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value, action="vote")
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{action="vote",le="1"} 2',
+        'test_seconds_bucket{action="vote",le="5"} 3',
+        'test_seconds_bucket{action="vote",le="+Inf"} 4',
+        'test_seconds_sum{action="vote"} 14.5',
+        'test_seconds_count{action="vote"} 4',
+    ]
+
+
+def test_missing_labels_render_as_empty(registry):
+    counter = metrics.Counter("test_total", "计数", ("provider", "model"))
+    counter.inc(model="m")
+    assert counter.render()[-1] == 'test_total{provider="",model="m"} 1'
+
+
+def test_metrics_endpoint_reports_game_requests(game_dir):
+    from fastapi.testclient import TestClient
+
+    import web
+
+    client = TestClient(web.app)
+    client.get("/start")
+    seer = next(p.player_index for p in web.game.players if p.role_type == "预言家")
+    client.post("/divine", json={"player_idx": seer})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE wolfbot_llm_request_seconds histogram" in body
+    assert 'wolfbot_llm_request_seconds_count{provider="mock",model="mock",outcome="ok"}' in body
+    assert 'wolfbot_action_seconds_count{action="divine"}' in body
+    active = next(line for line in body.splitlines() if line.startswith("wolfbot_active_games "))
+    assert int(active.split()[1]) >= 1
@@ -0,0 +1,72 @@
+import json
+
+from output_budget import DEFAULT_MAX_TOKENS, OutputBudget, OutputStats, action_name, get_stats
+
+
+def test_action_name_from_prompt_file():
+    assert action_name("prompts/prompt_speak_fast.yaml") == "speak_fast"
+    assert action_name("prompts/judge.yaml") == "judge"
+
+
+def test_cap_prefers_model_override_then_action_then_default(tmp_path):
+    config = {"output_tokens": {"actions": {"vote": 512}, "models": {"deepseek-chat": {"speak": 4096}}}}
+    budget = OutputBudget(config, stats_file=str(tmp_path / "stats.json"))
+    assert budget.cap("deepseek-chat", "speak") == 4096
+    # 档位提示词沿用基础行动的上限
+    assert budget.cap("deepseek-chat", "speak_fast") == 4096
+    assert budget.cap("other", "vote_simple") == 512
+    assert budget.cap("other", "unknown") == DEFAULT_MAX_TOKENS
+
+
+def test_adaptive_limit_uses_p99_with_headroom_and_floor(tmp_path):
+    budget = OutputBudget({"output_tokens": {"min_samples": 5}}, stats_file=str(tmp_path / "stats.json"))
+    for _ in range(4):
+        budget.record("m", "speak", 1000)
+    # 样本不足时使用配置的上限
+    assert budget.get_limit("m", "speak") == 3072
+    budget.record("m", "speak", 1000)
+    assert budget.get_limit("m", "speak") == 1200
+    # 重试时不收紧
+    assert budget.get_limit("m", "speak", retry=True) == 3072
+    for _ in range(5):
+        budget.record("m", "vote", 10)
+    assert budget.get_limit("m", "vote") == 256
+    # 不同输出格式分别统计
+    assert budget.get_limit("m", "speak", variant="brief") == 3072
+
+
+def test_disabled_budget_has_no_limit(tmp_path):
+    budget = OutputBudget({"output_tokens": {"enabled": False}}, stats_file=str(tmp_path / "stats.json"))
+    assert budget.get_limit("m", "vote") is None
+
+
+def test_budgets_share_one_store_per_file(tmp_path):
+    stats_file = str(tmp_path / "stats.json")
+    first = OutputBudget({"output_tokens": {"min_samples": 1}}, stats_file=stats_file)
+    second = OutputBudget({"output_tokens": {"min_samples": 1}}, stats_file=stats_file)
+    assert first.stats is second.stats is get_stats(stats_file, 500)
+    first.record("m", "speak", 100)
+    assert second.get_limit("m", "speak") == 256
+
+
+def test_flush_merges_samples_written_by_other_processes(tmp_path):
+    stats_file = tmp_path / "stats.json"
+    stats = OutputStats(str(stats_file), window=3)
+    stats.add("m/speak", 1)
+    # 其他进程在这期间写入了样本
+    stats_file.write_text(json.dumps({"m/speak": [7], "m/vote": [5]}))
+    stats.add("m/speak", 2)
+    stats.flush()
+    assert json.loads(stats_file.read_text()) == {"m/speak": [7, 1, 2], "m/vote": [5]}
+    assert stats.values("m/vote") == [5]
+    # 超过窗口时丢弃最旧的样本
+    stats.add("m/speak", 3)
+    stats.flush()
+    assert json.loads(stats_file.read_text())["m/speak"] == [1, 2, 3]
+    assert OutputStats(str(stats_file), window=3).values("m/speak") == [1, 2, 3]
+
+
+def test_unreadable_stats_file_starts_empty(tmp_path):
+    stats_file = tmp_path / "stats.json"
+    stats_file.write_text("{")
+    assert OutputStats(str(stats_file), window=10).values("m/speak") == []
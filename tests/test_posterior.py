@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from posterior import RolePosterior, build_posterior, count_assignments, enumerate_assignments
+from simulator import DEFAULT_ROLES, ROLE_CODES, WOLF
+
+
+def test_enumeration_covers_every_distinct_assignment():
+    assignments = enumerate_assignments(DEFAULT_ROLES)
+    assert count_assignments(DEFAULT_ROLES) == 10080
+    assert assignments.shape == (10080, 9)
+    assert len(np.unique(assignments, axis=0)) == 10080
+    for role_name, count in DEFAULT_ROLES.items():
+        assert ((assignments == ROLE_CODES[role_name]).sum(axis=1) == count).all()
+
+
+def test_prior_is_uniform():
+    probs = RolePosterior().wolf_probabilities()
+    assert probs == pytest.approx({seat: 3 / 9 for seat in range(1, 10)})
+
+
+def test_own_role_and_teammates_are_certain():
+    posterior = RolePosterior()
+    posterior.observe_role(1, "狼人")
+    posterior.observe_role(2, "狼人")
+    posterior.observe_role(3, "狼人")
+    probs = posterior.wolf_probabilities()
+    assert probs[1] == probs[2] == probs[3] == 1.0
+    assert all(probs[seat] == 0.0 for seat in range(4, 10))
+
+
+def test_divine_result_is_a_hard_constraint():
+    posterior = RolePosterior()
+    posterior.observe_role(7, "预言家")
+    posterior.observe_team(4, True)
+    probs = posterior.wolf_probabilities()
+    assert probs[7] == 0.0
+    assert probs[4] == 1.0
+    # 剩下的 2 只狼在其余 7 个座位上
+    assert probs[1] == pytest.approx(2 / 7)
+
+
+def test_soft_evidence_only_reweights():
+    posterior = RolePosterior()
+    posterior.observe_role(7, "预言家")
+    support = posterior.support_size()
+    posterior.observe_vote(1, 2)
+    assert posterior.support_size() == support
+    probs = posterior.wolf_probabilities()
+    assert probs[1] == pytest.approx(probs[2])
+    assert probs[1] < probs[3]
+    # 弃票不是证据
+    posterior.observe_vote(1, -1)
+    assert posterior.wolf_probabilities() == probs
+
+
+def test_night_death_lowers_wolf_probability():
+    posterior = RolePosterior()
+    posterior.observe_role(7, "预言家")
+    before = posterior.wolf_probabilities()[5]
+    posterior.observe_death(5, night_death=True)
+    assert posterior.wolf_probabilities()[5] < before
+
+
+def test_game_continuing_rules_out_finished_assignments():
+    posterior = RolePosterior()
+    for seat in (1, 2, 3):
+        posterior.observe_death(seat)
+    # 游戏还在进行，1-3号不可能都是狼人
+    assignments = posterior.assignments
+    assert not (assignments[:, :3] == WOLF).all(axis=1).any()
+
+
+def test_sampling_matches_exact_enumeration():
+    exact = RolePosterior(seed=0)
+    sampled = RolePosterior(max_enumerate=0, n_samples=40000, seed=0)
+    assert not sampled.exact
+    for posterior in (exact, sampled):
+        posterior.observe_role(7, "预言家")
+        posterior.observe_team(4, True)
+        posterior.observe_vote(1, 2)
+    exact_probs, sampled_probs = exact.wolf_probabilities(), sampled.wolf_probabilities()
+    for seat in range(1, 10):
+        assert sampled_probs[seat] == pytest.approx(exact_probs[seat], abs=0.02)
+
+
+def test_sampling_rejects_contradicting_knowledge():
+    posterior = RolePosterior(max_enumerate=0, n_samples=1000, seed=0)
+    for seat in range(1, 5):
+        posterior.known_teams[seat - 1] = True
+    with pytest.raises(ValueError):
+        posterior._sample(10)
+
+
+def test_most_likely_wolf():
+    posterior = RolePosterior(seed=0)
+    posterior.observe_role(7, "预言家")
+    posterior.observe_team(4, True)
+    assert posterior.most_likely_wolf([2, 4, 5]) == 4
+    assert posterior.most_likely_wolf([]) == -1
+
+
+def test_build_posterior_for_wolf_knows_teammates():
+    game = SimpleNamespace(players=[])
+    for index, role in enumerate(["狼人", "村民", "狼人", "预言家", "女巫", "猎人", "狼人", "村民", "村民"], start=1):
+        game.players.append(SimpleNamespace(player_index=index, role_type=role, game=game))
+    probs = build_posterior(game.players[0]).wolf_probabilities()
+    assert [seat for seat, p in probs.items() if p == 1.0] == [1, 3, 7]
+    villager = build_posterior(game.players[1]).wolf_probabilities()
+    assert villager[2] == 0.0
+    assert villager[1] == pytest.approx(3 / 8)
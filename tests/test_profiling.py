@@ -0,0 +1,79 @@
+import os
+import threading
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture
+def cprofile_settings(tmp_path):
+    profiling.configure({"profiling": {"enabled": True, "mode": "cprofile", "scope": "game", "dir": str(tmp_path)}})
+    yield tmp_path
+    profiling.configure({})
+
+
+def busy_work():
+    return sum(i * i for i in range(10000))
+
+
+def test_only_one_thread_runs_cprofile_at_a_time(cprofile_settings):
+    first = profiling.Profiler("g1", "game")
+    second = profiling.Profiler("g2", "game")
+    entered, release = threading.Event(), threading.Event()
+
+    def hold():
+        with first.active():
+            entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    entered.wait(5)
+    with second.active():
+        busy_work()
+    release.set()
+    thread.join()
+    assert first.skipped == 0
+    assert second.skipped == 1
+    assert second.active_count == 0
+
+    # 第一个剖析结束后，其他剖析可以正常开启
+    with second.active():
+        busy_work()
+    assert second.skipped == 1
+
+
+def test_enable_error_skips_profiling(cprofile_settings):
+    profiler = profiling.Profiler("g1", "game")
+
+    class Busy:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+        def disable(self):
+            raise AssertionError("没有开启时不应关闭")
+
+    profiler.profile = Busy()
+    with profiler.active():
+        busy_work()
+    assert profiler.skipped == 1
+    # 全局锁已释放
+    with profiling.Profiler("g2", "game").active():
+        busy_work()
+
+
+def test_game_profile_is_saved_after_finish(cprofile_settings):
+    with profiling.game_profiler("g1").active():
+        busy_work()
+    profiling.finish_game("g1")
+    assert [item["name"] for item in profiling.list_profiles()] == ["profile_g1_game.prof"]
+    assert profiling.profile_path("profile_g1_game.prof") == os.path.join(str(cprofile_settings), "profile_g1_game.prof")
+    assert profiling.profile_path("../config.json") is None
+
+
+def test_disabled_profiling_is_noop():
+    profiling.configure({})
+    assert profiling.game_profiler("g1") is profiling._NOOP
+    with profiling.profile_request("g1", "/status"):
+        busy_work()
@@ -0,0 +1,50 @@
+from prompt_tier import TIER_FAST, TIER_FULL, TIER_SIMPLE, PromptTierSelector, available_tiers, split_tier
+
+
+def test_split_tier():
+    assert split_tier("speak_fast") == ("speak", TIER_FAST)
+    assert split_tier("divine_simple") == ("divine", TIER_SIMPLE)
+    assert split_tier("cure_or_poison") == ("cure_or_poison", TIER_FULL)
+
+
+def test_available_tiers(game_dir):
+    # 按当前目录下的 prompts/ 判断有哪些档位
+    assert available_tiers("speak") == [TIER_FULL, TIER_FAST, TIER_SIMPLE]
+    assert available_tiers("vote") == [TIER_FULL]
+
+
+def test_fixed_mode_and_missing_target(game_dir):
+    assert PromptTierSelector({"prompt_tier": {"mode": "simple"}}).select("m", "speak") == ("prompts/prompt_speak_simple.yaml", TIER_SIMPLE)
+    # 没有 simple 档位的行动使用 full
+    assert PromptTierSelector({"prompt_tier": {"mode": "simple"}}).select("m", "vote") == ("prompts/prompt_vote.yaml", TIER_FULL)
+    assert PromptTierSelector().select("m", "speak")[1] == TIER_FULL
+
+
+def test_auto_mode_picks_best_tier_within_target(game_dir):
+    selector = PromptTierSelector({"prompt_tier": {"latency_target": 5, "probe_every": 0}})
+    assert selector.select("m", "speak")[1] == TIER_FULL
+    selector.record("m", "speak", 12)
+    # fast 还没有测量过，先试一次
+    assert selector.select("m", "speak")[1] == TIER_FAST
+    selector.record("m", "speak_fast", 4)
+    assert selector.select("m", "speak")[1] == TIER_FAST
+    selector.record("m", "speak_fast", 20)
+    selector.record("m", "speak_simple", 8)
+    # 都超过目标时选最快的
+    assert selector.select("m", "speak")[1] == TIER_SIMPLE
+    # 其他模型的延迟分别统计
+    assert selector.select("other", "speak")[1] == TIER_FULL
+
+
+def test_auto_mode_periodically_probes_higher_tier(game_dir):
+    selector = PromptTierSelector({"prompt_tier": {"latency_target": 5, "probe_every": 3}})
+    selector.record("m", "speak", 12)
+    selector.record("m", "speak_fast", 2)
+    assert [selector.select("m", "speak")[1] for _ in range(3)] == [TIER_FAST, TIER_FAST, TIER_FULL]
+
+
+def test_latency_is_smoothed():
+    selector = PromptTierSelector({"prompt_tier": {"alpha": 0.5}})
+    selector.record("m", "speak_fast", 10)
+    selector.record("m", "speak_fast", 20)
+    assert selector.summary() == {"m/speak/fast": 15.0}
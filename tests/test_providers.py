@@ -0,0 +1,91 @@
+import pytest
+
+import providers
+from providers import ProviderRegistry, load_class, provider_for_model, registry
+
+
+class EchoLlm:
+    def __init__(self, model_name, api_key, force_json=False):
+        self.model_name = model_name
+        self.api_key = api_key
+        self.force_json = force_json
+
+
+@pytest.fixture
+def empty_registry(monkeypatch):
+    monkeypatch.setattr(providers, "entry_points", lambda group: [])
+    return ProviderRegistry()
+
+
+def test_builtin_models_and_prefixes():
+    assert provider_for_model("deepseek-chat") == "deepseek"
+    assert provider_for_model("mock/300") == "mock"
+    assert provider_for_model("pool/Qwen3-32B-AWQ") == "local_pool"
+    assert provider_for_model("human") is None
+    assert provider_for_model("no-such-model") is None
+
+
+def test_longest_prefix_wins(empty_registry):
+    empty_registry.register_prefix("ep-", "doubao", EchoLlm)
+    empty_registry.register_prefix("ep-test-", "custom", EchoLlm)
+    assert empty_registry.provider_for_model("ep-test-1") == "custom"
+    assert empty_registry.provider_for_model("ep-1") == "doubao"
+
+
+def test_register_provider_fills_defaults_and_model_classes(empty_registry):
+    empty_registry.register_provider("acme", {"models": ["acme-1", "acme-2"], "llm_class": EchoLlm,
+                                              "model_classes": {"acme-2": "llm:MockLlm"}})
+    info = empty_registry.get_provider("acme")
+    assert info["name"] == "acme"
+    assert info["rate_limit"] == {}
+    assert empty_registry.lookup("acme-1") == ("acme", EchoLlm)
+    assert empty_registry.lookup("acme-2") == ("acme", "llm:MockLlm")
+    empty_registry.register_model("acme-3", "acme", EchoLlm)
+    assert "acme-3" in info["models"]
+
+
+def test_build_imports_class_lazily(empty_registry):
+    empty_registry.register_model("echo", "acme", "tests.test_providers:EchoLlm")
+    model = empty_registry.build("echo", "key", force_json=True)
+    assert (type(model).__name__, model.api_key, model.force_json) == ("EchoLlm", "key", True)
+    with pytest.raises(ValueError):
+        empty_registry.build("unknown", "")
+
+
+def test_plugins_are_loaded_once_and_failures_are_skipped(monkeypatch):
+    calls = []
+
+    class EntryPoint:
+        def __init__(self, name, register):
+            self.name = name
+            self.register = register
+
+        def load(self):
+            return self.register
+
+    def broken(registry):
+        raise RuntimeError("bad plugin")
+
+    def register(registry):
+        calls.append(registry)
+        registry.register_model("plugin-model", "plugin", EchoLlm)
+
+    monkeypatch.setattr(providers, "entry_points", lambda group: [EntryPoint("broken", broken), EntryPoint("ok", register)])
+    plugin_registry = ProviderRegistry()
+    assert plugin_registry.provider_for_model("plugin-model") == "plugin"
+    plugin_registry.lookup("plugin-model")
+    assert len(calls) == 1
+
+
+def test_load_class():
+    assert load_class(EchoLlm) is EchoLlm
+    assert load_class("providers:ProviderRegistry") is ProviderRegistry
+
+
+def test_build_model_attaches_shared_limiter_and_breaker():
+    from llm import BuildModel, MockLlm
+
+    first, second = BuildModel("mock/5", ""), BuildModel("mock", "")
+    assert isinstance(first, MockLlm) and first.latency == 0.005
+    assert first.breaker is second.breaker
+    assert registry.get_provider("mock")["llm_class"] == "llm:MockLlm"
@@ -0,0 +1,119 @@
+import json
+import threading
+
+import pytest
+
+import rate_limit
+from rate_limit import ProviderLimiter, RateLimitedError, TokenBucket, parse_duration, retry_after_from_exception, retry_after_from_headers
+
+
+def test_bucket_refills_at_rate_up_to_capacity():
+    bucket = TokenBucket(capacity=60, rate=1.0)
+    now = bucket.updated
+    assert bucket.take(60) == 60
+    assert bucket.wait_time(10, now) == pytest.approx(10)
+    # 过了5秒补充5个令牌，还差5个
+    assert bucket.wait_time(10, now + 5) == pytest.approx(5)
+    assert bucket.wait_time(10, now + 10) == 0
+    # 补充不超过容量
+    bucket.wait_time(1, now + 1000)
+    assert bucket.tokens == 60
+
+
+def test_request_larger_than_capacity_waits_for_full_bucket_only():
+    bucket = TokenBucket(capacity=100, rate=10.0)
+    now = bucket.updated
+    assert bucket.wait_time(500, now) == 0
+    assert bucket.take(500) == 100
+    assert bucket.tokens == 0
+    # 桶空后再来一个超大请求，等到桶满即可，不会永远等待
+    assert bucket.wait_time(500, now) == pytest.approx(10)
+
+
+def test_unlimited_bucket_never_waits_or_deducts():
+    bucket = TokenBucket(capacity=0, rate=0)
+    assert bucket.wait_time(10 ** 9, bucket.updated) == 0
+    assert bucket.take(10 ** 9) == 0
+
+
+def test_pause_delays_even_unlimited_bucket():
+    bucket = TokenBucket(capacity=0, rate=0)
+    bucket.paused_until = bucket.updated + 3
+    assert bucket.wait_time(1, bucket.updated) == pytest.approx(3)
+
+
+def test_acquire_returns_clamped_reservation_and_refund_never_exceeds_it():
+    limiter = ProviderLimiter("test", tpm=100)
+    reserved = limiter.acquire(500)
+    assert reserved == 100
+    assert limiter.tokens.tokens == 0
+    limiter.release(reserved, used_tokens=10)
+    assert limiter.tokens.tokens == pytest.approx(90, abs=1)
+
+
+def test_release_without_usage_keeps_reservation():
+    limiter = ProviderLimiter("test", tpm=600)
+    reserved = limiter.acquire(200)
+    limiter.release(reserved)
+    assert limiter.tokens.tokens == pytest.approx(400, abs=1)
+
+
+def test_concurrency_cap_blocks_until_release():
+    limiter = ProviderLimiter("test", concurrency=1)
+    limiter.acquire()
+    entered = threading.Event()
+
+    def second():
+        limiter.acquire()
+        entered.set()
+        limiter.release()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not entered.wait(0.1)
+    limiter.release()
+    assert entered.wait(1)
+    thread.join()
+
+
+@pytest.mark.parametrize("value, seconds", [("20", 20), ("1.5", 1.5), ("6m0s", 360), ("250ms", 0.25), ("1h", 3600), ("abc", None), (None, None)])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+
+def test_retry_after_from_headers_prefers_milliseconds():
+    assert retry_after_from_headers({"Retry-After-Ms": "1500", "Retry-After": "9"}) == 1.5
+    assert retry_after_from_headers({"x-ratelimit-reset-tokens": "2m"}) == 120
+    assert retry_after_from_headers({}) is None
+
+
+def test_retry_after_from_exception():
+    assert retry_after_from_exception(RateLimitedError("429", retry_after=7)) == 7
+    assert retry_after_from_exception(RateLimitedError("429")) == 0.0
+    assert retry_after_from_exception(ValueError("boom")) is None
+
+
+def test_configure_keeps_limiters_when_config_is_unchanged():
+    config = {"rate_limits": {"deepseek": {"rpm": 60}}}
+    rate_limit.configure(config)
+    limiter = rate_limit.get_limiter("deepseek", "K")
+    rate_limit.configure(json.loads(json.dumps(config)))
+    assert rate_limit.get_limiter("deepseek", "K") is limiter
+    # 配置变化时按新额度重新创建
+    rate_limit.configure({"rate_limits": {"deepseek": {"rpm": 30}}})
+    assert rate_limit.get_limiter("deepseek", "K").requests.capacity == 30
+    rate_limit.configure({})
+
+
+def test_games_started_one_after_another_share_one_limiter(game_dir):
+    from game import WerewolfGame
+
+    game_dir(rate_limits={"mock": {"rpm": 600, "concurrency": 2}})
+    first = WerewolfGame()
+    first.start()
+    second = WerewolfGame()
+    second.start()
+    limiters = {id(player.model.limiter) for game in (first, second) for player in game.players}
+    assert len(limiters) == 1
+    assert first.players[0].model.limiter.requests.capacity == 600
+    rate_limit.configure({})
@@ -0,0 +1,47 @@
+import json
+from types import SimpleNamespace
+
+from cost import CostLedger
+
+
+def make_recorder():
+    # web.py 导入时创建全局游戏并挂载 public/，需要在 game_dir 中导入
+    from web import Recorder
+
+    ledger = CostLedger()
+    ledger.record("deepseek-chat", {"prompt_tokens": 1000, "completion_tokens": 200, "reasoning_tokens": 0,
+                                    "cached_tokens": 0, "source": "reported"}, player=1, action="vote")
+    return Recorder(SimpleNamespace(start_time="test", cost_ledger=ledger))
+
+
+def test_replay_file_ends_with_cost_report(game_dir):
+    recorder = make_recorder()
+    recorder.record({"players": {}})
+    recorder.record({"winner": "好人"})
+    with open("logs/replay_test.json", encoding="utf-8") as f:
+        records = json.load(f)
+    assert [record.get("response") for record in records[:-1]] == [{"players": {}}, {"winner": "好人"}]
+    cost = records[-1]["cost"]
+    assert cost["summary"]["total"]["prompt_tokens"] == 1000
+    assert cost["entries"][0]["player"] == 1
+
+
+def test_loading_replay_separates_cost_from_responses(game_dir):
+    recorder = make_recorder()
+    recorder.record({"players": {}})
+    recorder.record({"winner": "好人"})
+
+    replay = make_recorder()
+    replay.load("logs/replay_test.json")
+    assert replay.cost["summary"]["total"]["calls"] == 1
+    assert replay.fetch() == {"players": {}}
+    assert replay.fetch() == {"winner": "好人"}
+
+
+def test_loading_replay_without_cost(game_dir):
+    with open("logs/replay_old.json", "w", encoding="utf-8") as f:
+        json.dump([{"response": {"message": "ok"}}], f)
+    replay = make_recorder()
+    replay.load("logs/replay_old.json")
+    assert replay.cost is None
+    assert replay.fetch() == {"message": "ok"}
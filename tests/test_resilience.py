@@ -0,0 +1,248 @@
+import threading
+import time
+
+import pytest
+
+import metrics
+import resilience
+from resilience import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture(autouse=True)
+def hedging_config():
+    resilience.configure({"resilience": {"hedging": {"enabled": True, "min_samples": 3}}})
+    yield
+    resilience.configure({})
+
+
+class FakeModel:
+    """按固定延迟返回结果的模型，记录收到的请求参数"""
+
+    def __init__(self, name, delay=0.0, resp="ok", breaker=True):
+        self.model_name = "fake"
+        self.name = name
+        self.delay = delay
+        self.resp = resp
+        self.breaker = CircuitBreaker(name) if breaker else None
+        self.alternates = []
+        self.options = []
+        self.started = threading.Event()
+
+    def limited_generate(self, message, chat_history, options=None):
+        self.options.append(options)
+        self.started.set()
+        time.sleep(self.delay)
+        return (f"{self.name}:{self.resp}" if self.resp else None), None
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        breaker.record(False, 0.1)
+
+
+def test_breaker_opens_on_error_rate():
+    breaker = CircuitBreaker("test", {"min_calls": 4, "error_rate": 0.5})
+    for success in (True, False, False):
+        breaker.record(success, 0.1)
+    # 样本不足时不熔断
+    assert breaker.state == STATE_CLOSED
+    breaker.record(False, 0.1)
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("test", {"min_calls": 2, "slow_call_seconds": 1})
+    breaker.record(True, 5)
+    breaker.record(True, 5)
+    assert breaker.state == STATE_OPEN
+
+
+def test_breaker_half_open_probe_closes_on_success():
+    breaker = CircuitBreaker("test", {"min_calls": 2, "cooldown": 30})
+    trip(breaker)
+    assert not breaker.allow()
+    breaker.opened_at -= 30
+    # 冷却后只放行一个探测请求
+    assert breaker.allow()
+    assert breaker.state == STATE_HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow()
+    assert breaker.error_rate() == 0
+
+
+def test_breaker_half_open_probe_reopens_on_failure():
+    breaker = CircuitBreaker("test", {"min_calls": 2, "cooldown": 30})
+    trip(breaker)
+    breaker.opened_at -= 30
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == STATE_OPEN
+    assert breaker.times_opened == 2
+    assert not breaker.allow()
+
+
+def test_call_with_breaker_rejects_when_open():
+    model = FakeModel("primary")
+    trip(model.breaker)
+    with pytest.raises(CircuitOpenError):
+        resilience.call_with_breaker(model, "hi", [])
+    assert model.options == []
+
+
+def test_no_hedge_without_latency_samples():
+    model = FakeModel("primary", delay=0.2)
+    model.alternates = [FakeModel("alternate")]
+    assert resilience.hedged_call(model, "hi", [])[0] == "primary:ok"
+    assert model.alternates[0].options == []
+
+
+def test_hedge_fires_after_primary_p95_and_alternate_wins():
+    model = FakeModel("primary", delay=1.0)
+    alternate = FakeModel("alternate")
+    model.alternates = [alternate]
+    for _ in range(5):
+        model.breaker.record(True, 0.05)
+    options = {"max_tokens": 128, "response_schema": {"type": "object"}}
+    start = time.monotonic()
+    resp, _ = resilience.hedged_call(model, "hi", [], options)
+    elapsed = time.monotonic() - start
+    assert resp == "alternate:ok"
+    assert 0.05 <= elapsed < 0.5
+    # 对冲请求使用和主请求相同的输出上限和Schema
+    assert alternate.options == [options]
+    stats = resilience.summary()["hedging"]["fake"]
+    assert stats["hedged"] == 1 and stats["hedge_won"] == 1
+
+
+def test_primary_returning_before_p95_is_not_hedged():
+    model = FakeModel("primary")
+    alternate = FakeModel("alternate")
+    model.alternates = [alternate]
+    for _ in range(5):
+        model.breaker.record(True, 0.5)
+    assert resilience.hedged_call(model, "hi", [])[0] == "primary:ok"
+    assert alternate.options == []
+
+
+def test_failover_to_alternate_when_primary_open_keeps_options():
+    model = FakeModel("primary")
+    alternate = FakeModel("alternate")
+    model.alternates = [alternate]
+    trip(model.breaker)
+    options = {"max_tokens": 64, "response_schema": None}
+    assert resilience.hedged_call(model, "hi", [], options)[0] == "alternate:ok"
+    assert alternate.options == [options]
+    assert model.options == []
+    assert resilience.summary()["hedging"]["fake"]["failover"] == 1
+
+
+def test_open_primary_recovers_through_probe_with_alternate_configured():
+    model = FakeModel("primary")
+    alternate = FakeModel("alternate")
+    model.alternates = [alternate]
+    trip(model.breaker)
+    assert resilience.hedged_call(model, "hi", [])[0] == "alternate:ok"
+    # 冷却结束后探测请求发给主端点，成功后关闭熔断器，之后的请求回到主端点
+    model.breaker.opened_at -= model.breaker.cooldown
+    assert resilience.hedged_call(model, "hi", [])[0] == "primary:ok"
+    assert model.breaker.state == STATE_CLOSED
+    assert [resilience.hedged_call(model, "hi", [])[0] for _ in range(3)] == ["primary:ok"] * 3
+    assert len(alternate.options) == 1
+    assert resilience.summary()["hedging"]["fake"]["failover"] == 1
+
+
+def test_failed_probe_reopens_primary_and_keeps_failing_over():
+    model = FakeModel("primary", resp=None)
+    alternate = FakeModel("alternate")
+    model.alternates = [alternate]
+    trip(model.breaker)
+    model.breaker.opened_at -= model.breaker.cooldown
+    assert resilience.hedged_call(model, "hi", [])[0] is None
+    assert model.breaker.state == STATE_OPEN
+    assert resilience.hedged_call(model, "hi", [])[0] == "alternate:ok"
+
+
+def test_requests_during_probe_fail_over():
+    model = FakeModel("primary")
+    alternate = FakeModel("alternate")
+    model.alternates = [alternate]
+    trip(model.breaker)
+    model.breaker.opened_at -= model.breaker.cooldown
+    # 另一个请求已经取得探测名额
+    assert model.breaker.allow()
+    assert model.breaker.state == STATE_HALF_OPEN
+    assert resilience.hedged_call(model, "hi", [])[0] == "alternate:ok"
+
+
+def test_hedged_call_raises_when_both_fail():
+    model = FakeModel("primary", delay=0.3, resp=None)
+    model.alternates = [FakeModel("alternate", resp=None)]
+    for _ in range(5):
+        model.breaker.record(True, 0.05)
+    with pytest.raises(Exception):
+        resilience.hedged_call(model, "hi", [])
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert resilience.percentile(values, 50) == 50
+    assert resilience.percentile(values, 95) == 95
+    assert resilience.percentile([3.0], 95) == 3.0
+
+
+def test_configure_keeps_breakers_and_stats_when_config_is_unchanged():
+    config = {"resilience": {"hedging": {"enabled": True, "min_samples": 3}}}
+    breaker = resilience.get_breaker("deepseek", "K")
+    model = FakeModel("primary")
+    model.alternates = [FakeModel("alternate")]
+    trip(model.breaker)
+    resilience.hedged_call(model, "hi", [])
+    resilience.configure(config)
+    assert resilience.get_breaker("deepseek", "K") is breaker
+    assert resilience.summary()["hedging"]["fake"]["failover"] == 1
+    # 配置变化时按新配置重新创建
+    resilience.configure({"resilience": {"breaker": {"cooldown": 5}}})
+    assert resilience.get_breaker("deepseek", "K") is not breaker
+    assert resilience.get_breaker("deepseek", "K").cooldown == 5
+
+
+def test_games_started_one_after_another_share_breakers(game_dir):
+    from game import WerewolfGame
+
+    game_dir()
+    first = WerewolfGame()
+    first.start()
+    second = WerewolfGame()
+    second.start()
+    breakers = {id(player.model.breaker) for game in (first, second) for player in game.players}
+    assert first.players[0].model.breaker is not None
+    assert len(breakers) == 1
+
+
+def test_breaker_state_and_failovers_are_exported_as_metrics():
+    model = FakeModel("metrics-primary")
+    model.alternates = [FakeModel("alternate")]
+    key = ("fake", "metrics-primary")
+    before = metrics.failovers.values.get(key, 0)
+    trip(model.breaker)
+    assert 'wolfbot_breaker_state{endpoint="metrics-primary"} 2' in metrics.render()
+    resilience.hedged_call(model, "hi", [])
+    assert metrics.failovers.values[key] == before + 1
+    model.breaker.opened_at -= model.breaker.cooldown
+    resilience.hedged_call(model, "hi", [])
+    assert 'wolfbot_breaker_state{endpoint="metrics-primary"} 0' in metrics.render()
+
+
+def test_hedges_are_exported_as_metrics():
+    model = FakeModel("metrics-hedged", delay=1.0)
+    model.alternates = [FakeModel("alternate")]
+    for _ in range(5):
+        model.breaker.record(True, 0.05)
+    key = ("fake", "metrics-hedged")
+    resilience.hedged_call(model, "hi", [])
+    assert metrics.hedged_requests.values[key] == 1
+    assert metrics.hedge_wins.values[key] == 1
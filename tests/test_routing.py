@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from routing import DEFAULT_ROUTE, ModelRouter, RouteStats
+
+
+def test_resolve_falls_back_to_base_action_then_default():
+    default = SimpleNamespace(model_name="deepseek-reasoner")
+    router = ModelRouter(default, {"speak": {"model_name": "mock/1"}, "lastword": {"model_name": "mock"}})
+    model, route = router.resolve("speak_fast")
+    assert (model.model_name, route) == ("mock/1", "speak")
+    # 同一路由只创建一次模型
+    assert router.resolve("speak")[0] is model
+    assert router.resolve("lastword")[0].model_name == "mock"
+    assert router.resolve("vote") == (default, DEFAULT_ROUTE)
+
+
+def test_route_stats_summary():
+    stats = RouteStats()
+    stats.record("lastword", "mock", 1.0, 100, 10)
+    stats.record("lastword", "mock", 2.0, 50, 5)
+    assert stats.summary() == {"lastword/mock": {
+        "calls": 2, "seconds": 3.0, "prompt_tokens": 150, "completion_tokens": 15, "mean_seconds": 1.5}}
+
+
+def test_configured_routes_follow_the_player(game_dir):
+    from game import WerewolfGame
+
+    routes = {"divine": {"model_name": "mock/1", "api_key": ""}}
+    players = [{"model_name": "mock", "api_key": "", "routes": routes} for _ in range(9)]
+    game_dir(players=players)
+    game = WerewolfGame()
+    game.start()
+    seer = next(p for p in game.players if p.role_type == "预言家")
+    game.divine(seer.player_index)
+    # 展示的模型名不变，请求由路由的模型发出
+    assert seer.model.model_name == "mock"
+    assert list(game.route_stats.summary()) == ["divine/mock/1"]
+    assert "mock/1" in game.cost_ledger.summary()["models"]
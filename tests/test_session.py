@@ -0,0 +1,78 @@
+import json
+from types import SimpleNamespace
+
+from history import ENCODING_TEXT, History, KillEvent, SpeakEvent, VoteEvent
+from session import ChatSession, order_prompt
+
+
+def make_player():
+    history = History()
+    history.add_event(KillEvent(3))
+    player = SimpleNamespace(
+        player_index=1,
+        model=SimpleNamespace(model_name="deepseek-chat"),
+        game=SimpleNamespace(history=history),
+        get_event_encoding=lambda: ENCODING_TEXT,
+    )
+    return player
+
+
+def make_prompt(player, instructions="请投票"):
+    return {
+        "随机数种子": 42,
+        "instructions": instructions,
+        "事件": player.game.history.get_history(),
+        "角色": "你是一名村民",
+        "游戏规则": ["规则"],
+        "你的玩家编号": "你是1号玩家",
+    }
+
+
+def test_order_prompt_puts_stable_fields_first_and_seed_last():
+    player = make_player()
+    assert list(order_prompt(make_prompt(player))) == ["游戏规则", "你的玩家编号", "角色", "事件", "instructions", "随机数种子"]
+
+
+def test_follow_up_requests_only_send_new_events():
+    player = make_player()
+    session = ChatSession(player)
+    message, chat_history, pending = session.build(make_prompt(player), budget=10000)
+    assert [turn["role"] for turn in chat_history] == ["system"]
+    assert "事件" in json.loads(message)
+    session.commit(pending, {"thinking": "很长的思考", "vote": 2})
+
+    player.game.history.toggle_day_night()
+    player.game.history.add_event(SpeakEvent(2, "我是好人"))
+    player.game.history.add_event(VoteEvent(2, 4))  # 私密事件不发送
+    message, second_history, pending = session.build(make_prompt(player, "请发言"), budget=10000)
+    assert json.loads(message)["新事件"] == ['第2天白天: 【2号玩家】发言: "我是好人)"']
+    # 前缀不变，提供商可以命中缓存
+    assert second_history[0] == chat_history[0]
+    assert [turn["role"] for turn in second_history] == ["system", "user", "bot"]
+    assert "thinking" not in json.loads(second_history[2]["content"])
+    session.commit(pending, {"speech": "同意"})
+    assert session.event_cursor == 3
+
+
+def test_changed_stable_prefix_starts_a_new_conversation():
+    player = make_player()
+    session = ChatSession(player)
+    _, _, pending = session.build(make_prompt(player), budget=10000)
+    session.commit(pending, {"vote": 2})
+    prompt = make_prompt(player)
+    prompt["角色"] = "你是一名猎人"
+    message, chat_history, _ = session.build(prompt, budget=10000)
+    assert len(chat_history) == 1
+    assert "事件" in json.loads(message)
+
+
+def test_conversation_over_budget_restarts_with_full_events():
+    player = make_player()
+    session = ChatSession(player)
+    _, _, pending = session.build(make_prompt(player), budget=10000)
+    session.commit(pending, {"speech": "发言" * 500})
+    player.game.history.add_event(KillEvent(4))
+    message, chat_history, pending = session.build(make_prompt(player), budget=100)
+    assert len(chat_history) == 1
+    assert "事件" in json.loads(message) and "新事件" not in json.loads(message)
+    assert pending["cursor"] == 2
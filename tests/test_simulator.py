@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from simulator import (BatchSimulator, BoardVariant, HUNTER, SEER, UNDECIDED, VILLAGER, VILLAGER_WIN, WITCH, WOLF,
+                       WOLF_WIN, _pick, _tally, check_winner, parse_roles, simulate)
+
+
+def test_check_winner_matches_game_rules():
+    roles = np.array([[WOLF, WOLF, VILLAGER, SEER]] * 4, dtype=np.int8)
+    alive = np.array([
+        [True, True, True, True],     # 2 对 2
+        [False, False, True, True],   # 狼人全部出局
+        [True, True, True, False],    # 2 对 1
+        [True, False, True, True],    # 1 对 2
+    ])
+    assert check_winner(roles, alive).tolist() == [WOLF_WIN, VILLAGER_WIN, WOLF_WIN, UNDECIDED]
+    assert check_winner(roles, alive, parity="continue").tolist() == [UNDECIDED, VILLAGER_WIN, WOLF_WIN, UNDECIDED]
+
+
+def test_tally_returns_unique_leader_or_minus_one():
+    targets = np.array([
+        [2, 2, 1, -1],
+        [0, 1, -1, -1],
+        [-1, -1, -1, -1],
+    ])
+    winner, leaders = _tally(targets, 4)
+    assert winner.tolist() == [2, -1, -1]
+    assert leaders[1].tolist() == [True, True, False, False]
+    assert not leaders[2].any()
+
+
+def test_pick_only_chooses_candidates():
+    rng = np.random.default_rng(0)
+    candidates = np.zeros((1000, 5), dtype=bool)
+    candidates[:, [1, 3]] = True
+    candidates[0] = False
+    picked = _pick(rng, candidates)
+    assert picked[0] == -1
+    assert set(picked[1:].tolist()) == {1, 3}
+
+
+def test_every_batch_deals_the_configured_board():
+    simulator = BatchSimulator(seed=0)
+    roles = simulator._deal(200)
+    for code, count in ((WOLF, 3), (SEER, 1), (WITCH, 1), (HUNTER, 1), (VILLAGER, 3)):
+        assert ((roles == code).sum(axis=1) == count).all()
+
+
+def test_run_batch_finishes_games_within_max_days():
+    result, end_day, end_at_night = BatchSimulator(BoardVariant(max_days=20), seed=0).run_batch(2000)
+    assert set(result.tolist()) <= {WOLF_WIN, VILLAGER_WIN}
+    assert end_day.min() >= 1
+    # 白天结束的对局记为下一天
+    assert end_day.max() <= 21
+    assert end_at_night.any() and not end_at_night.all()
+
+
+def test_simulate_report_is_reproducible():
+    first = simulate(n_games=3000, batch_size=1000, seed=1)
+    second = simulate(n_games=3000, batch_size=1000, seed=1)
+    assert first["win_rate"] == second["win_rate"]
+    rates = [info["rate"] for info in first["win_rate"].values()]
+    assert sum(rates) == pytest.approx(1.0, abs=1e-3)
+    for info in first["win_rate"].values():
+        assert info["ci95"][0] <= info["rate"] <= info["ci95"][1]
+    assert sum(sum(h.values()) for h in first["game_length"].values()) == 3000
+
+
+def test_invalid_variants_are_rejected():
+    with pytest.raises(ValueError):
+        BoardVariant(roles={"狼王": 1})
+    with pytest.raises(ValueError):
+        BoardVariant(kill_tie="sometimes")
+
+
+def test_parse_roles():
+    assert parse_roles("狼人=2, 预言家=1,村民=3") == {"狼人": 2, "预言家": 1, "村民": 3}
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+from history import ExecuteEvent, History, KillEvent, SpeakEvent
+from summary import LlmSummarizer, RollingSummary, ScriptedSummarizer, build_summarizer
+
+
+def make_player(n_rounds=3):
+    """每个回合夜晚一人出局，白天一人发言"""
+    history = History()
+    for day in range(n_rounds):
+        history.add_event(KillEvent(day + 1))
+        history.toggle_day_night()
+        history.add_event(SpeakEvent(9, f"第{day + 2}天的发言" + "很长" * 30))
+        history.toggle_day_night()
+    game = SimpleNamespace(history=history)
+    return SimpleNamespace(player_index=9, role_type="村民", game=game)
+
+
+def test_scripted_summary_keeps_key_facts_and_caches_per_round():
+    player = make_player()
+    summarizer = ScriptedSummarizer(speech_length=5)
+    history = player.game.history
+    history.rounds[1].add_event(True, ExecuteEvent(4, [{"player_idx": 1, "vote_id": 4}, {"player_idx": 2, "vote_id": -1}]))
+    text = summarizer.summarize(player, 1, "")
+    assert text == "第2天: 9号:第2天的发; 4号被处决(票型 1→4,2→弃); 2号夜晚出局"
+    history.rounds[1].day_events.clear()
+    assert summarizer.summarize(player, 1, "") == text
+
+
+def test_rolling_summary_fills_earlier_rounds_in_order():
+    player = make_player()
+    summary = RollingSummary(player, ScriptedSummarizer(), rolling=False)
+    summary._update(1)
+    covered, text = summary.snapshot()
+    assert covered == 2
+    assert text.splitlines()[0].startswith("第1天")
+    assert text.splitlines()[1].startswith("第2天")
+    # 已经覆盖的回合不再重复生成
+    summary._update(0)
+    assert summary.snapshot() == (covered, text)
+
+
+def test_failed_summary_falls_back_and_still_advances():
+    class Broken:
+        def summarize(self, player, round_idx, previous_summary):
+            raise RuntimeError("timeout")
+
+    player = make_player()
+    summary = RollingSummary(player, Broken(), rolling=True)
+    summary._update(1)
+    covered, text = summary.snapshot()
+    assert covered == 2
+    # 滚动摘要的回退结果带上之前的摘要
+    assert text.startswith("第1天") and "第2天" in text
+
+
+def test_llm_summary_without_result_falls_back_to_scripted():
+    player = make_player()
+    text = LlmSummarizer("mock", "").summarize(player, 1, "之前的摘要")
+    assert text == "之前的摘要\n" + ScriptedSummarizer().summarize(player, 1, "")
+
+
+def test_render_events_replaces_summarized_rounds_outside_keep_recent():
+    player = make_player(n_rounds=3)
+    summary = RollingSummary(player, ScriptedSummarizer(), rolling=False)
+    n_rounds = len(player.game.history.rounds)
+    assert summary.render_events(keep_recent=1) == player.game.history.get_history()
+    summary._update(n_rounds - 1)
+    events = summary.render_events(keep_recent=1)
+    assert len(events) == 2
+    assert events[0]["时间"] == f"前{n_rounds - 1}个回合"
+    assert events[1] == player.game.history.get_history()[-1]
+    # 同一阶段内重复请求返回缓存
+    assert summary.render_events(keep_recent=1) is events
+
+
+def test_build_summarizer_from_config():
+    assert build_summarizer({}) is None
+    assert isinstance(build_summarizer({"history_summary": {"enabled": True}}), ScriptedSummarizer)
+    llm = build_summarizer({"history_summary": {"enabled": True, "summarizer": "llm", "model_name": "mock"}})
+    assert isinstance(llm, LlmSummarizer)
@@ -0,0 +1,67 @@
+import os
+
+import yaml
+
+from role import BRIEF_THINKING_LENGTH, THINKING_BRIEF, THINKING_FULL, THINKING_NONE, apply_thinking_level
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_prompt(action):
+    with open(os.path.join(ROOT, "prompts", f"prompt_{action}.yaml"), encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def test_full_level_leaves_template_untouched():
+    prompt = load_prompt("vote")
+    original = dict(prompt)
+    assert apply_thinking_level(prompt, THINKING_FULL) == ["thinking"]
+    assert prompt == original
+
+
+def test_none_level_drops_thinking_fields():
+    prompt = load_prompt("vote")
+    assert apply_thinking_level(prompt, THINKING_NONE) == ["thinking"]
+    assert prompt["required_fields"] == ["vote"]
+    assert '"thinking"' not in prompt["output_format"]
+    assert '"vote"' in prompt["output_format"]
+    assert "请确保输出包含 'vote' 字段。" in prompt["instructions"]
+    assert "'thinking'" not in prompt["instructions"]
+    assert prompt["instructions"].endswith("不需要输出thinking字段，直接给出决定。")
+
+
+def test_brief_level_limits_thinking_length():
+    prompt = load_prompt("vote")
+    apply_thinking_level(prompt, THINKING_BRIEF)
+    assert prompt["required_fields"] == ["thinking", "vote"]
+    assert f'"thinking": "思考，一句话，不超过{BRIEF_THINKING_LENGTH}字"' in prompt["output_format"]
+    assert prompt["instructions"].endswith(f"thinking只写一句话，不超过{BRIEF_THINKING_LENGTH}字。")
+
+
+def test_templates_without_thinking_fields_are_untouched():
+    prompt = {"required_fields": ["speech"], "output_format": '{"speech": "发言"}', "instructions": "请发言"}
+    assert apply_thinking_level(prompt, THINKING_NONE) == []
+    assert prompt["instructions"] == "请发言"
+
+
+def test_every_template_parses_after_dropping_thinking():
+    for name in os.listdir(os.path.join(ROOT, "prompts")):
+        action = name[len("prompt_"):-len(".yaml")]
+        prompt = load_prompt(action)
+        if "required_fields" not in prompt:
+            continue
+        fields = apply_thinking_level(prompt, THINKING_NONE)
+        for field in fields:
+            assert f'"{field}"' not in prompt["output_format"], name
+        assert prompt["required_fields"], name
+
+
+def test_game_without_thinking_still_gets_decisions(game_dir):
+    from game import WerewolfGame
+
+    game_dir(thinking_level=THINKING_NONE)
+    game = WerewolfGame()
+    game.start()
+    seer = next(p for p in game.players if p.role_type == "预言家")
+    resp = game.divine(seer.player_index)
+    assert isinstance(resp["divine"], int)
@@ -0,0 +1,70 @@
+from history import COMPACT_DROP_SPEECH, COMPACT_NONE, COMPACT_TRUNCATE
+from token_budget import DEFAULT_PROMPT_BUDGET, OUTPUT_RESERVE, TokenBudgetManager, estimate_tokens
+
+
+def test_estimate_tokens_counts_cjk_and_other_characters():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(None) == 0
+    # 默认系数: 每个汉字 1 token，其他字符 0.3 token
+    assert estimate_tokens("狼人杀") == 4
+    assert estimate_tokens("a" * 100) == 31
+    # deepseek 的分词器对汉字更省
+    assert estimate_tokens("狼人杀" * 10, "deepseek") < estimate_tokens("狼人杀" * 10)
+
+
+def test_budget_is_capped_by_context_window_and_overrides():
+    manager = TokenBudgetManager({"token_budget": {"models": {"custom": 500}}})
+    assert manager.get_budget("custom") == 500
+    assert manager.get_budget("glm-4v") == 8192 - OUTPUT_RESERVE
+    assert manager.get_budget("unknown-model") == DEFAULT_PROMPT_BUDGET
+
+
+def test_fit_leaves_prompt_within_budget_untouched():
+    manager = TokenBudgetManager()
+    prompt = {"事件": ["短"], "规则": "简单"}
+    fitted, report = manager.fit(dict(prompt), "deepseek-chat", lambda level, keep: ["不应调用"])
+    assert fitted == prompt
+    assert report["compact_level"] == COMPACT_NONE
+    assert report["prompt_tokens"] == report["original_tokens"]
+
+
+def test_fit_compacts_progressively_until_within_budget():
+    manager = TokenBudgetManager({"token_budget": {"default": 200, "keep_recent_rounds": 2}})
+    calls = []
+
+    def render(level, keep_recent):
+        calls.append((level, keep_recent))
+        # 只有省略发言后才能放进预算
+        return ["发言" * 10] if level == COMPACT_DROP_SPEECH else ["发言" * 500]
+
+    _, report = manager.fit({"事件": ["发言" * 500]}, "unknown-model", render)
+    assert calls == [(COMPACT_TRUNCATE, 2), (COMPACT_DROP_SPEECH, 2)]
+    assert report["compact_level"] == COMPACT_DROP_SPEECH
+    assert not report["over_budget"]
+    assert report["prompt_tokens"] < report["original_tokens"]
+
+
+def test_fit_reports_over_budget_after_last_attempt():
+    manager = TokenBudgetManager({"token_budget": {"default": 10}})
+    _, report = manager.fit({"事件": ["发言" * 100]}, "unknown-model", lambda level, keep: ["发言" * 100])
+    assert report["over_budget"]
+    assert report["keep_recent"] == 1
+
+
+def test_record_prefers_reported_usage():
+    manager = TokenBudgetManager()
+    report = {"model": "deepseek-chat", "prompt_tokens": 100, "compact_level": COMPACT_NONE}
+    recorded = manager.record(1, report, "很长的回复" * 100, "", usage={"completion_tokens": 42, "source": "reported"})
+    assert recorded["completion_tokens"] == 42
+    assert recorded["usage_source"] == "reported"
+
+
+def test_record_falls_back_to_estimate():
+    manager = TokenBudgetManager()
+    report = {"model": "deepseek-chat", "prompt_tokens": 100, "compact_level": COMPACT_NONE}
+    estimated = estimate_tokens("回复", "deepseek") + estimate_tokens("推理", "deepseek")
+    for usage in (None, {"completion_tokens": 42, "source": "estimated"}):
+        recorded = manager.record(1, report, "回复", "推理", usage=usage)
+        assert recorded["completion_tokens"] == estimated
+        assert recorded["usage_source"] == "estimated"
+    assert manager.summary()["deepseek-chat"] == {"calls": 2, "prompt_tokens": 200, "completion_tokens": 2 * estimated, "compacted_calls": 0}
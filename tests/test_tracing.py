@@ -0,0 +1,90 @@
+import json
+import threading
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def trace_dir(tmp_path):
+    tracing.configure({"tracing": {"enabled": True, "dir": str(tmp_path)}})
+    yield tmp_path
+    tracing.configure({})
+
+
+def read_trace(path):
+    # 文件省略了结尾的 ]，补上后按 JSON 数组读取
+    text = path.read_text(encoding="utf-8").rstrip().rstrip(",")
+    return json.loads(text + "]")
+
+
+def test_nested_spans_record_parent_and_duration(trace_dir):
+    with tracing.span("request", trace="g1", path="/vote") as outer:
+        with tracing.span("vote", player=3) as inner:
+            tracing.event("first_token", chars=5)
+        outer.set(status=200)
+    records = read_trace(trace_dir / "trace_g1.json")
+    assert [record["name"] for record in records] == ["first_token", "vote", "request"]
+    first_token, vote, request = records
+    assert first_token["ph"] == "i"
+    assert first_token["args"] == {"span_id": inner.span_id, "chars": 5}
+    assert vote["args"]["parent_id"] == request["args"]["span_id"]
+    assert vote["args"]["player"] == 3
+    assert request["args"]["parent_id"] is None
+    assert request["args"]["status"] == 200
+    assert request["ts"] <= vote["ts"]
+    assert vote["ts"] + vote["dur"] <= request["ts"] + request["dur"]
+
+
+def test_span_records_error_and_reraises(trace_dir):
+    with pytest.raises(ValueError):
+        with tracing.span("speak", trace="g1"):
+            raise ValueError("bad json")
+    record = read_trace(trace_dir / "trace_g1.json")[0]
+    assert record["args"]["error"] == "ValueError: bad json"
+
+
+def test_traced_decorator_and_manual_spans(trace_dir):
+    @tracing.traced("build_prompt")
+    def build():
+        return "prompt"
+
+    with tracing.span("handle_action", trace="g2"):
+        assert build() == "prompt"
+        manual = tracing.start_span("attempt", attempt=1)
+    manual.finish()
+    names = [record["name"] for record in read_trace(trace_dir / "trace_g2.json")]
+    assert names == ["build_prompt", "handle_action", "attempt"]
+
+
+def test_spans_in_other_threads_use_their_own_context(trace_dir):
+    def worker():
+        with tracing.span("background"):
+            pass
+
+    with tracing.span("request", trace="g3"):
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+    # 没有上层区间的线程写入 process 追踪文件
+    assert [record["name"] for record in read_trace(trace_dir / "trace_process.json")] == ["background"]
+    assert [record["name"] for record in read_trace(trace_dir / "trace_g3.json")] == ["request"]
+
+
+def test_only_recent_trace_files_stay_open(trace_dir, monkeypatch):
+    monkeypatch.setattr(tracing, "MAX_OPEN_FILES", 2)
+    for trace in ("a", "b", "c", "a"):
+        with tracing.span("step", trace=trace):
+            pass
+    assert len(tracing._files) == 2
+    assert len(read_trace(trace_dir / "trace_a.json")) == 2
+
+
+def test_disabled_tracing_writes_nothing(tmp_path):
+    tracing.configure({"tracing": {"enabled": False, "dir": str(tmp_path)}})
+    with tracing.span("request", trace="g1") as span:
+        span.set(status=200)
+        tracing.event("first_token")
+    assert span is tracing._NOOP
+    assert list(tmp_path.iterdir()) == []
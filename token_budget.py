@@ -0,0 +1,177 @@
+"""
+提示词token预算管理
+在本地按提供商估算token数，把提示词压缩到每个模型的预算以内：
+游戏规则、身份信息和最近的回合原样保留，较早回合的事件逐级压缩
+"""
+
+import json
+import re
+import threading
+
+from history import COMPACT_NONE, COMPACT_TRUNCATE, COMPACT_DROP_SPEECH
+from providers import provider_for_model
+
+# 各提供商分词器的近似系数: 每个汉字 / 每个其他字符 大约对应多少token
+PROVIDER_TOKEN_RATIOS = {
+    "openai": {"cjk": 1.0, "other": 0.28},
+    "openrouter": {"cjk": 1.0, "other": 0.28},
+    "m302ai": {"cjk": 1.0, "other": 0.28},
+    "xai": {"cjk": 1.0, "other": 0.28},
+    "deepseek": {"cjk": 0.6, "other": 0.3},
+    "siliconflow": {"cjk": 0.6, "other": 0.3},
+    "qwen": {"cjk": 0.7, "other": 0.3},
+    "local": {"cjk": 0.7, "other": 0.3},
+    "zhipuai": {"cjk": 0.6, "other": 0.3},
+    "moonshot": {"cjk": 0.65, "other": 0.3},
+    "baichuan": {"cjk": 0.6, "other": 0.3},
+    "doubao": {"cjk": 0.65, "other": 0.3},
+    "hunyuan": {"cjk": 0.65, "other": 0.3},
+}
+DEFAULT_TOKEN_RATIO = {"cjk": 1.0, "other": 0.3}
+
+# 各模型的上下文窗口（token）
+MODEL_CONTEXT_WINDOWS = {
+    "moonshot-v1-32k": 32768,
+    "Baichuan2-Turbo": 32768,
+    "Baichuan2-Turbo-192k": 192000,
+    "Baichuan3-Turbo": 32768,
+    "Baichuan3-Turbo-128k": 128000,
+    "Baichuan4": 32768,
+    "glm-3-turbo": 128000,
+    "glm-4": 128000,
+    "glm-4v": 8192,
+    "glm-4-plus": 128000,
+    "qwen-max": 32768,
+    "qwen-max-2025-01-25": 32768,
+    "qwen-max-longcontext": 30000,
+    "qwen-plus": 131072,
+    "qwen-long": 1000000,
+    "deepseek-chat": 65536,
+    "deepseek-reasoner": 65536,
+    "hunyuan-large": 32768,
+    "hunyuan-turbo-latest": 32768,
+    "Qwen3-32B-AWQ": 32768,
+}
+DEFAULT_CONTEXT_WINDOW = 128000
+
+# 预留给输出的token
+OUTPUT_RESERVE = 8192
+# 即使上下文窗口更大，也把输入控制在这个数以内，保持长对局的延迟和费用平稳
+DEFAULT_PROMPT_BUDGET = 16000
+# 压缩超预算的提示词时，最近几个回合始终原样保留
+BUDGET_KEEP_RECENT_ROUNDS = 2
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text, provider=None):
+    """本地估算文本的token数，openai系模型在安装了tiktoken时使用精确计数"""
+    if not text:
+        return 0
+    text = str(text)
+    if provider == "openai":
+        encoding = _tiktoken_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text))
+    ratio = PROVIDER_TOKEN_RATIOS.get(provider, DEFAULT_TOKEN_RATIO)
+    cjk = len(_CJK_PATTERN.findall(text))
+    return int(cjk * ratio["cjk"] + (len(text) - cjk) * ratio["other"]) + 1
+
+
+_tiktoken = None
+
+
+def _tiktoken_encoding():
+    global _tiktoken
+    if _tiktoken is None:
+        try:
+            import tiktoken
+            _tiktoken = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _tiktoken = False
+    return _tiktoken or None
+
+
+class TokenBudgetManager:
+    """按模型预算裁剪提示词，并记录每次调用的token数"""
+
+    def __init__(self, config=None):
+        config = (config or {}).get("token_budget", {})
+        self.enabled = config.get("enabled", True)
+        self.default_budget = config.get("default", DEFAULT_PROMPT_BUDGET)
+        self.model_budgets = config.get("models", {})
+        self.keep_recent = config.get("keep_recent_rounds", BUDGET_KEEP_RECENT_ROUNDS)
+        self.records = []
+        self.lock = threading.Lock()
+
+    def get_budget(self, model_name):
+        if model_name in self.model_budgets:
+            return self.model_budgets[model_name]
+        context = MODEL_CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW)
+        return min(context - OUTPUT_RESERVE, self.default_budget)
+
+    def fit(self, prompt_dict, model_name, render_events):
+        """
+        把提示词压缩到预算以内，返回 (提示词, 统计信息)
+        render_events(compact_level, keep_recent) 负责按压缩级别重新生成事件列表
+        依次尝试: 原文 -> 较早回合截断发言 -> 较早回合省略发言 -> 只保留最近一个回合原文
+        """
+        provider = provider_for_model(model_name)
+        budget = self.get_budget(model_name)
+        tokens = estimate_tokens(json.dumps(prompt_dict, ensure_ascii=False), provider)
+        report = {
+            "model": model_name,
+            "budget": budget,
+            "original_tokens": tokens,
+            "prompt_tokens": tokens,
+            "compact_level": COMPACT_NONE
+        }
+        if not self.enabled or tokens <= budget or '事件' not in prompt_dict:
+            return prompt_dict, report
+
+        attempts = [
+            (COMPACT_TRUNCATE, self.keep_recent),
+            (COMPACT_DROP_SPEECH, self.keep_recent),
+            (COMPACT_DROP_SPEECH, min(self.keep_recent, 1)),
+        ]
+        for level, keep_recent in attempts:
+            prompt_dict['事件'] = render_events(level, keep_recent)
+            tokens = estimate_tokens(json.dumps(prompt_dict, ensure_ascii=False), provider)
+            report["prompt_tokens"] = tokens
+            report["compact_level"] = level
+            report["keep_recent"] = keep_recent
+            if tokens <= budget:
+                break
+        report["over_budget"] = tokens > budget
+        return prompt_dict, report
+
+    def record(self, player_index, report, completion_text="", reasoning_text="", usage=None):
+        """
+        记录一次调用的token数；输入为压缩时的估算，
+        输出优先使用提供商返回的 usage（含推理token），没有返回时按响应文本估算
+        """
+        provider = provider_for_model(report["model"])
+        report = dict(report)
+        report["player_index"] = player_index
+        if usage and usage.get("source") == "reported":
+            report["completion_tokens"] = usage["completion_tokens"]
+            report["usage_source"] = "reported"
+        else:
+            report["completion_tokens"] = estimate_tokens(completion_text, provider) + estimate_tokens(reasoning_text, provider)
+            report["usage_source"] = "estimated"
+        with self.lock:
+            self.records.append(report)
+        return report
+
+    def summary(self):
+        """按模型汇总token数"""
+        totals = {}
+        with self.lock:
+            for record in self.records:
+                item = totals.setdefault(record["model"], {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "compacted_calls": 0})
+                item["calls"] += 1
+                item["prompt_tokens"] += record["prompt_tokens"]
+                item["completion_tokens"] += record["completion_tokens"]
+                if record["compact_level"] != COMPACT_NONE:
+                    item["compacted_calls"] += 1
+        return totals
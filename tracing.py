@@ -0,0 +1,166 @@
+"""
+耗时追踪
+用单调高精度时钟（perf_counter_ns）记录嵌套的区间: 接口请求 -> 游戏行动（speak/vote/...）-> handle_action
+-> 构建提示词 / get_response -> 每次请求尝试，流式输出时另外记录首个和最后一个token的时间点。
+每局一个文件 logs/trace_<游戏开始时间>.json，使用 Chrome Trace Event 格式，
+可以直接拖进 https://ui.perfetto.dev 或 chrome://tracing 查看时间线和火焰图；
+两次接口请求之间的空白就是前端动画和网络的耗时。
+
+config.json:
+    "tracing": {"enabled": false, "dir": "logs"}
+"""
+
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+DEFAULT_TRACING = {"enabled": False, "dir": "logs"}
+# 长时间运行的网页服务会经历很多局，只保持最近几局的文件打开
+MAX_OPEN_FILES = 16
+
+_settings = dict(DEFAULT_TRACING)
+_current = contextvars.ContextVar("trace_span", default=None)
+_ids = itertools.count(1)
+_files = {}  # 追踪文件名 -> 打开的文件
+_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def configure(config=None):
+    global _settings
+    settings = dict(DEFAULT_TRACING, **(config or {}).get("tracing", {}))
+    with _lock:
+        _settings = settings
+        if not settings["enabled"]:
+            _close_files()
+
+
+def enabled():
+    return _settings["enabled"]
+
+
+def _now_us():
+    return time.perf_counter_ns() / 1000
+
+
+class Span:
+    def __init__(self, name, trace, parent, attrs):
+        self.name = name
+        self.trace = trace
+        self.span_id = next(_ids)
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = attrs
+        self.start = _now_us()
+        self.tid = threading.get_ident()
+        self.token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def event(self, name, **attrs):
+        """在区间内记录一个时间点，如 first_token"""
+        _write(self.trace, {
+            "name": name, "ph": "i", "s": "t", "ts": _now_us(), "pid": _pid, "tid": threading.get_ident(),
+            "args": {"span_id": self.span_id, **attrs},
+        })
+
+    def finish(self, error=None):
+        if error is not None:
+            self.attrs["error"] = f"{type(error).__name__}: {error}"
+        _write(self.trace, {
+            "name": self.name, "ph": "X", "ts": self.start, "dur": _now_us() - self.start, "pid": _pid, "tid": self.tid,
+            "args": {"span_id": self.span_id, "parent_id": self.parent_id, **self.attrs},
+        })
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+    def event(self, name, **attrs):
+        pass
+
+    def finish(self, error=None):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def start_span(name, trace=None, **attrs):
+    """开始一个区间但不作为当前区间，用于不方便改成 with 块的代码，结束时调用 finish()"""
+    if not _settings["enabled"]:
+        return _NOOP
+    parent = _current.get()
+    trace = trace or (parent.trace if parent else "process")
+    return Span(name, str(trace), parent, attrs)
+
+
+class span:
+    """
+    with span("vote", player=3): ...
+    trace 指定写入哪个追踪文件，缺省沿用上层区间
+    """
+
+    def __init__(self, name, trace=None, **attrs):
+        self.span = start_span(name, trace, **attrs)
+
+    def __enter__(self):
+        if self.span is not _NOOP:
+            self.span.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is not _NOOP:
+            _current.reset(self.span.token)
+            self.span.finish(exc)
+        return False
+
+
+def traced(name, **attrs):
+    """把整个函数调用记录为一个区间"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **attrs):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    return _current.get() or _NOOP
+
+
+def event(name, **attrs):
+    """在当前区间记录一个时间点"""
+    if _settings["enabled"]:
+        current_span().event(name, **attrs)
+
+
+def _write(trace, record):
+    # JSON Array 格式允许省略结尾的 ]，每条记录直接追加，进程中途退出也能打开
+    line = json.dumps(record, ensure_ascii=False, default=str) + ",\n"
+    with _lock:
+        f = _files.get(trace)
+        if f is None:
+            os.makedirs(_settings["dir"], exist_ok=True)
+            path = os.path.join(_settings["dir"], f"trace_{trace}.json")
+            new_file = not os.path.exists(path)
+            if len(_files) >= MAX_OPEN_FILES:
+                _files.pop(next(iter(_files))).close()
+            f = _files[trace] = open(path, "a", encoding="utf-8")
+            if new_file:
+                f.write("[\n")
+        f.write(line)
+        f.flush()
+
+
+def _close_files():
+    for f in _files.values():
+        f.close()
+    _files.clear()
@@ -1,11 +1,19 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse
+from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from game import WerewolfGame
+import rate_limit
+import resilience
+import tracing
+import metrics
+import profiling
+import local_pool
 import json
 import sys
 import copy
+import functools
 
 
 class PlayerAction(BaseModel):
@@ -45,8 +53,14 @@ class RevengeAction(BaseModel):
     
 
 class Recorder():
+    """
+    记录每个接口的返回值，回放时按顺序返回
+    回放文件是记录的列表，最后一项为 {"cost": 本局的用量和费用}，每次记录时整体重写
+    """
     def __init__(self, game):
+        self.game = game
         self.log = []
+        self.cost = None
         self.is_loaded = False
         self.index  = 0
     
@@ -57,14 +71,17 @@ class Recorder():
             }
         )
 
-        with open(f"logs/replay_{game.start_time}.json", 'w') as f:
-            json.dump(self.log, f)
+        with open(f"logs/replay_{self.game.start_time}.json", 'w') as f:
+            json.dump(self.log + [{"cost": self.game.cost_ledger.report()}], f)
 
     def load(self, filename):
         print("加载日志文件")
         with open(filename, 'r') as f:
-            self.log = json.load(f)
-            self.is_loaded = True
+            records = json.load(f)
+        # 较早的回放文件没有费用记录
+        self.cost = next((record["cost"] for record in records if "cost" in record), None)
+        self.log = [record for record in records if "response" in record]
+        self.is_loaded = True
 
     def fetch(self):
         result = self.log[self.index]
@@ -75,10 +92,39 @@ class Recorder():
 game = WerewolfGame()
 recorder = Recorder(game)
 
+# 不剖析的接口：下载剖析结果本身和指标抓取
+UNPROFILED_PATHS = ("/profiles", "/profiles/{name}", "/metrics")
+
+def profiled_endpoint(path, endpoint):
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        # 同步接口在线程池中执行，剖析只覆盖接口本身所在的线程
+        with profiling.profile_request(game.start_time, path):
+            return endpoint(*args, **kwargs)
+    return wrapper
+
+class ProfiledRoute(APIRoute):
+    """开启 profiling 时按配置剖析每个接口请求，或计入当前对局的剖析"""
+    def __init__(self, path, endpoint, **kwargs):
+        if path not in UNPROFILED_PATHS:
+            endpoint = profiled_endpoint(path, endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
 app = FastAPI()
+app.router.route_class = ProfiledRoute
 # 设置静态文件目录
 app.mount("/static", StaticFiles(directory="public"), name="public")
 
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    # 每个接口请求是追踪的最外层区间，同步接口在线程池中执行时沿用这里的上下文
+    if not tracing.enabled() or request.url.path.startswith("/static") or request.url.path == "/metrics":
+        return await call_next(request)
+    with tracing.span(f"{request.method} {request.url.path}", trace=game.start_time) as span:
+        response = await call_next(request)
+        span.set(status=response.status_code)
+        return response
+
 @app.get("/")
 def default():
     return RedirectResponse(url="/static/index.html")
@@ -321,6 +367,7 @@ def get_replay_data():
     """获取游戏回放数据"""
     try:
         replay_data = game.history.get_replay_data()
+        replay_data["cost"] = recorder.cost if recorder.is_loaded else game.cost_ledger.report()
         return replay_data
     except Exception as e:
         return {"error": str(e), "events": [], "total_duration": 0}
@@ -334,6 +381,29 @@ def stop_recording():
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus 文本格式的运行指标"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/profiles")
+def get_profiles():
+    """剖析目录中的剖析结果和内存快照"""
+    return profiling.list_profiles()
+
+@app.get("/profiles/{name}")
+def download_profile(name: str):
+    """下载一个剖析结果或内存快照文件"""
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="剖析文件不存在")
+    return FileResponse(path, filename=name)
+
+@app.get("/cost")
+def get_cost():
+    """本局每次模型调用的token用量和费用，以及按玩家、行动、模型的汇总"""
+    return game.cost_ledger.report()
+
 @app.get("/game_summary")
 def get_game_summary():
     """获取游戏摘要信息"""
@@ -353,6 +423,15 @@ def get_game_summary():
             "current_time": current_time,
             "winner": winner,
             "recent_events": recent_events,
+            "token_usage": game.token_budget.summary(),
+            "prompt_latency": game.prompt_tiers.summary(),
+            "route_usage": game.route_stats.summary(),
+            "parse_recovery": game.parse_recovery,
+            "action_corrections": game.action_validator.summary(),
+            "cost": game.cost_ledger.summary(),
+            "rate_limit_wait": rate_limit.summary(),
+            "resilience": resilience.summary(),
+            "local_pool": local_pool.summary(),
             "total_events": len([event for round in game.history.rounds for event in round.day_events + round.night_events])
         }
     except Exception as e: